@@ -0,0 +1,90 @@
+"""Time online backups and the commit latency a concurrent writer sees.
+
+    python -m benchmarks.backup --payments 200000 --write-interval 0.05
+
+Each mode copies the database while a second connection commits one payment
+every --write-interval seconds: "one-step" copies every page in one backup
+step (what a plain Connection.backup does), "paged" uses the throttled
+defaults of backup_manager.backup. Reports the backup time, throughput and
+restarts, and the writer's median and worst commit latency during the copy.
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import NullSink, set_event_sink
+from subscription_manager.core.backup import backup_manager, DEFAULT_PAGES, DEFAULT_PAUSE
+from benchmarks.datagen import generate
+
+
+MODES = {
+    'one-step': (-1, 0),
+    'paged': (DEFAULT_PAGES, DEFAULT_PAUSE),
+}
+
+
+def _with_writer(function, interval):
+    latencies, stop = [], threading.Event()
+
+    def write():
+        conn = sqlite3.connect(str(database.DB_PATH), timeout=30)
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                conn.execute("INSERT INTO payments (subscription_id, amount, payment_date) VALUES (1, 1.0, date('now'))")
+                conn.commit()
+                latencies.append((time.perf_counter() - started) * 1000)
+                stop.wait(interval)
+        finally:
+            conn.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        result = function()
+    finally:
+        stop.set()
+        writer.join()
+    return result, latencies
+
+
+def run(payments=200000, write_interval=0.05, seed=42):
+    set_event_sink(NullSink())
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_database(Path(tmp) / "bench.db")
+        generate(max(1, payments // 5), max(1, payments * 3 // 10), payments, seed)
+        for mode, (pages, pause) in MODES.items():
+            target = Path(tmp) / f"{mode}.db"
+            manifest, latencies = _with_writer(
+                lambda: backup_manager.backup(target, pages, pause, progress=lambda report: None), write_interval)
+            results[mode] = {
+                'backup_ms': manifest['elapsed_ms'],
+                'mib_per_s': manifest['mib_per_s'],
+                'steps': manifest['steps'],
+                'restarts': manifest['restarts'],
+                'writes': len(latencies),
+                'write_p50_ms': round(statistics.median(latencies), 3) if latencies else None,
+                'write_max_ms': round(max(latencies), 3) if latencies else None,
+            }
+        results['size_mib'] = round(manifest['size'] / 1024 / 1024, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=200000)
+    parser.add_argument("--write-interval", type=float, default=0.05, help="seconds between the writer's commits")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(run(args.payments, args.write_interval, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare the object-loop and SQL reports with the columnar extract.
+
+    python -m benchmarks.columnar --payments 50000 --repeat 5
+
+Revenue and expiry are timed against what the reports did before (load the
+objects, loop over them); cohorts against the single-statement SQL engine.
+The columnar figures reuse one extract, whose load time and size are
+reported on their own. The numpy backend is included when NumPy is installed.
+The snapshot entry times writing the memory-mapped report snapshot and
+answering the same reports from it.
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import NullSink, set_event_sink
+from subscription_manager.core.columnar import ColumnarAnalytics, BACKENDS, numpy
+from subscription_manager.core.cohorts import cohort_engine
+from subscription_manager.core.report_snapshot import write_snapshot
+from subscription_manager.core.payments import payment_manager
+from subscription_manager.core.subscriptions import subscription_manager
+from benchmarks.datagen import generate
+
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def _revenue_objects():
+    payments = payment_manager.get_all_payments(lean=True)
+    total = sum(payment.amount for payment in payments)
+    top = sorted(payments, key=lambda payment: payment.amount, reverse=True)[:10]
+    return len(payments), total, [payment.id for payment in top]
+
+
+def _expiry_objects(days=30):
+    subscriptions = subscription_manager.get_expiring_subscriptions(days)
+    return len(subscriptions), sum(subscription.plan.price for subscription in subscriptions)
+
+
+def run(payments=20000, repeat=5, seed=42):
+    set_event_sink(NullSink())
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_database(Path(tmp) / "bench.db")
+        generate(max(1, payments // 5), max(1, payments * 3 // 10), payments, seed)
+        results['objects'] = {
+            'revenue_ms': _time(_revenue_objects, repeat),
+            'expiry_ms': _time(_expiry_objects, repeat),
+            'cohorts_sql_ms': _time(lambda: cohort_engine.get_cohorts("joined", 12, use_cache=False), repeat),
+        }
+        for backend in BACKENDS:
+            if backend == "numpy" and numpy is None:
+                continue
+            analytics = ColumnarAnalytics(backend)
+            extract = analytics.extract()
+            results[backend] = {
+                'extract_ms': _time(lambda: analytics.extract(use_cache=False), repeat),
+                'extract_kib': round(extract.nbytes / 1024, 1),
+                'revenue_ms': _time(analytics.revenue, repeat),
+                'expiry_ms': _time(lambda: analytics.expiry(30), repeat),
+                'cohorts_ms': _time(lambda: analytics.cohorts("joined", 12), repeat),
+            }
+        path = Path(tmp) / "reporting.snap"
+        metadata = write_snapshot(path)
+        snapshot = ColumnarAnalytics(snapshot_path=path)
+        results['snapshot'] = {
+            'write_ms': _time(lambda: write_snapshot(path), repeat),
+            'file_kib': round(metadata['file_size'] / 1024, 1),
+            'open_ms': _time(lambda: snapshot.extract(use_cache=False), repeat),
+            'revenue_ms': _time(snapshot.revenue, repeat),
+            'expiry_ms': _time(lambda: snapshot.expiry(30), repeat),
+            'cohorts_ms': _time(lambda: snapshot.cohorts("joined", 12), repeat),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(run(args.payments, args.repeat, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
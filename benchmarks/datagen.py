@@ -0,0 +1,140 @@
+"""Deterministic synthetic data for the benchmarks.
+
+    python -m benchmarks.datagen bench.db --members 10000 --subscriptions 15000 --payments 50000
+
+The same seed, sizes and anchor date always produce the same rows. Members
+join over the last two years (more of them recently), subscriptions are
+spread over the four default plans with monthly plans the most popular, and
+payments follow the subscription terms at plan price.
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+from subscription_manager import database
+
+
+FIRST_NAMES = ("James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David",
+               "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah",
+               "Charles", "Karen", "Daniel", "Lisa", "Matthew", "Nancy", "Anthony", "Betty", "Mark", "Sandra",
+               "Ahmed", "Fatima", "Wei", "Mei", "Carlos", "Lucia", "Ivan", "Olga", "Kenji", "Yuki", "Priya", "Arjun")
+LAST_NAMES = ("Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+              "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore",
+              "Jackson", "Martin", "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez",
+              "Lewis", "Robinson", "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen")
+
+# share of new subscriptions per default plan, and the chance to renew each term
+PLAN_WEIGHTS = {"Monthly Basic": 0.45, "Monthly Premium": 0.30, "Annual Basic": 0.15, "Annual Premium": 0.10}
+RENEWAL_RATE = {30: 0.75, 365: 0.45}
+MAX_TERMS = {30: 24, 365: 3}
+
+HISTORY_DAYS = 730
+CANCELLED_SHARE = 0.08
+INACTIVE_MEMBER_SHARE = 0.10
+DISCOUNT_SHARE = 0.05
+
+
+def _plans(conn):
+    rows = conn.execute("SELECT id, name, duration_days, price FROM plans WHERE name IN ({}) ORDER BY id".format(
+        ", ".join("?" for _ in PLAN_WEIGHTS)), tuple(PLAN_WEIGHTS)).fetchall()
+    if len(rows) != len(PLAN_WEIGHTS):
+        raise RuntimeError("The default plans are missing from the database")
+    return [(row[0], row[2], row[3], PLAN_WEIGHTS[row[1]]) for row in rows]
+
+
+def generate(members=1000, subscriptions=1500, payments=5000, seed=42, today=None):
+    """Fill the configured database with the synthetic data set; returns the row counts"""
+    rng = random.Random(seed)
+    today = today or date.today()
+
+    with database.transaction() as conn:
+        if conn.execute("SELECT EXISTS (SELECT 1 FROM members)").fetchone()[0]:
+            raise RuntimeError("The database already has members; generate into an empty database")
+        plans = _plans(conn)
+        plan_weights = [plan[3] for plan in plans]
+
+        member_rows = []
+        joined = []
+        for i in range(members):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            # skewed towards recent sign-ups
+            day = today - timedelta(days=int(HISTORY_DAYS * rng.random() ** 1.5))
+            joined.append(day)
+            status = "Inactive" if rng.random() < INACTIVE_MEMBER_SHARE else "Active"
+            member_rows.append((first, last, f"{first.lower()}.{last.lower()}.{i}@example.com",
+                                f"555{i:07d}", day.isoformat(), status))
+        conn.executemany("""
+            INSERT INTO members (first_name, last_name, email, phone, date_joined, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, member_rows)
+        first_member = conn.execute("SELECT MIN(id) FROM members").fetchone()[0]
+
+        # every member gets a first subscription; the rest go to returning members
+        owners = list(range(min(members, subscriptions)))
+        owners += [rng.randrange(members) for _ in range(subscriptions - len(owners))] if members else []
+        subscription_rows = []
+        terms = []
+        for index, owner in enumerate(owners):
+            plan_id, duration, price, _ = rng.choices(plans, weights=plan_weights)[0]
+            earliest = joined[owner] if index < members else joined[owner] + timedelta(days=14)
+            span_days = max(0, (today - earliest).days)
+            offset = rng.randint(0, min(14, span_days)) if index < members else rng.randint(0, span_days)
+            sub_start = min(earliest + timedelta(days=offset), today)
+            count = 1
+            while count < MAX_TERMS.get(duration, 12) and rng.random() < RENEWAL_RATE.get(duration, 0.5):
+                count += 1
+            sub_end = sub_start + timedelta(days=duration * count)
+            active = rng.random() >= CANCELLED_SHARE
+            subscription_rows.append((first_member + owner, plan_id, sub_start.isoformat(), sub_end.isoformat(), active))
+            for term in range(count):
+                term_start = sub_start + timedelta(days=duration * term)
+                if term_start <= today:
+                    terms.append((index, term_start, price))
+        conn.executemany("""
+            INSERT INTO subscriptions (member_id, plan_id, start_date, end_date, is_active)
+            VALUES (?, ?, ?, ?, ?)
+        """, subscription_rows)
+        first_subscription = conn.execute("SELECT MIN(id) FROM subscriptions").fetchone()[0]
+
+        # one payment per started term; trimmed or topped up with part payments to reach the target
+        if len(terms) > payments:
+            chosen = sorted(rng.sample(range(len(terms)), payments))
+            paid = [terms[i] for i in chosen]
+        else:
+            paid = list(terms)
+            while terms and len(paid) < payments:
+                index, term_start, price = rng.choice(terms)
+                paid.append((index, term_start + timedelta(days=rng.randint(0, 20)), round(price / 2, 2)))
+        payment_rows = []
+        for index, paid_on, amount in paid:
+            paid_on = min(paid_on + timedelta(days=rng.randint(0, 3)), today)
+            if rng.random() < DISCOUNT_SHARE:
+                amount = round(amount * 0.9, 2)
+            payment_rows.append((first_subscription + index, amount, paid_on.isoformat(), None))
+        conn.executemany("""
+            INSERT INTO payments (subscription_id, amount, payment_date, notes) VALUES (?, ?, ?, ?)
+        """, payment_rows)
+
+    return {'members': len(member_rows), 'subscriptions': len(subscription_rows), 'payments': len(payment_rows),
+            'seed': seed, 'today': today.isoformat()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db", help="database file to create")
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--subscriptions", type=int, default=1500)
+    parser.add_argument("--payments", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", help="anchor date (YYYY-MM-DD), defaults to today")
+    args = parser.parse_args()
+
+    database.configure_database(Path(args.db))
+    today = date.fromisoformat(args.today) if args.today else None
+    print(json.dumps(generate(args.members, args.subscriptions, args.payments, args.seed, today), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare per-call commits in record_payment with the group-commit PaymentWriter.
+
+    python -m benchmarks.group_commit --payments 5000 --threads 8
+"""
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import NullSink, set_event_sink
+from subscription_manager.core.members import member_manager
+from subscription_manager.core.subscriptions import subscription_manager
+from subscription_manager.core.payments import payment_manager
+from subscription_manager.core.payment_writer import PaymentWriter
+
+
+def _per_call(subscription_id, payments, threads):
+    def worker(i):
+        payment_manager.record_payment(subscription_id, 10 + i % 90, "2025-01-15")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(payments)))
+    return time.perf_counter() - started
+
+
+def _group_commit(subscription_id, payments, threads, flush_interval, max_batch):
+    with PaymentWriter(flush_interval=flush_interval, max_batch=max_batch) as writer:
+        def worker(i):
+            return writer.submit(subscription_id, 10 + i % 90, "2025-01-15").result()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, range(payments)))
+        elapsed = time.perf_counter() - started
+        stats = writer.stats()
+    return elapsed, stats
+
+
+def run(payments=2000, threads=8, flush_interval=0.005, max_batch=500):
+    set_event_sink(NullSink())
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_database(Path(tmp) / "bench.db")
+        member = member_manager.add_member("Bench", "Member")
+        subscription = subscription_manager.create_subscription(member.id, 1, "2025-01-01")
+
+        per_call = _per_call(subscription.id, payments, threads)
+        grouped, stats = _group_commit(subscription.id, payments, threads, flush_interval, max_batch)
+
+    return {
+        'payments': payments,
+        'threads': threads,
+        'per_call_seconds': round(per_call, 4),
+        'per_call_rows_per_second': round(payments / per_call, 1),
+        'group_commit_seconds': round(grouped, 4),
+        'group_commit_rows_per_second': round(payments / grouped, 1),
+        'speedup': round(per_call / grouped, 2),
+        'writer': stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--flush-interval", type=float, default=0.005)
+    parser.add_argument("--max-batch", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(run(args.payments, args.threads, args.flush_interval, args.max_batch), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare per-row sqlite3.Row / dict(row) hydration with the compiled hydrators.
+
+    python -m benchmarks.hydration --payments 50000 --repeat 5
+
+Both sides read the same payments.all result; the fetch is timed separately
+so the hydration cost is visible on its own.
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import NullSink, set_event_sink
+from subscription_manager.hydration import PAYMENT_DETAIL
+from subscription_manager.models import Member, Plan, Subscription, Payment
+from subscription_manager.queries import QUERIES
+from benchmarks.datagen import generate
+
+
+def _row_dict_hydrate(rows):
+    # what PaymentManager did before: two dict(row) copies plus name lookups per row
+    payments = []
+    for row in rows:
+        data = dict(row)
+        member = Member(id=data['member_id'], first_name=data['first_name'], last_name=data['last_name'],
+                        email=data['email'], phone=data.get('phone'), date_joined=data.get('date_joined'),
+                        status=data.get('status'))
+        data = dict(row)
+        plan = Plan(id=data['plan_id'], name=data['plan_name'], description=data.get('description'),
+                    duration_days=data['duration_days'], price=data['price'],
+                    is_active=bool(data.get('plan_is_active', True)))
+        subscription = Subscription(id=row['subscription_id'], member_id=row['member_id'], plan_id=row['plan_id'],
+                                    start_date=row['start_date'], end_date=row['end_date'],
+                                    is_active=bool(row['is_active']), member=member, plan=plan)
+        payments.append(Payment(id=row['id'], subscription_id=row['subscription_id'], amount=row['amount'],
+                                payment_date=row['payment_date'], notes=row['notes'], subscription=subscription))
+    return payments
+
+
+def _fetch(conn, tuples):
+    conn.row_factory = None if tuples else sqlite3.Row
+    cursor = conn.execute(QUERIES['payments.all'])
+    rows = cursor.fetchall()
+    return tuple(column[0] for column in cursor.description), rows
+
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def run(payments=20000, repeat=5, seed=42):
+    set_event_sink(NullSink())
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_database(Path(tmp) / "bench.db")
+        generate(max(1, payments // 5), max(1, payments * 3 // 10), payments, seed)
+        conn = database.get_db_connection()
+        try:
+            _, row_objects = _fetch(conn, tuples=False)
+            columns, tuple_rows = _fetch(conn, tuples=True)
+            results = {
+                'rows': len(tuple_rows),
+                'fetch_row_ms': _time(lambda: _fetch(conn, tuples=False), repeat),
+                'fetch_tuple_ms': _time(lambda: _fetch(conn, tuples=True), repeat),
+                'hydrate_row_dict_ms': _time(lambda: _row_dict_hydrate(row_objects), repeat),
+                'hydrate_compiled_ms': _time(lambda: PAYMENT_DETAIL.hydrate_all(columns, tuple_rows), repeat),
+            }
+        finally:
+            conn.close()
+    results['hydration_speedup'] = round(results['hydrate_row_dict_ms'] / results['hydrate_compiled_ms'], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(run(args.payments, args.repeat, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
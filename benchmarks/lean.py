@@ -0,0 +1,81 @@
+"""Compare the object-graph list results with the lean=True flat rows.
+
+    python -m benchmarks.lean --payments 50000 --repeat 5
+
+For each list call, reports the median wall time and the memory the returned
+list keeps alive (tracemalloc, measured on a separate run so the tracing
+overhead stays out of the timings).
+"""
+import argparse
+import gc
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import NullSink, set_event_sink
+from subscription_manager.core.members import member_manager
+from subscription_manager.core.subscriptions import subscription_manager
+from subscription_manager.core.payments import payment_manager
+from benchmarks.datagen import generate
+
+
+CALLS = {
+    'members': lambda lean: member_manager.get_all_members(lean=lean),
+    'subscriptions': lambda lean: subscription_manager.get_all_subscriptions(include_inactive=True, lean=lean),
+    'payments': lambda lean: payment_manager.get_all_payments(lean=lean),
+}
+
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def _retained_kib(function):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return round(retained / 1024, 1), round(peak / 1024, 1)
+
+
+def run(payments=20000, repeat=5, seed=42):
+    set_event_sink(NullSink())
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_database(Path(tmp) / "bench.db")
+        generate(max(1, payments // 5), max(1, payments * 3 // 10), payments, seed)
+        for name, call in CALLS.items():
+            entry = {'rows': len(call(False))}
+            for mode, lean in (('objects', False), ('lean', True)):
+                entry[f'{mode}_ms'] = _time(lambda: call(lean), repeat)
+                entry[f'{mode}_retained_kib'], entry[f'{mode}_peak_kib'] = _retained_kib(lambda: call(lean))
+            entry['speedup'] = round(entry['objects_ms'] / entry['lean_ms'], 2)
+            entry['memory_ratio'] = round(entry['objects_retained_kib'] / entry['lean_retained_kib'], 2)
+            results[name] = entry
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(run(args.payments, args.repeat, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Run the read / write scenarios against a generated data set and report JSON.
+
+    python -m benchmarks.suite --members 10000 --subscriptions 15000 --payments 50000 --output results.json
+    python -m benchmarks.suite --baseline baseline.json        # exit 1 on regressions
+    python -m benchmarks.suite --save-baseline baseline.json
+
+Each scenario is run --repeat times after one warm-up run and reported as
+min / median / max milliseconds. A scenario regresses when its median is more
+than --tolerance slower than in the baseline.
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import NullSink, set_event_sink
+from subscription_manager.core.members import member_manager
+from subscription_manager.core.plans import plan_manager
+from subscription_manager.core.subscriptions import subscription_manager
+from subscription_manager.core.payments import payment_manager
+from benchmarks.datagen import generate
+
+
+SEARCH_TERMS = ("Smith", "Lee", "Mar", "an", "Nguyen")
+
+
+def _system_summary(context):
+    # the calls main.py makes for the System Summary report
+    members = member_manager.get_all_members()
+    plan_manager.get_all_plans()
+    subscription_manager.get_all_subscriptions()
+    payment_manager.get_payment_stats()
+    subscription_manager.get_subscription_stats()
+    return len(members)
+
+def _search_members(context):
+    return sum(len(member_manager.get_members_by_name(term)) for term in SEARCH_TERMS)
+
+def _record_payment(context):
+    rng = context['rng']
+    for _ in range(context['writes']):
+        payment_manager.record_payment(rng.choice(context['subscription_ids']), 50.0)
+    return context['writes']
+
+
+# name -> (function(context) returning a row / operation count, writes to the database)
+SCENARIOS = {
+    'get_all_payments': (lambda context: len(payment_manager.get_all_payments()), False),
+    'get_expiring_subscriptions': (lambda context: len(subscription_manager.get_expiring_subscriptions(30)), False),
+    'get_plan_stats': (lambda context: len(plan_manager.get_plan_stats()), False),
+    'search_members': (_search_members, False),
+    'system_summary': (_system_summary, False),
+    'record_payment': (_record_payment, True),
+}
+
+
+def _measure(function, context, repeat):
+    count = function(context)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = function(context)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'rows': count,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def run(members=1000, subscriptions=1500, payments=5000, seed=42, repeat=5, writes=200,
+        scenarios=None, db=None):
+    set_event_sink(NullSink())
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_database(Path(db) if db else Path(tmp) / "bench.db")
+        dataset = generate(members, subscriptions, payments, seed)
+
+        context = {
+            'rng': random.Random(seed),
+            'writes': writes,
+            'subscription_ids': [row['id'] for row in database.execute_query("SELECT id FROM subscriptions")],
+        }
+        results = {}
+        # writers run last so the readers all see the generated data set
+        names = [name for name in SCENARIOS if not scenarios or name in scenarios]
+        for name in sorted(names, key=lambda name: SCENARIOS[name][1]):
+            function, writes_data = SCENARIOS[name]
+            results[name] = _measure(function, context, repeat)
+            if writes_data:
+                per_run = results[name]['median_ms'] / 1000
+                results[name]['ops_per_second'] = round(writes / per_run, 1) if per_run else None
+
+    return {
+        'meta': {
+            'dataset': dataset,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'scenarios': results,
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Median changes per scenario; regression when slower than baseline by more than tolerance"""
+    report = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not previous.get('median_ms'):
+            continue
+        change = current['median_ms'] / previous['median_ms'] - 1
+        report.append({
+            'scenario': name,
+            'baseline_ms': previous['median_ms'],
+            'current_ms': current['median_ms'],
+            'change': round(change, 4),
+            'regression': change > tolerance,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--subscriptions", type=int, default=1500)
+    parser.add_argument("--payments", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--writes", type=int, default=200, help="record_payment calls per run")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these")
+    parser.add_argument("--db", help="keep the generated database at this (new) path")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", help="also write the results as the new baseline")
+    args = parser.parse_args()
+
+    results = run(args.members, args.subscriptions, args.payments, args.seed, args.repeat, args.writes,
+                  args.scenario, args.db)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as stream:
+            baseline = json.load(stream)
+        sizes = ('members', 'subscriptions', 'payments', 'seed')
+        recorded = baseline.get('meta', {}).get('dataset', {})
+        if any(recorded.get(key) != results['meta']['dataset'][key] for key in sizes):
+            print("warning: the baseline was recorded with a different data set", file=sys.stderr)
+        results['comparison'] = compare(results, baseline, args.tolerance)
+        regressions = [entry['scenario'] for entry in results['comparison'] if entry['regression']]
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}", file=sys.stderr)
+            status = 1
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text + "\n", encoding="utf-8")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
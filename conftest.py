@@ -0,0 +1,5 @@
+import os
+
+# the package opens its database when it is imported; the tests point it at
+# scratch files themselves, so don't create data/subscription_manager.db
+os.environ.setdefault("SUBMAN_NO_DB", "1")
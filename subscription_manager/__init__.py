@@ -3,10 +3,24 @@ from .core.members import member_manager
 from .core.plans import plan_manager
 from .core.subscriptions import subscription_manager
 from .core.payments import payment_manager
+from .core.exports import export_manager
+from .core.idempotency import idempotency_manager
+from .core.settlements import settlement_importer
+from .core.daily_metrics import daily_metrics_manager
+from .core.cohorts import cohort_engine
+from .core.columnar import columnar_analytics
+from .core.notifications import notification_scheduler
+from .core.active_snapshot import active_snapshot
+from .core.change_log import change_log, ChangeLogGap
+from .core.backup import backup_manager, BackupError
 
 # Import models
 from .models import Member, Plan, Subscription, Payment
 
+# Import event sinks (headless mode)
+from .events import (EventSink, NullSink, ConsoleSink, CollectingSink, RaisingSink,
+                     ManagerError, set_event_sink, use_event_sink, capture_events)
+
 # Import database utilities
 from .database import get_db_connection, init_database
 
@@ -15,10 +29,31 @@ __all__ = [
     'plan_manager', 
     'subscription_manager',
     'payment_manager',
+    'export_manager',
+    'idempotency_manager',
+    'settlement_importer',
+    'daily_metrics_manager',
+    'cohort_engine',
+    'columnar_analytics',
+    'notification_scheduler',
+    'active_snapshot',
+    'change_log',
+    'ChangeLogGap',
+    'backup_manager',
+    'BackupError',
     'Member',
     'Plan',
     'Subscription', 
     'Payment',
+    'EventSink',
+    'NullSink',
+    'ConsoleSink',
+    'CollectingSink',
+    'RaisingSink',
+    'ManagerError',
+    'set_event_sink',
+    'use_event_sink',
+    'capture_events',
     'get_db_connection',
     'init_database'
 ]
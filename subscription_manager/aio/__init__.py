@@ -0,0 +1,13 @@
+from .executor import AsyncDatabaseExecutor
+from .managers import (AsyncMemberManager, AsyncPlanManager, AsyncSubscriptionManager,
+                       AsyncPaymentManager, AsyncDailyMetricsManager, AsyncSubscriptionSystem)
+
+__all__ = [
+    'AsyncDatabaseExecutor',
+    'AsyncMemberManager',
+    'AsyncPlanManager',
+    'AsyncSubscriptionManager',
+    'AsyncPaymentManager',
+    'AsyncDailyMetricsManager',
+    'AsyncSubscriptionSystem'
+]
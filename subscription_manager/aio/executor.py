@@ -0,0 +1,76 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Awaitable, List
+from ..database import bind_thread_connection, release_pool_connections
+from ..events import CollectingSink, RaisingSink, use_event_sink
+
+
+class AsyncDatabaseExecutor:
+    """Runs blocking manager calls off the event loop.
+
+    Reads go to a fixed pool of reader threads, writes to a single writer
+    thread (SQLite allows one writer at a time). Every thread keeps one
+    connection for its whole life, so the connection set is fixed too.
+    At most max_pending_writes writes may be queued for the writer; further
+    write() calls wait, which pushes back on producers instead of growing an
+    unbounded queue.
+    """
+
+    def __init__(self, readers: int = 4, max_pending_writes: int = 64,
+                 raise_errors: bool = True, write_timeout: Optional[float] = None):
+        self.readers = readers
+        self.max_pending_writes = max_pending_writes
+        self.raise_errors = raise_errors
+        self.write_timeout = write_timeout
+        self._read_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="aio-db-reader",
+                                             initializer=bind_thread_connection)
+        self._write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aio-db-writer",
+                                              initializer=bind_thread_connection)
+        self._write_slots = None
+        self._pending_writes = 0
+
+    def _call(self, fn: Callable, args, kwargs) -> Any:
+        # never block on stdin; errors become ManagerError when raise_errors is set
+        sink = RaisingSink(confirm_default=False) if self.raise_errors else CollectingSink(confirm_default=False)
+        with use_event_sink(sink):
+            return fn(*args, **kwargs)
+
+    @property
+    def pending_writes(self) -> int:
+        return self._pending_writes
+
+    def writer_saturated(self) -> bool:
+        return self._pending_writes >= self.max_pending_writes
+
+    async def read(self, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_pool, functools.partial(self._call, fn, args, kwargs))
+
+    async def write(self, fn: Callable, *args, **kwargs) -> Any:
+        if self._write_slots is None:
+            # created lazily so it belongs to the running loop
+            self._write_slots = asyncio.Semaphore(self.max_pending_writes)
+
+        if self.write_timeout is None:
+            await self._write_slots.acquire()
+        else:
+            await asyncio.wait_for(self._write_slots.acquire(), self.write_timeout)
+
+        self._pending_writes += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._write_pool, functools.partial(self._call, fn, args, kwargs))
+        finally:
+            self._pending_writes -= 1
+            self._write_slots.release()
+
+    async def gather(self, *calls: Awaitable, return_exceptions: bool = False) -> List[Any]:
+        """Fan out independent lookups across the reader pool"""
+        return list(await asyncio.gather(*calls, return_exceptions=return_exceptions))
+
+    def shutdown(self, wait: bool = True) -> None:
+        release_pool_connections(self._read_pool, self.readers)
+        release_pool_connections(self._write_pool, 1)
+        self._read_pool.shutdown(wait=wait)
+        self._write_pool.shutdown(wait=wait)
@@ -0,0 +1,233 @@
+import asyncio
+from typing import List, Optional, Dict, Any, Union
+from ..models import Member, Plan, Subscription, Payment, MemberRow, PlanRow, SubscriptionRow, PaymentRow
+from ..core.members import member_manager, MemberManager
+from ..core.plans import plan_manager, PlanManager
+from ..core.subscriptions import subscription_manager, SubscriptionManager
+from ..core.payments import payment_manager, PaymentManager
+from ..core.daily_metrics import daily_metrics_manager, DailyMetricsManager
+from ..core.cohorts import cohort_engine
+from .executor import AsyncDatabaseExecutor
+
+
+class AsyncMemberManager:
+    def __init__(self, executor: AsyncDatabaseExecutor, manager: MemberManager = member_manager):
+        self._executor = executor
+        self._manager = manager
+
+    async def add_member(self, first_name: str, last_name: str, email: str = None,
+                         phone: str = None, date_joined: str = None) -> Optional[Member]:
+        return await self._executor.write(self._manager.add_member, first_name, last_name, email, phone, date_joined)
+
+    async def get_all_members(self, lean: bool = False) -> List[Union[Member, MemberRow]]:
+        return await self._executor.read(self._manager.get_all_members, lean=lean)
+
+    async def get_member_by_id(self, member_id: int) -> Optional[Member]:
+        return await self._executor.read(self._manager.get_member_by_id, member_id)
+
+    async def get_members_by_name(self, name: str, lean: bool = False) -> List[Union[Member, MemberRow]]:
+        return await self._executor.read(self._manager.get_members_by_name, name, lean=lean)
+
+    async def update_member_name(self, member_id: int, first_name: str, last_name: str) -> bool:
+        return await self._executor.write(self._manager.update_member_name, member_id, first_name, last_name)
+
+    async def update_member_email(self, member_id: int, email: str) -> bool:
+        return await self._executor.write(self._manager.update_member_email, member_id, email)
+
+    async def update_member_phone(self, member_id: int, phone: str) -> bool:
+        return await self._executor.write(self._manager.update_member_phone, member_id, phone)
+
+    async def update_member_status(self, member_id: int, status: str) -> bool:
+        return await self._executor.write(self._manager.update_member_status, member_id, status)
+
+
+class AsyncPlanManager:
+    def __init__(self, executor: AsyncDatabaseExecutor, manager: PlanManager = plan_manager):
+        self._executor = executor
+        self._manager = manager
+
+    async def add_plan(self, name: str, description: str, duration_days: int,
+                       price: float, is_active: bool = True) -> Optional[Plan]:
+        return await self._executor.write(self._manager.add_plan, name, description, duration_days, price, is_active)
+
+    async def get_all_plans(self, include_inactive: bool = False,
+                            lean: bool = False) -> List[Union[Plan, PlanRow]]:
+        return await self._executor.read(self._manager.get_all_plans, include_inactive, lean=lean)
+
+    async def get_plan_by_id(self, plan_id: int) -> Optional[Plan]:
+        return await self._executor.read(self._manager.get_plan_by_id, plan_id)
+
+    async def update_plan_name(self, plan_id: int, name: str) -> bool:
+        return await self._executor.write(self._manager.update_plan_name, plan_id, name)
+
+    async def update_plan_description(self, plan_id: int, description: str) -> bool:
+        return await self._executor.write(self._manager.update_plan_description, plan_id, description)
+
+    async def update_plan_duration(self, plan_id: int, duration_days: int) -> bool:
+        return await self._executor.write(self._manager.update_plan_duration, plan_id, duration_days)
+
+    async def update_plan_price(self, plan_id: int, price: float) -> bool:
+        return await self._executor.write(self._manager.update_plan_price, plan_id, price)
+
+    async def set_plan_status(self, plan_id: int, is_active: bool) -> bool:
+        return await self._executor.write(self._manager.set_plan_status, plan_id, is_active)
+
+    async def activate_plan(self, plan_id: int) -> bool:
+        return await self._executor.write(self._manager.activate_plan, plan_id)
+
+    async def deactivate_plan(self, plan_id: int) -> bool:
+        return await self._executor.write(self._manager.deactivate_plan, plan_id)
+
+    async def get_plan_stats(self):
+        return await self._executor.read(self._manager.get_plan_stats)
+
+
+class AsyncSubscriptionManager:
+    def __init__(self, executor: AsyncDatabaseExecutor, manager: SubscriptionManager = subscription_manager):
+        self._executor = executor
+        self._manager = manager
+
+    async def create_subscription(self, member_id: int, plan_id: int, start_date: str = None,
+                                  replace_active: bool = False,
+                                  idempotency_key: str = None) -> Optional[Subscription]:
+        return await self._executor.write(self._manager.create_subscription, member_id, plan_id,
+                                          start_date, replace_active, idempotency_key)
+
+    async def get_all_subscriptions(self, include_inactive: bool = False,
+                                    lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        return await self._executor.read(self._manager.get_all_subscriptions, include_inactive, lean=lean)
+
+    async def get_subscription_by_id(self, subscription_id: int) -> Optional[Subscription]:
+        return await self._executor.read(self._manager.get_subscription_by_id, subscription_id)
+
+    async def get_subscriptions_by_member(self, member_id: int,
+                                          lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        return await self._executor.read(self._manager.get_subscriptions_by_member, member_id, lean=lean)
+
+    async def get_active_subscriptions_by_member(self, member_id: int,
+                                                 lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        return await self._executor.read(self._manager.get_active_subscriptions_by_member, member_id, lean=lean)
+
+    async def renew_subscription(self, subscription_id: int) -> bool:
+        return await self._executor.write(self._manager.renew_subscription, subscription_id)
+
+    async def cancel_subscription(self, subscription_id: int) -> bool:
+        return await self._executor.write(self._manager.cancel_subscription, subscription_id)
+
+    async def activate_subscription(self, subscription_id: int) -> bool:
+        return await self._executor.write(self._manager.activate_subscription, subscription_id)
+
+    async def get_expiring_subscriptions(self, days: int = 7,
+                                         lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        return await self._executor.read(self._manager.get_expiring_subscriptions, days, lean=lean)
+
+    async def get_expired_subscriptions(self, lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        return await self._executor.read(self._manager.get_expired_subscriptions, lean=lean)
+
+    async def get_active_on(self, on_date: str, include_inactive: bool = False,
+                            lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        return await self._executor.read(self._manager.get_active_on, on_date, include_inactive, lean=lean)
+
+    async def get_active_between(self, start_date: str, end_date: str,
+                                 include_inactive: bool = False,
+                                 lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        return await self._executor.read(self._manager.get_active_between, start_date, end_date, include_inactive,
+                                         lean=lean)
+
+    async def count_members_active_on(self, on_date: str, include_inactive: bool = False) -> int:
+        return await self._executor.read(self._manager.count_members_active_on, on_date, include_inactive)
+
+    async def get_subscription_stats(self) -> Dict[str, int]:
+        return await self._executor.read(self._manager.get_subscription_stats)
+
+
+class AsyncPaymentManager:
+    def __init__(self, executor: AsyncDatabaseExecutor, manager: PaymentManager = payment_manager):
+        self._executor = executor
+        self._manager = manager
+
+    async def record_payment(self, subscription_id: int, amount: float,
+                             payment_date: str = None, notes: str = None,
+                             idempotency_key: str = None) -> Optional[Payment]:
+        return await self._executor.write(self._manager.record_payment, subscription_id, amount, payment_date,
+                                          notes, idempotency_key)
+
+    async def get_all_payments(self, lean: bool = False) -> List[Union[Payment, PaymentRow]]:
+        return await self._executor.read(self._manager.get_all_payments, lean=lean)
+
+    async def get_payment_by_id(self, payment_id: int) -> Optional[Payment]:
+        return await self._executor.read(self._manager.get_payment_by_id, payment_id)
+
+    async def get_payments_by_subscription(self, subscription_id: int,
+                                           lean: bool = False) -> List[Union[Payment, PaymentRow]]:
+        return await self._executor.read(self._manager.get_payments_by_subscription, subscription_id, lean=lean)
+
+    async def get_payments_by_member(self, member_id: int, lean: bool = False) -> List[Union[Payment, PaymentRow]]:
+        return await self._executor.read(self._manager.get_payments_by_member, member_id, lean=lean)
+
+    async def get_payments_by_date_range(self, start_date: str, end_date: str,
+                                         lean: bool = False) -> List[Union[Payment, PaymentRow]]:
+        return await self._executor.read(self._manager.get_payments_by_date_range, start_date, end_date, lean=lean)
+
+    async def get_todays_payments(self, lean: bool = False) -> List[Union[Payment, PaymentRow]]:
+        return await self._executor.read(self._manager.get_todays_payments, lean=lean)
+
+    async def update_payment_notes(self, payment_id: int, notes: str) -> bool:
+        return await self._executor.write(self._manager.update_payment_notes, payment_id, notes)
+
+    async def get_member_balance(self, member_id: int) -> Dict[str, Any]:
+        return await self._executor.read(self._manager.get_member_balance, member_id)
+
+    async def rebuild_member_balances(self, verify_only: bool = False) -> Optional[Dict[str, Any]]:
+        return await self._executor.write(self._manager.rebuild_member_balances, verify_only)
+
+    async def get_payment_stats(self, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
+        return await self._executor.read(self._manager.get_payment_stats, start_date, end_date)
+
+
+class AsyncDailyMetricsManager:
+    def __init__(self, executor: AsyncDatabaseExecutor, manager: DailyMetricsManager = daily_metrics_manager):
+        self._executor = executor
+        self._manager = manager
+
+    async def refresh(self, until: str = None, full: bool = False) -> Optional[Dict[str, Any]]:
+        return await self._executor.write(self._manager.refresh, until, full)
+
+    async def get_daily_metrics(self, start_date: str, end_date: str, plan_id: int = None) -> List[Dict[str, Any]]:
+        return await self._executor.read(self._manager.get_daily_metrics, start_date, end_date, plan_id)
+
+    async def get_cohorts(self, by: str = "joined", max_months: int = 12) -> Optional[Dict[str, Any]]:
+        return await self._executor.read(cohort_engine.get_cohorts, by, max_months)
+
+
+class AsyncSubscriptionSystem:
+    """The four async managers sharing one executor.
+
+    async with AsyncSubscriptionSystem() as system:
+        member, payments = await system.gather(
+            system.members.get_member_by_id(1),
+            system.payments.get_payments_by_member(1),
+        )
+    """
+
+    def __init__(self, readers: int = 4, max_pending_writes: int = 64,
+                 raise_errors: bool = True, write_timeout: float = None):
+        self.executor = AsyncDatabaseExecutor(readers, max_pending_writes, raise_errors, write_timeout)
+        self.members = AsyncMemberManager(self.executor)
+        self.plans = AsyncPlanManager(self.executor)
+        self.subscriptions = AsyncSubscriptionManager(self.executor)
+        self.payments = AsyncPaymentManager(self.executor)
+        self.daily_metrics = AsyncDailyMetricsManager(self.executor)
+
+    async def gather(self, *calls, return_exceptions: bool = False):
+        return await self.executor.gather(*calls, return_exceptions=return_exceptions)
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # shutdown waits for in-flight database calls; keep the event loop running meanwhile
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
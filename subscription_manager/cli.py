@@ -0,0 +1,872 @@
+import argparse
+import json
+import shlex
+import sys
+import time
+from pathlib import Path
+from contextlib import redirect_stdout
+from typing import List, Optional, Any
+
+from . import database
+from .core.members import member_manager
+from .core.plans import plan_manager
+from .core.subscriptions import subscription_manager
+from .core.payments import payment_manager
+from .core.exports import export_manager
+from .core.idempotency import idempotency_manager
+from .core.settlements import SettlementImporter
+from .core.daily_metrics import daily_metrics_manager
+from .core.cohorts import cohort_engine, COHORT_DIMENSIONS
+from .core.columnar import columnar_analytics, ColumnarAnalytics
+from .core.report_snapshot import write_snapshot, snapshot_info, default_snapshot_path
+from .core.notifications import NotificationScheduler, FileNotificationSink
+from .core.active_snapshot import active_snapshot
+from .core.change_log import change_log
+from .core.backup import backup_manager, DEFAULT_PAGES, DEFAULT_PAUSE, DEFAULT_MAX_RESTARTS, DEFAULT_KEEP
+from .query_stats import query_stats, SORT_KEYS
+from .metrics import start_http_server, MetricsFileWriter
+from .queries import lint as lint_queries, LINT_ALLOW
+from .profiling import Profiler, PROFILE_MODES, traced, RENDER
+from .models import Member, Plan, Subscription, Payment, MemberRow, PlanRow, SubscriptionRow, PaymentRow
+from .utils.helpers import format_currency
+from .utils.display import (display_members_table, display_plans_table,
+ display_subscriptions_table, display_payments_table, display_member_details,
+ display_plan_details, display_subscription_details, display_info_message,
+ display_error_message, print_table)
+
+
+ENTITY_FORMATS = ("table", "json", "jsonl")
+REPORT_FORMATS = ("table", "json", "csv", "jsonl")
+
+_TABLE_RENDERERS = {
+    Member: display_members_table,
+    Plan: display_plans_table,
+    Subscription: display_subscriptions_table,
+    Payment: display_payments_table,
+    MemberRow: display_members_table,
+    PlanRow: display_plans_table,
+    SubscriptionRow: display_subscriptions_table,
+    PaymentRow: display_payments_table,
+}
+
+_DETAIL_RENDERERS = {
+    Member: display_member_details,
+    Plan: display_plan_details,
+    Subscription: display_subscription_details,
+    Payment: lambda payment: display_payments_table([payment]),
+}
+
+
+class CommandFailed(Exception):
+    """Raised when a manager call reports failure (returns None or False)"""
+
+
+# Output helpers
+
+def _to_plain(value: Any) -> Any:
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if hasattr(value, 'keys'):
+        # sqlite3.Row from the stats queries
+        return {key: value[key] for key in value.keys()}
+    return value
+
+
+@traced(RENDER)
+def _render(result: Any, output_format: str, out) -> None:
+    if isinstance(result, bool):
+        return
+
+    if output_format == "json":
+        if isinstance(result, list):
+            payload = [_to_plain(item) for item in result]
+        else:
+            payload = _to_plain(result)
+        out.write(json.dumps(payload, indent=2, default=str) + "\n")
+        return
+
+    if output_format == "jsonl":
+        items = result if isinstance(result, list) else [result]
+        for item in items:
+            out.write(json.dumps(_to_plain(item), default=str) + "\n")
+        return
+
+    # table output goes through the regular display helpers
+    with redirect_stdout(out):
+        if isinstance(result, list):
+            if not result:
+                display_info_message("No records found.")
+                return
+            renderer = _TABLE_RENDERERS.get(type(result[0]))
+            if renderer:
+                renderer(result)
+            else:
+                rows = [_to_plain(item) for item in result]
+                headers = list(rows[0].keys())
+                print_table(headers, [[row[h] for h in headers] for row in rows])
+        elif type(result) in _DETAIL_RENDERERS:
+            _DETAIL_RENDERERS[type(result)](result)
+        elif isinstance(result, dict):
+            for key, value in result.items():
+                print(f"{key.replace('_', ' ').title()}: {value}")
+        else:
+            print(result)
+
+
+def _lean(args) -> bool:
+    # tables only show the flat columns, so they never need the object graph
+    return args.format == "table" or args.lean
+
+
+def _checked(result: Any) -> Any:
+    if result is None or result is False:
+        raise CommandFailed()
+    return result
+
+
+# Member commands
+
+def _members_add(args):
+    return _checked(member_manager.add_member(args.first_name, args.last_name,
+                                              args.email, args.phone, args.date_joined))
+
+def _members_list(args):
+    return member_manager.get_all_members(lean=_lean(args))
+
+def _members_get(args):
+    return _checked(member_manager.get_member_by_id(args.member_id))
+
+def _members_check(args):
+    running = active_snapshot.get_running(args.member_id)
+    if not running:
+        display_error_message(f"Member {args.member_id} has no active subscription")
+        raise CommandFailed()
+    return {'member_id': args.member_id, 'active': True,
+            'valid_until': max(subscription['end_date'] for subscription in running)}
+
+def _members_search(args):
+    return member_manager.get_members_by_name(args.name, lean=_lean(args))
+
+def _members_update(args):
+    member = _checked(member_manager.get_member_by_id(args.member_id))
+    if args.first_name or args.last_name:
+        _checked(member_manager.update_member_name(member.id, args.first_name or member.first_name,
+                                                   args.last_name or member.last_name))
+    if args.email is not None:
+        _checked(member_manager.update_member_email(member.id, args.email))
+    if args.phone is not None:
+        _checked(member_manager.update_member_phone(member.id, args.phone))
+    return member_manager.get_member_by_id(member.id)
+
+def _members_set_status(args):
+    return _checked(member_manager.update_member_status(args.member_id, args.status))
+
+
+# Plan commands
+
+def _plans_add(args):
+    return _checked(plan_manager.add_plan(args.name, args.description, args.duration_days, args.price))
+
+def _plans_list(args):
+    return plan_manager.get_all_plans(include_inactive=args.all, lean=_lean(args))
+
+def _plans_get(args):
+    return _checked(plan_manager.get_plan_by_id(args.plan_id))
+
+def _plans_activate(args):
+    return _checked(plan_manager.activate_plan(args.plan_id))
+
+def _plans_deactivate(args):
+    return _checked(plan_manager.deactivate_plan(args.plan_id))
+
+
+# Subscription commands
+
+def _subscriptions_create(args):
+    # Only prompt when someone is at the terminal; scripts must opt in with --replace
+    replace_active = True if args.replace else (None if sys.stdin.isatty() else False)
+    return _checked(subscription_manager.create_subscription(args.member_id, args.plan_id,
+                                                             args.start_date, replace_active,
+                                                             args.idempotency_key))
+
+def _subscriptions_list(args):
+    return subscription_manager.get_all_subscriptions(include_inactive=args.all, lean=_lean(args))
+
+def _subscriptions_get(args):
+    return _checked(subscription_manager.get_subscription_by_id(args.subscription_id))
+
+def _subscriptions_member(args):
+    return subscription_manager.get_subscriptions_by_member(args.member_id, lean=_lean(args))
+
+def _subscriptions_active_on(args):
+    if args.count:
+        return {'date': args.date, 'active_members': subscription_manager.count_members_active_on(args.date, args.all)}
+    return subscription_manager.get_active_on(args.date, include_inactive=args.all, lean=_lean(args))
+
+def _subscriptions_active_between(args):
+    return subscription_manager.get_active_between(args.start_date, args.end_date, include_inactive=args.all,
+                                                   lean=_lean(args))
+
+def _subscriptions_renew(args):
+    return _checked(subscription_manager.renew_subscription(args.subscription_id))
+
+def _subscriptions_cancel(args):
+    return _checked(subscription_manager.cancel_subscription(args.subscription_id))
+
+def _subscriptions_activate(args):
+    return _checked(subscription_manager.activate_subscription(args.subscription_id))
+
+
+# Payment commands
+
+def _payments_record(args):
+    return _checked(payment_manager.record_payment(args.subscription_id, args.amount,
+                                                   args.payment_date, args.notes,
+                                                   args.idempotency_key))
+
+def _payments_import(args):
+    importer = SettlementImporter(batch_size=args.batch_size)
+    source = sys.stdin if args.file == "-" else args.file
+    summary = _checked(importer.import_file(source, args.report, args.settlement_date, args.dry_run))
+    if args.format == "table":
+        # the per-line detail belongs in --report
+        summary.pop('unmatched_lines')
+    return summary
+
+def _payments_list(args):
+    return payment_manager.get_all_payments(lean=_lean(args))
+
+def _payments_get(args):
+    return _checked(payment_manager.get_payment_by_id(args.payment_id))
+
+def _payments_member(args):
+    return payment_manager.get_payments_by_member(args.member_id, lean=_lean(args))
+
+def _payments_balance(args):
+    return payment_manager.get_member_balance(args.member_id)
+
+def _payments_range(args):
+    return payment_manager.get_payments_by_date_range(args.start_date, args.end_date, lean=_lean(args))
+
+def _payments_today(args):
+    return payment_manager.get_todays_payments(lean=_lean(args))
+
+
+# Report commands
+
+def _export(args, report: str, **kwargs):
+    # csv / jsonl reports stream straight from the cursor
+    target = args.output or args.out
+    result = _checked(export_manager.export_report(report, target, format=args.format, **kwargs))
+    if args.output:
+        args.err.write(f"Exported {result['rows']} rows to {', '.join(result['files'])}\n")
+    return True
+
+def _reports_summary(args):
+    members = member_manager.get_all_members(lean=True)
+    subscription_stats = subscription_manager.get_subscription_stats()
+    payment_stats = payment_manager.get_payment_stats()
+    summary = {
+        'total_members': len(members),
+        'active_members': len([m for m in members if m.status == "Active"]),
+        'total_plans': len(plan_manager.get_all_plans(lean=True)),
+    }
+    summary.update(subscription_stats)
+    summary.update(payment_stats)
+    return summary
+
+def _reports_revenue(args):
+    if args.start_date or args.end_date:
+        if not (args.start_date and args.end_date):
+            display_error_message("Both --from and --to are required for a date range")
+            raise CommandFailed()
+        report = 'revenue'
+    else:
+        report = 'payments'
+
+    if args.format in ("csv", "jsonl"):
+        return _export(args, report, start_date=args.start_date, end_date=args.end_date)
+
+    if report == 'revenue':
+        payments = payment_manager.get_payments_by_date_range(args.start_date, args.end_date, lean=_lean(args))
+    else:
+        payments = payment_manager.get_all_payments(lean=_lean(args))
+    if args.format == "json":
+        return payments
+
+    # the rows are already here; a columnar extract would only pay off in a long-lived process
+    total_revenue = sum(p.amount for p in payments)
+    summary = {
+        'total_payments': len(payments),
+        'total_revenue': format_currency(total_revenue),
+        'average_payment': format_currency(total_revenue / len(payments) if payments else 0),
+    }
+    _render(summary, "table", args.out)
+    return payments
+
+def _reports_active_members(args):
+    if args.format in ("csv", "jsonl"):
+        return _export(args, 'active_members')
+    return [m for m in member_manager.get_all_members(lean=_lean(args)) if m.status == "Active"]
+
+def _reports_expiring(args):
+    if args.format in ("csv", "jsonl"):
+        return _export(args, 'expiring_subscriptions', days=args.days)
+    subscriptions = subscription_manager.get_expiring_subscriptions(args.days, lean=_lean(args))
+    if args.format == "table":
+        # summarise the rows already fetched, as _reports_revenue does
+        prices = {plan.id: plan.price for plan in plan_manager.get_all_plans(lean=True)}
+        by_days_left = [0] * (args.days + 1)
+        for subscription in subscriptions:
+            by_days_left[min(subscription.remaining_days(), args.days)] += 1
+        renewal_value = sum(prices.get(subscription.plan_id, 0) for subscription in subscriptions)
+        _render({'expiring': len(subscriptions), 'renewal_value': format_currency(renewal_value),
+                 'per_day_left': ", ".join(f"{left}d: {count}" for left, count in
+                                           enumerate(by_days_left) if count)}, "table", args.out)
+    return subscriptions
+
+def _reports_expired(args):
+    if args.format in ("csv", "jsonl"):
+        return _export(args, 'expired_subscriptions')
+    return subscription_manager.get_expired_subscriptions(lean=_lean(args))
+
+def _reports_daily(args):
+    if args.refresh:
+        _checked(daily_metrics_manager.refresh())
+    if args.format in ("csv", "jsonl") and args.plan_id is None:
+        return _export(args, 'daily_metrics', start_date=args.start_date, end_date=args.end_date)
+    return daily_metrics_manager.get_daily_metrics(args.start_date, args.end_date, args.plan_id)
+
+def _reports_cohorts(args):
+    if args.engine == "columnar":
+        result = _checked(columnar_analytics.cohorts(args.by, args.months))
+    else:
+        result = _checked(cohort_engine.get_cohorts(args.by, args.months))
+    return _cohort_output(result, args)
+
+def _cohort_output(result, args):
+    if args.format == "json":
+        return result
+    # one row per cohort with its retention curve as m0, m1, ... columns
+    rows = []
+    for cohort in result['cohorts']:
+        row = {'cohort': cohort['cohort'], 'size': cohort['size'],
+               'revenue': format_currency(cohort['total_revenue'])}
+        for offset in range(args.months + 1):
+            retention = cohort['retention'][offset] if offset < len(cohort['retention']) else None
+            row[f"m{offset}"] = f"{retention:.0%}" if retention is not None else ""
+        rows.append(row)
+    return rows
+
+def _reports_plan_popularity(args):
+    if args.format in ("csv", "jsonl"):
+        return _export(args, 'plan_popularity')
+    return plan_manager.get_plan_stats()
+
+
+# Notification commands
+
+def _scheduler(args) -> NotificationScheduler:
+    return NotificationScheduler(offsets=args.offsets, batch_size=args.batch_size)
+
+def _notifications_schedule(args):
+    return {'scheduled': _scheduler(args).schedule()}
+
+def _notifications_drain(args):
+    sink = FileNotificationSink(args.output)
+    try:
+        return _scheduler(args).drain(sink, limit=args.limit)
+    finally:
+        sink.close()
+
+def _notifications_run(args):
+    try:
+        _scheduler(args).run_worker(FileNotificationSink(args.output), interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+    return True
+
+def _notifications_stats(args):
+    return _scheduler(args).get_notification_stats()
+
+
+# Change log commands
+
+def _changes_list(args):
+    return change_log.read_since(args.since, args.limit, args.table)
+
+def _changes_stats(args):
+    return change_log.stats()
+
+
+# Maintenance commands
+
+def _maintenance_purge_idempotency_keys(args):
+    return {'purged': idempotency_manager.purge_expired(args.batch_size)}
+
+def _maintenance_refresh_daily_metrics(args):
+    return _checked(daily_metrics_manager.refresh(args.until, full=args.full))
+
+def _maintenance_compact_change_log(args):
+    return {'deleted': change_log.compact(args.retain_days, args.batch_size, force=args.force)}
+
+def _maintenance_rebuild_balances(args):
+    return _checked(payment_manager.rebuild_member_balances(verify_only=args.verify_only))
+
+def _maintenance_lint_queries(args):
+    findings = lint_queries(args.paths)
+    for path, line_no, line in findings:
+        display_error_message(f"{path}:{line_no}: SELECT * on a hot path: {line}")
+    if findings:
+        display_info_message(f"List the columns, or mark the line '# {LINT_ALLOW}'")
+        raise CommandFailed()
+    return {'findings': 0}
+
+
+# Backup commands
+
+def _backup_run(args):
+    return _checked(backup_manager.backup(args.output, args.pages, args.pause, args.max_restarts))
+
+def _backup_snapshot(args):
+    return _checked(backup_manager.snapshot(args.dir, args.keep, args.force))
+
+def _backup_list(args):
+    manifests = backup_manager.list_backups(args.dir, args.kind)
+    if args.format == "table":
+        # backups and snapshots carry different details; the table shows what they share
+        return [{'kind': manifest['kind'], 'file': manifest['file'], 'created_at': manifest['created_at'],
+                 'size': manifest['size'], 'change_id': manifest['change_id'], 'sha256': manifest['sha256'][:12]}
+                for manifest in manifests]
+    return manifests
+
+def _backup_verify(args):
+    return _checked(backup_manager.verify(args.path, args.full))
+
+def _backup_restore(args):
+    return _checked(backup_manager.restore(args.path, args.pages, safety_backup=not args.no_safety_backup,
+                                           confirmed=True if args.yes else None))
+
+
+# Snapshot commands
+
+def _snapshot_write(args):
+    metadata = _checked(write_snapshot(args.output))
+    return {'path': metadata['path'], 'change_id': metadata['change_id'],
+            'payments': metadata['tables']['payments']['rows'],
+            'subscriptions': metadata['tables']['subscriptions']['rows'],
+            'file_size': metadata['file_size'], 'elapsed_ms': metadata['elapsed_ms']}
+
+def _snapshot_info(args):
+    return _checked(snapshot_info(args.file, args.verify))
+
+def _snapshot_analytics(args) -> ColumnarAnalytics:
+    # reports from the file alone; the database is not opened
+    return ColumnarAnalytics(snapshot_path=args.file or default_snapshot_path())
+
+def _snapshot_revenue(args):
+    result = _checked(_snapshot_analytics(args).revenue(args.start_date, args.end_date))
+    if args.format == "table":
+        result['total_revenue'] = format_currency(result['total_revenue'])
+        result['average_payment'] = format_currency(result['average_payment'])
+        result['top_payment_ids'] = ", ".join(str(payment_id) for payment_id in result['top_payment_ids'])
+    return result
+
+def _snapshot_expiry(args):
+    result = _checked(_snapshot_analytics(args).expiry(args.days, args.on_date))
+    if args.format == "table":
+        result['renewal_value'] = format_currency(result['renewal_value'])
+        result['by_days_left'] = ", ".join(f"{left}d: {count}" for left, count in
+                                           enumerate(result['by_days_left']) if count)
+    return result
+
+def _snapshot_cohorts(args):
+    return _cohort_output(_checked(_snapshot_analytics(args).cohorts(args.by, args.months)), args)
+
+
+def _serve(args):
+    from .server import serve
+    serve(args.host, args.port, args.workers, args.queue_size, args.verbose)
+    return True
+
+
+# Batch mode
+
+def _run_batch(args):
+    """Run one command per line from a file ('-' for stdin); blank lines and # comments are skipped"""
+    stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    failures = 0
+    executed = 0
+    started = time.perf_counter()
+    try:
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            executed += 1
+            status = run(shlex.split(line), out=args.out, err=args.err,
+                         timings=args.timings, label=f"line {line_no}: {line}")
+            if status != 0:
+                failures += 1
+                if args.stop_on_error:
+                    break
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    if args.timings:
+        elapsed = (time.perf_counter() - started) * 1000
+        args.err.write(f"[timing] batch: {executed} commands, {failures} failed, {elapsed:.2f} ms\n")
+    if failures:
+        raise CommandFailed()
+    return True
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="subman", description="Subscription Management System")
+    parser.add_argument("--db", help="path to the SQLite database file")
+    parser.add_argument("--timings", action="store_true", help="report per-command timings on stderr")
+    parser.add_argument("--query-stats", action="store_true",
+                        help="report per-statement counts and latency percentiles on stderr")
+    parser.add_argument("--query-stats-sort", choices=SORT_KEYS, default="total_ms")
+    parser.add_argument("--slow-query-ms", type=float, help="log statements slower than this")
+    parser.add_argument("--slow-query-log", help="append slow statements to this file instead of stderr")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="profile the command and write a collapsed-stack file")
+    parser.add_argument("--profile-output", help="collapsed-stack file (default data/profiles/<command>-<time>.folded)")
+    parser.add_argument("--profile-interval", type=float, default=1.0, help="sampling interval in milliseconds")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port while running")
+    parser.add_argument("--metrics-file", help="write Prometheus metrics to this file (every --metrics-interval "
+                                               "seconds and on exit)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0)
+    groups = parser.add_subparsers(dest="group", metavar="<group>")
+    groups.required = True
+
+    def command(subparsers, name, handler, help_text, formats=ENTITY_FORMATS, lean=False):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--format", choices=formats, default="table")
+        if lean:
+            sub.add_argument("--lean", action="store_true",
+                             help="flat rows with only the listed columns (always on for --format table)")
+        sub.set_defaults(handler=handler, lean=False)
+        return sub
+
+    # members
+    members = groups.add_parser("members", help="member management").add_subparsers(dest="action", metavar="<action>")
+    members.required = True
+    sub = command(members, "add", _members_add, "add a new member")
+    sub.add_argument("first_name")
+    sub.add_argument("last_name")
+    sub.add_argument("--email")
+    sub.add_argument("--phone")
+    sub.add_argument("--date-joined", dest="date_joined")
+    command(members, "list", _members_list, "list all members", lean=True)
+    sub = command(members, "get", _members_get, "show a member")
+    sub.add_argument("member_id", type=int)
+    sub = command(members, "check", _members_check, "check-in: does the member have an active subscription")
+    sub.add_argument("member_id", type=int)
+    sub = command(members, "search", _members_search, "search members by name", lean=True)
+    sub.add_argument("name")
+    sub = command(members, "update", _members_update, "update member information")
+    sub.add_argument("member_id", type=int)
+    sub.add_argument("--first-name", dest="first_name")
+    sub.add_argument("--last-name", dest="last_name")
+    sub.add_argument("--email", help="new email, empty string to clear")
+    sub.add_argument("--phone", help="new phone, empty string to clear")
+    sub = command(members, "set-status", _members_set_status, "activate or deactivate a member")
+    sub.add_argument("member_id", type=int)
+    sub.add_argument("status", choices=["Active", "Inactive"])
+
+    # plans
+    plans = groups.add_parser("plans", help="subscription plans").add_subparsers(dest="action", metavar="<action>")
+    plans.required = True
+    sub = command(plans, "add", _plans_add, "create a plan")
+    sub.add_argument("name")
+    sub.add_argument("duration_days", type=int)
+    sub.add_argument("price", type=float)
+    sub.add_argument("--description")
+    sub = command(plans, "list", _plans_list, "list plans", lean=True)
+    sub.add_argument("--all", action="store_true", help="include inactive plans")
+    sub = command(plans, "get", _plans_get, "show a plan")
+    sub.add_argument("plan_id", type=int)
+    sub = command(plans, "activate", _plans_activate, "activate a plan")
+    sub.add_argument("plan_id", type=int)
+    sub = command(plans, "deactivate", _plans_deactivate, "deactivate a plan")
+    sub.add_argument("plan_id", type=int)
+
+    # subscriptions
+    subscriptions = groups.add_parser("subscriptions", help="subscription operations").add_subparsers(dest="action", metavar="<action>")
+    subscriptions.required = True
+    sub = command(subscriptions, "create", _subscriptions_create, "assign a plan to a member")
+    sub.add_argument("member_id", type=int)
+    sub.add_argument("plan_id", type=int)
+    sub.add_argument("--start", dest="start_date", help="start date (YYYY-MM-DD), defaults to today")
+    sub.add_argument("--replace", action="store_true",
+                     help="create it even if the member already has an active subscription")
+    sub.add_argument("--idempotency-key", dest="idempotency_key",
+                     help="retries with the same key return the original subscription")
+    sub = command(subscriptions, "list", _subscriptions_list, "list subscriptions", lean=True)
+    sub.add_argument("--all", action="store_true", help="include inactive subscriptions")
+    sub = command(subscriptions, "get", _subscriptions_get, "show a subscription")
+    sub.add_argument("subscription_id", type=int)
+    sub = command(subscriptions, "member", _subscriptions_member, "list a member's subscriptions", lean=True)
+    sub.add_argument("member_id", type=int)
+    sub = command(subscriptions, "active-on", _subscriptions_active_on, "subscriptions running on a date", lean=True)
+    sub.add_argument("date", help="YYYY-MM-DD")
+    sub.add_argument("--count", action="store_true", help="only count the distinct members")
+    sub.add_argument("--all", action="store_true", help="include cancelled subscriptions")
+    sub = command(subscriptions, "active-between", _subscriptions_active_between,
+                  "subscriptions running at any point in a date range", lean=True)
+    sub.add_argument("start_date")
+    sub.add_argument("end_date")
+    sub.add_argument("--all", action="store_true", help="include cancelled subscriptions")
+    for name, handler, help_text in (("renew", _subscriptions_renew, "renew a subscription"),
+                                     ("cancel", _subscriptions_cancel, "cancel a subscription"),
+                                     ("activate", _subscriptions_activate, "reactivate a subscription")):
+        sub = command(subscriptions, name, handler, help_text)
+        sub.add_argument("subscription_id", type=int)
+
+    # payments
+    payments = groups.add_parser("payments", help="payment processing").add_subparsers(dest="action", metavar="<action>")
+    payments.required = True
+    sub = command(payments, "record", _payments_record, "record a payment")
+    sub.add_argument("subscription_id", type=int)
+    sub.add_argument("amount", type=float)
+    sub.add_argument("--date", dest="payment_date", help="payment date (YYYY-MM-DD), defaults to today")
+    sub.add_argument("--notes")
+    sub.add_argument("--idempotency-key", dest="idempotency_key",
+                     help="retries with the same key return the original payment")
+    sub = command(payments, "import", _payments_import, "import a settlement CSV file")
+    sub.add_argument("file", help="settlement file, '-' for stdin")
+    sub.add_argument("--report", help="write a per-line reconciliation CSV here")
+    sub.add_argument("--date", dest="settlement_date", help="payment date for lines without one, defaults to today")
+    sub.add_argument("--batch-size", type=int, default=1000, help="lines per transaction")
+    sub.add_argument("--dry-run", action="store_true", help="reconcile without recording any payments")
+    command(payments, "list", _payments_list, "list all payments", lean=True)
+    sub = command(payments, "get", _payments_get, "show a payment")
+    sub.add_argument("payment_id", type=int)
+    sub = command(payments, "member", _payments_member, "payment history for a member", lean=True)
+    sub.add_argument("member_id", type=int)
+    sub = command(payments, "balance", _payments_balance, "payment totals for a member")
+    sub.add_argument("member_id", type=int)
+    sub = command(payments, "range", _payments_range, "payments within a date range", lean=True)
+    sub.add_argument("start_date")
+    sub.add_argument("end_date")
+    command(payments, "today", _payments_today, "today's payments", lean=True)
+
+    # reports
+    reports = groups.add_parser("reports", help="reports & analytics").add_subparsers(dest="action", metavar="<action>")
+    reports.required = True
+    command(reports, "summary", _reports_summary, "system summary", formats=ENTITY_FORMATS)
+    report_parsers = [
+        command(reports, "revenue", _reports_revenue, "revenue report", formats=REPORT_FORMATS, lean=True),
+        command(reports, "active-members", _reports_active_members, "active members", formats=REPORT_FORMATS, lean=True),
+        command(reports, "expiring", _reports_expiring, "subscriptions expiring soon", formats=REPORT_FORMATS, lean=True),
+        command(reports, "expired", _reports_expired, "expired subscriptions", formats=REPORT_FORMATS, lean=True),
+        command(reports, "plan-popularity", _reports_plan_popularity, "plan popularity", formats=REPORT_FORMATS),
+        command(reports, "daily", _reports_daily, "daily active subscribers, churn and revenue",
+                formats=REPORT_FORMATS),
+    ]
+    for sub in report_parsers:
+        sub.add_argument("--output", "-o", help="write csv/jsonl output to this file instead of stdout")
+    report_parsers[0].add_argument("--from", dest="start_date", help="start date (YYYY-MM-DD)")
+    report_parsers[0].add_argument("--to", dest="end_date", help="end date (YYYY-MM-DD)")
+    report_parsers[2].add_argument("--days", type=int, default=7)
+    report_parsers[5].add_argument("start_date")
+    report_parsers[5].add_argument("end_date")
+    report_parsers[5].add_argument("--plan", dest="plan_id", type=int, help="only this plan")
+    report_parsers[5].add_argument("--refresh", action="store_true", help="refresh daily metrics first")
+    sub = command(reports, "cohorts", _reports_cohorts, "monthly retention and revenue cohorts")
+    sub.add_argument("--by", choices=COHORT_DIMENSIONS, default="joined",
+                     help="cohort by join month or by first plan")
+    sub.add_argument("--months", type=int, default=12, help="length of the retention curves")
+    sub.add_argument("--engine", choices=("sql", "columnar"), default="sql",
+                     help="compute in SQL or from the in-memory columnar extract")
+
+    # notifications
+    notifications = groups.add_parser("notifications", help="expiry reminders").add_subparsers(dest="action", metavar="<action>")
+    notifications.required = True
+    notification_parsers = [
+        command(notifications, "schedule", _notifications_schedule, "enqueue reminders for subscriptions ending soon"),
+        command(notifications, "drain", _notifications_drain, "send the reminders that are due"),
+        command(notifications, "run", _notifications_run, "schedule and send reminders in a loop"),
+        command(notifications, "stats", _notifications_stats, "reminder counts by status"),
+    ]
+    for sub in notification_parsers:
+        sub.add_argument("--offsets", type=int, nargs="+", default=[7, 3, 1], help="days before the end date")
+        sub.add_argument("--batch-size", type=int, default=100)
+    for sub in notification_parsers[1:3]:
+        sub.add_argument("--output", default=str(Path("data") / "notifications.jsonl"),
+                         help="JSON Lines file the reminders are written to")
+    notification_parsers[1].add_argument("--limit", type=int, help="send at most this many")
+    notification_parsers[2].add_argument("--interval", type=float, default=60.0, help="seconds between runs")
+
+    # change log
+    changes = groups.add_parser("changes", help="row change log").add_subparsers(dest="action", metavar="<action>")
+    changes.required = True
+    sub = command(changes, "list", _changes_list, "changes recorded after a cursor", REPORT_FORMATS)
+    sub.add_argument("--since", type=int, default=0, help="change id to read after")
+    sub.add_argument("--limit", type=int, default=100)
+    sub.add_argument("--table", action="append", choices=database.CHANGE_LOG_TABLES,
+                     help="only this table (repeatable)")
+    command(changes, "stats", _changes_stats, "change log size and consumer cursors")
+
+    # maintenance
+    maintenance = groups.add_parser("maintenance", help="housekeeping jobs").add_subparsers(dest="action", metavar="<action>")
+    maintenance.required = True
+    sub = command(maintenance, "purge-idempotency-keys", _maintenance_purge_idempotency_keys,
+                  "delete expired idempotency keys")
+    sub.add_argument("--batch-size", type=int, default=1000, help="rows deleted per transaction")
+    sub = command(maintenance, "compact-change-log", _maintenance_compact_change_log,
+                  "delete old change log entries")
+    sub.add_argument("--retain-days", type=float, default=7, help="keep entries newer than this")
+    sub.add_argument("--batch-size", type=int, default=5000, help="rows deleted per transaction")
+    sub.add_argument("--force", action="store_true", help="also delete entries consumers have not processed")
+    sub = command(maintenance, "rebuild-balances", _maintenance_rebuild_balances,
+                  "check member balances against the payments table and rebuild them")
+    sub.add_argument("--verify-only", action="store_true", help="report differences without rebuilding")
+    sub = command(maintenance, "lint-queries", _maintenance_lint_queries,
+                  "flag SELECT * in the hot-path modules and the query catalog")
+    sub.add_argument("paths", nargs="*", help="files to check (default: the hot-path modules)")
+    sub = command(maintenance, "refresh-daily-metrics", _maintenance_refresh_daily_metrics,
+                  "compute daily metrics for new days and days touched by edits")
+    sub.add_argument("--until", help="last day to compute (YYYY-MM-DD), defaults to today")
+    sub.add_argument("--full", action="store_true", help="recompute every day from scratch")
+
+    # online backups
+    backup = groups.add_parser("backup", help="online backups, snapshots and restore").add_subparsers(dest="action", metavar="<action>")
+    backup.required = True
+    sub = command(backup, "run", _backup_run, "copy the live database with the backup API")
+    sub.add_argument("--output", "-o", help="backup file (default data/backups/<db>-backup-<time>.db)")
+    sub.add_argument("--pages", type=int, default=DEFAULT_PAGES, help="pages copied per step (-1 copies all at once)")
+    sub.add_argument("--pause", type=float, default=DEFAULT_PAUSE, help="seconds between steps, left to writers")
+    sub.add_argument("--max-restarts", type=int, default=DEFAULT_MAX_RESTARTS,
+                     help="restarts (each with 4x the pages per step) before copying in one step")
+    sub = command(backup, "snapshot", _backup_snapshot, "write a compacted VACUUM INTO snapshot if anything changed")
+    sub.add_argument("--dir", help="snapshot directory (default data/backups)")
+    sub.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="snapshots to keep (0 keeps all)")
+    sub.add_argument("--force", action="store_true", help="write a snapshot even if nothing changed")
+    sub = command(backup, "list", _backup_list, "list backups and snapshots, newest first")
+    sub.add_argument("--dir", help="backup directory (default data/backups)")
+    sub.add_argument("--kind", choices=["backup", "snapshot"])
+    sub = command(backup, "verify", _backup_verify, "check a backup's checksum and integrity")
+    sub.add_argument("path")
+    sub.add_argument("--full", action="store_true", help="run integrity_check instead of quick_check")
+    sub = command(backup, "restore", _backup_restore, "replace the database with a verified backup")
+    sub.add_argument("path")
+    sub.add_argument("--pages", type=int, default=DEFAULT_PAGES, help="pages copied per step")
+    sub.add_argument("--no-safety-backup", action="store_true", help="do not back up the current database first")
+    sub.add_argument("--yes", "-y", action="store_true", help="do not ask for confirmation")
+
+    # snapshot files for read-only reporting processes
+    snapshot = groups.add_parser("snapshot", help="memory-mapped reporting snapshots").add_subparsers(dest="action", metavar="<action>")
+    snapshot.required = True
+    sub = command(snapshot, "write", _snapshot_write, "write a snapshot of the report columns")
+    sub.add_argument("--output", "-o", help="snapshot file (default data/snapshots/reporting.snap)")
+    sub = command(snapshot, "info", _snapshot_info, "show a snapshot's metadata")
+    sub.add_argument("--verify", action="store_true", help="check the data checksum")
+    sub = command(snapshot, "revenue", _snapshot_revenue, "revenue totals from a snapshot")
+    sub.add_argument("--from", dest="start_date", help="start date (YYYY-MM-DD)")
+    sub.add_argument("--to", dest="end_date", help="end date (YYYY-MM-DD)")
+    sub = command(snapshot, "expiry", _snapshot_expiry, "expiring and expired subscriptions from a snapshot")
+    sub.add_argument("--days", type=int, default=7)
+    sub.add_argument("--on", dest="on_date", help="count from this date instead of today")
+    sub = command(snapshot, "cohorts", _snapshot_cohorts, "cohort retention and revenue from a snapshot")
+    sub.add_argument("--by", choices=COHORT_DIMENSIONS, default="joined")
+    sub.add_argument("--months", type=int, default=12)
+    for name in ("info", "revenue", "expiry", "cohorts"):
+        snapshot.choices[name].add_argument("--file", "-f", help="snapshot file (default data/snapshots/reporting.snap)")
+
+    # batch
+    sub = groups.add_parser("batch", help="run commands from a file, one per line")
+    sub.add_argument("file", help="command file, '-' for stdin")
+    sub.add_argument("--stop-on-error", action="store_true")
+    sub.set_defaults(handler=_run_batch, format="table")
+
+    # HTTP/JSON API
+    sub = groups.add_parser("serve", help="run the HTTP/JSON API server")
+    sub.add_argument("--host", default="127.0.0.1")
+    sub.add_argument("--port", type=int, default=8080)
+    sub.add_argument("--workers", type=int, default=8, help="worker threads, each with its own DB connection")
+    sub.add_argument("--queue-size", type=int, default=32, help="requests allowed to wait for a worker")
+    sub.add_argument("--verbose", action="store_true", help="log every request to stderr")
+    sub.set_defaults(handler=_serve, format="table")
+
+    return parser
+
+
+def run(argv: List[str], out=None, err=None, timings: bool = False, label: str = None) -> int:
+    out = out or sys.stdout
+    err = err or sys.stderr
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 2
+
+    if args.db:
+        database.configure_database(args.db)
+    slow_log = open(args.slow_query_log, "a", encoding="utf-8") if args.slow_query_log else None
+    query_stats.configure(enabled=args.query_stats or None, slow_ms=args.slow_query_ms, slow_log=slow_log)
+    metrics_server = start_http_server(args.metrics_port) if args.metrics_port is not None else None
+    metrics_writer = MetricsFileWriter(args.metrics_file, args.metrics_interval).start() if args.metrics_file else None
+
+    args.out = out
+    args.err = err
+    args.timings = args.timings or timings
+    label = label or " ".join(argv)
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler(f"{args.group} {getattr(args, 'action', None) or ''}", args.profile,
+                            args.profile_interval / 1000, args.profile_output)
+
+    started = time.perf_counter()
+    status = 0
+    try:
+        if profiler is not None:
+            profiler.start()
+        # Manager status messages go to stderr so stdout stays machine-readable
+        with redirect_stdout(err):
+            result = args.handler(args)
+        _render(result, args.format, out)
+    except CommandFailed:
+        status = 1
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            path = profiler.write()
+            profiler.summary(err)
+            err.write(f"[profile] collapsed stacks written to {path}\n")
+        if args.timings and args.handler is not _run_batch:
+            elapsed = (time.perf_counter() - started) * 1000
+            err.write(f"[timing] {label}: {elapsed:.2f} ms{' (failed)' if status else ''}\n")
+        if args.query_stats:
+            _dump_query_stats(query_stats.report(args.query_stats_sort), err)
+        if slow_log is not None:
+            query_stats.slow_log = None
+            slow_log.close()
+        if metrics_writer is not None:
+            metrics_writer.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+    return status
+
+
+def _dump_query_stats(entries, err) -> None:
+    rows = [[entry['count'], entry['rows'], entry['errors'], entry['lock_waits'], f"{entry['total_ms']:.2f}",
+             f"{entry['p50_ms']:.2f}", f"{entry['p95_ms']:.2f}", f"{entry['p99_ms']:.2f}", f"{entry['max_ms']:.2f}",
+             entry['statement'] if len(entry['statement']) <= 80 else entry['statement'][:77] + "..."]
+            for entry in entries]
+    with redirect_stdout(err):
+        print_table(["Calls", "Rows", "Errors", "Locked", "Total ms", "p50", "p95", "p99", "Max", "Statement"],
+                    rows, "Query Statistics")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    sys.exit(run(sys.argv[1:] if argv is None else argv))
+
+
+if __name__ == "__main__":
+    main()
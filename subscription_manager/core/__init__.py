@@ -2,14 +2,47 @@ from .members import member_manager, MemberManager
 from .plans import plan_manager, PlanManager
 from .subscriptions import subscription_manager, SubscriptionManager
 from .payments import payment_manager, PaymentManager
+from .exports import export_manager, ExportManager
+from .payment_writer import PaymentWriter
+from .idempotency import idempotency_manager, IdempotencyManager
+from .settlements import settlement_importer, SettlementImporter
+from .daily_metrics import daily_metrics_manager, DailyMetricsManager
+from .cohorts import cohort_engine, CohortEngine
+from .change_log import change_log, ChangeLog, ChangeLogGap
+from .active_snapshot import active_snapshot, ActiveSubscriptionSnapshot
+from .backup import backup_manager, BackupManager, BackupError
+from .notifications import notification_scheduler, NotificationScheduler, NotificationSink, FileNotificationSink
 
 __all__ = [
     'member_manager',
     'plan_manager',
     'subscription_manager', 
     'payment_manager',
+    'export_manager',
+    'idempotency_manager',
+    'settlement_importer',
+    'daily_metrics_manager',
+    'cohort_engine',
+    'notification_scheduler',
+    'active_snapshot',
+    'change_log',
+    'backup_manager',
     'MemberManager',
     'PlanManager',
     'SubscriptionManager',
-    'PaymentManager'
+    'PaymentManager',
+    'ExportManager',
+    'IdempotencyManager',
+    'SettlementImporter',
+    'DailyMetricsManager',
+    'CohortEngine',
+    'NotificationScheduler',
+    'ActiveSubscriptionSnapshot',
+    'ChangeLog',
+    'ChangeLogGap',
+    'BackupManager',
+    'BackupError',
+    'NotificationSink',
+    'FileNotificationSink',
+    'PaymentWriter'
 ]
@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import date
+from typing import List, Optional, Dict, Any, Tuple
+from ..database import execute_query
+from ..queries import QUERIES, SUBSCRIPTION_SPAN_COLUMNS
+from .change_log import change_log, ChangeLogGap
+from ..utils.helpers import parse_date, format_date
+from ..events import emit_error
+from ..metrics import SNAPSHOT_REFRESHES
+
+
+class ActiveSubscriptionSnapshot :
+    """In-memory member_id -> running subscriptions map for hot membership checks.
+
+    load() reads every active, unexpired subscription in one scan. After
+    that, refresh() reads the subscription entries of change_log since the
+    last one applied and re-reads just those rows, so inserts, renewals,
+    cancellations and deletes are all visible after at most max_staleness
+    seconds. A full reload still happens every reload_interval seconds, or
+    straight away when the entries it needs were compacted.
+    """
+
+    def __init__(self, max_staleness: float = 5.0, reload_interval: float = 300.0) :
+        self.max_staleness = max_staleness
+        self.reload_interval = reload_interval
+        self._members: Dict[int, Dict[int, Tuple[int, int]]] = {}
+        self._owners: Dict[int, int] = {}
+        self._change_id = 0
+        self._loaded_at = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _rows_to_spans(self, rows) -> List[Tuple[int, int, int, int]]:
+        spans = []
+        for row in rows :
+            start, end = parse_date(row['start_date']), parse_date(row['end_date'])
+            if start and end :
+                spans.append((row['member_id'], row['id'], start.toordinal(), end.toordinal()))
+        return spans
+
+    def load(self) -> bool:
+        """Rebuild the snapshot from a single scan of subscriptions"""
+        try :
+            # read the cursor first: changes made during the scan are simply applied twice
+            cursor = change_log.latest_id()
+            rows = execute_query(QUERIES['subscriptions.running_spans'])
+            members, owners = {}, {}
+            for member_id, subscription_id, start, end in self._rows_to_spans(rows) :
+                members.setdefault(member_id, {})[subscription_id] = (start, end)
+                owners[subscription_id] = member_id
+
+            with self._lock :
+                self._members = members
+                self._owners = owners
+                self._change_id = cursor
+                self._loaded_at = self._refreshed_at = time.monotonic()
+            SNAPSHOT_REFRESHES.inc(kind="load")
+            return True
+
+        except Exception as e :
+            emit_error(f"Error loading active subscriptions: {str(e)}")
+            return False
+
+    def _discard(self, subscription_id: int) -> None:
+        member_id = self._owners.pop(subscription_id, None)
+        spans = self._members.get(member_id)
+        if spans is not None :
+            spans.pop(subscription_id, None)
+            if not spans :
+                del self._members[member_id]
+
+    def refresh(self, force: bool = False) -> bool:
+        """Apply subscription changes logged since the last refresh, or reload when due"""
+        now = time.monotonic()
+        if force or self._loaded_at is None or now - self._loaded_at >= self.reload_interval :
+            return self.load()
+
+        try :
+            cursor = self._change_id
+            change_log.check_cursor(cursor)
+            changed = set()
+            for batch in change_log.iter_batches(cursor, tables=("subscriptions",)) :
+                changed.update(entry['row_id'] for entry in batch)
+                cursor = batch[-1]['id']
+
+            rows = []
+            ids = sorted(changed)
+            for i in range(0, len(ids), 500) :
+                chunk = ids[i:i + 500]
+                rows.extend(execute_query(f"""
+                    SELECT {SUBSCRIPTION_SPAN_COLUMNS} FROM subscriptions
+                    WHERE id IN ({', '.join('?' for _ in chunk)})
+                    AND is_active = TRUE AND end_date >= date('now')
+                """, tuple(chunk)))
+
+            with self._lock :
+                # deleted, cancelled or expired rows are simply not re-read
+                for subscription_id in changed :
+                    self._discard(subscription_id)
+                for member_id, subscription_id, start, end in self._rows_to_spans(rows) :
+                    self._members.setdefault(member_id, {})[subscription_id] = (start, end)
+                    self._owners[subscription_id] = member_id
+                self._change_id = cursor
+                self._refreshed_at = now
+            SNAPSHOT_REFRESHES.inc(kind="incremental")
+            return True
+
+        except ChangeLogGap :
+            return self.load()
+        except Exception as e :
+            emit_error(f"Error refreshing active subscriptions: {str(e)}")
+            return False
+
+    def _ensure_fresh(self) -> None:
+        if self._refreshed_at is None :
+            with self._refresh_lock :
+                if self._refreshed_at is None :
+                    self.load()
+        elif time.monotonic() - self._refreshed_at >= self.max_staleness :
+            # one thread refreshes, the others keep answering from the current snapshot
+            if self._refresh_lock.acquire(blocking=False) :
+                try :
+                    self.refresh()
+                finally :
+                    self._refresh_lock.release()
+
+    def get_running(self, member_id: int, on_date: date = None) -> List[Dict[str, Any]]:
+        """The member's subscriptions running on on_date (default today)"""
+        self._ensure_fresh()
+        day = (on_date or date.today()).toordinal()
+        spans = self._members.get(member_id) or {}
+        return [
+            {'subscription_id': subscription_id, 'end_date': format_date(date.fromordinal(end))}
+            for subscription_id, (start, end) in sorted(spans.items())
+            if start <= day <= end
+        ]
+
+    def has_active_subscription(self, member_id: int) -> bool:
+        """O(1) check whether the member has a subscription running today"""
+        self._ensure_fresh()
+        day = date.today().toordinal()
+        spans = self._members.get(member_id)
+        return bool(spans) and any(start <= day <= end for start, end in spans.values())
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'members': len(self._members),
+            'subscriptions': sum(len(spans) for spans in self._members.values()),
+            'change_log_cursor': self._change_id,
+            'age_seconds': round(now - self._refreshed_at, 3) if self._refreshed_at is not None else None,
+            'since_full_load_seconds': round(now - self._loaded_at, 3) if self._loaded_at is not None else None
+        }
+
+# Singleton instance
+active_snapshot = ActiveSubscriptionSnapshot()
@@ -0,0 +1,445 @@
+"""Online backups, compacted snapshots, verification and restore.
+
+backup() copies the live database with sqlite3's backup API, a few pages
+per step with a pause in between. A step holds a shared lock only while it
+copies its pages, so writers commit between steps instead of waiting for the
+whole copy. A commit from another connection makes SQLite restart the copy;
+each restart quadruples the pages per step, and after max_restarts the copy
+is taken in one step, so a busy database delays the backup but never stops it.
+
+snapshot() writes a compacted copy with VACUUM INTO. It skips the run when
+the change_log watermark has not moved since the newest snapshot (members,
+plans, subscriptions and payments are unchanged) and keeps the newest `keep`
+snapshots. VACUUM INTO reads the whole database in one transaction,
+so writers wait for it: backup() is the one to run during business hours.
+
+Every file gets a JSON manifest beside it (<file>.json) with its size,
+SHA-256 and change_log watermark. verify() checks the hash and runs
+PRAGMA quick_check. restore() verifies a file and copies it back over the
+database through the backup API, after backing up the current database.
+All three report their throughput while they run.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Callable
+
+from .. import database
+from ..events import emit_success, emit_error, emit_warning, emit_info, confirm
+from ..metrics import BACKUP_RUNS, BACKUP_BYTES
+
+
+DEFAULT_PAGES = 256          # pages copied per backup step
+DEFAULT_PAUSE = 0.02         # seconds between steps, when writers get the lock
+DEFAULT_MAX_RESTARTS = 3        # restarts before copying in one step
+DEFAULT_KEEP = 7             # snapshots kept by snapshot()
+REPORT_INTERVAL = 1.0        # seconds between throughput reports
+MANIFEST_SUFFIX = ".json"
+
+_MIB = 1024 * 1024
+_HASH_CHUNK = _MIB
+_VACUUM_PROGRESS_OPCODES = 100000
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class BackupError(Exception) :
+    """A backup could not be completed or failed verification"""
+
+
+class _Restarted(Exception) :
+    """The source changed under a paged copy"""
+
+
+def default_backup_dir() -> Path:
+    return database.DB_PATH.parent / "backups"
+
+
+def _manifest_path(path: Path) -> Path:
+    return path.with_name(path.name + MANIFEST_SUFFIX)
+
+
+def _open_readonly(path: Path) -> sqlite3.Connection:
+    return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def _change_id(conn: sqlite3.Connection) -> int:
+    try :
+        row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    except sqlite3.OperationalError :
+        return 0
+    return row[0] if row else 0
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle :
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK), b"") :
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def format_progress(report: Dict[str, Any]) -> str:
+    return (f"{report['label']}: {report['percent']:.1f}% "
+            f"({report['bytes_done'] / _MIB:.1f} of {report['bytes_total'] / _MIB:.1f} MiB), "
+            f"{report['mib_per_s']:.1f} MiB/s")
+
+
+class _Progress :
+    """Throughput of one copy, reported at most every REPORT_INTERVAL seconds"""
+
+    def __init__(self, label: str, callback: ProgressCallback = None, interval: float = REPORT_INTERVAL) :
+        self.label = label
+        self.callback = callback
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._reported = self.started
+        self.bytes_done = 0
+        self.bytes_total = 0
+
+    def due(self) -> bool:
+        return time.perf_counter() - self._reported >= self.interval
+
+    def update(self, bytes_done: int, bytes_total: int) -> None:
+        self.bytes_done, self.bytes_total = bytes_done, bytes_total
+        if not self.due() :
+            return
+        self._reported = time.perf_counter()
+        report = self.report()
+        if self.callback is not None :
+            self.callback(report)
+        else :
+            emit_info(format_progress(report))
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            'label': self.label,
+            'bytes_done': self.bytes_done,
+            'bytes_total': self.bytes_total,
+            'percent': 100.0 * self.bytes_done / self.bytes_total if self.bytes_total else 100.0,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'mib_per_s': round(self.bytes_done / _MIB / elapsed, 2),
+        }
+
+
+class BackupManager :
+    """Backups and snapshots of the database file; see the module docstring"""
+
+    def _new_path(self, directory: Path, kind: str) -> Path:
+        stem = f"{database.DB_PATH.stem}-{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        path, n = directory / f"{stem}.db", 1
+        while path.exists() or _manifest_path(path).exists() :
+            n += 1
+            path = directory / f"{stem}-{n}.db"
+        return path
+
+    def _copy(self, source: sqlite3.Connection, target: sqlite3.Connection, pages: int, pause: float,
+              max_restarts: int, tracker: _Progress) -> Dict[str, int]:
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+        state = {'steps': 0, 'remaining': None, 'total': 0}
+
+        def step(status, remaining, total) :
+            if state['remaining'] is not None and remaining > state['remaining'] :
+                raise _Restarted()
+            state['steps'] += 1
+            state['remaining'], state['total'] = remaining, total
+            tracker.update((total - remaining) * page_size, total * page_size)
+            if remaining and pause > 0 :
+                # no lock is held between steps, so writers commit here
+                time.sleep(pause)
+
+        restarts = 0
+        while True :
+            state['remaining'] = None
+            try :
+                source.backup(target, pages=pages, progress=step)
+                break
+            except _Restarted :
+                # another connection wrote to the source and SQLite started over;
+                # take bigger steps so the copy fits between writes, and make the
+                # last attempt a single step, which holds the lock to the end
+                restarts += 1
+                if restarts >= max_restarts or pages <= 0 :
+                    pages = -1
+                else :
+                    pages *= 4
+                emit_warning(f"{tracker.label}: the database changed during the copy, restarting with "
+                             f"{'all pages in one step' if pages < 0 else f'{pages} pages per step'}")
+        tracker.bytes_done = tracker.bytes_total = state['total'] * page_size
+        return {'pages': state['total'], 'page_size': page_size,
+                'steps': state['steps'], 'restarts': restarts}
+
+    def _finish(self, tmp: Path, path: Path, kind: str, tracker: _Progress, details: Dict[str, Any]) -> Dict[str, Any]:
+        """Move a completed copy into place and write its manifest"""
+        conn = _open_readonly(tmp)
+        try :
+            change_id = _change_id(conn)
+        finally :
+            conn.close()
+        os.replace(tmp, path)
+        report = tracker.report()
+        manifest = {
+            'kind': kind,
+            'file': path.name,
+            'created_at': datetime.now().isoformat(timespec="seconds"),
+            'source': str(database.DB_PATH),
+            'change_id': change_id,
+            'size': path.stat().st_size,
+            'sha256': _sha256(path),
+            'elapsed_ms': report['elapsed_ms'],
+            'mib_per_s': report['mib_per_s'],
+        }
+        manifest.update(details)
+        manifest_path = _manifest_path(path)
+        tmp_manifest = manifest_path.with_name(manifest_path.name + ".tmp")
+        tmp_manifest.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_manifest, manifest_path)
+        BACKUP_BYTES.inc(manifest['size'], kind=kind)
+        return dict(manifest, path=str(path))
+
+    def _backup(self, path: Optional[Path], pages: int, pause: float, max_restarts: int,
+                progress: ProgressCallback, name: str = "backup") -> Dict[str, Any]:
+        path = Path(path) if path else self._new_path(default_backup_dir(), name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".partial")
+        if tmp.exists() :
+            tmp.unlink()
+        tracker = _Progress("Backup", progress)
+        try :
+            source = database.get_db_connection()
+            try :
+                target = sqlite3.connect(str(tmp))
+                try :
+                    details = self._copy(source, target, pages, pause, max_restarts, tracker)
+                finally :
+                    target.close()
+            finally :
+                source.close()
+            return self._finish(tmp, path, "backup", tracker, details)
+        except BaseException :
+            if tmp.exists() :
+                tmp.unlink()
+            raise
+
+    def backup(self, path: str = None, pages: int = DEFAULT_PAGES, pause: float = DEFAULT_PAUSE,
+               max_restarts: int = DEFAULT_MAX_RESTARTS, progress: ProgressCallback = None) -> Optional[Dict[str, Any]]:
+        """Copy the live database to path (default backups/<db>-backup-<time>.db), pages per
+        step with pause seconds between steps. Returns the manifest, None on failure."""
+        try :
+            manifest = self._backup(path, pages, pause, max_restarts, progress)
+        except Exception as e :
+            BACKUP_RUNS.inc(kind="backup", outcome="error")
+            emit_error(f"Error backing up database: {str(e)}")
+            return None
+        BACKUP_RUNS.inc(kind="backup", outcome="ok")
+        emit_success(f"Backed up {manifest['size'] / _MIB:.1f} MiB to {manifest['path']} "
+                     f"in {manifest['elapsed_ms'] / 1000:.2f}s ({manifest['mib_per_s']:.1f} MiB/s)")
+        return manifest
+
+    def _snapshot(self, directory: Path, keep: int, force: bool, progress: ProgressCallback) -> Dict[str, Any]:
+        conn = database.get_db_connection()
+        try :
+            # not the file's mtime: init_database() writes to it in every process
+            change_id = _change_id(conn)
+            previous = self._list(directory, "snapshot")
+            latest = previous[0] if previous else None
+            if latest is not None and not force and latest['change_id'] == change_id :
+                emit_info(f"No changes since snapshot {latest['file']}")
+                return dict(latest, skipped=True)
+
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            used_pages = (conn.execute("PRAGMA page_count").fetchone()[0]
+                          - conn.execute("PRAGMA freelist_count").fetchone()[0])
+            path = self._new_path(directory, "snapshot")
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".partial")
+            tracker = _Progress("Snapshot", progress)
+
+            def report() :
+                # VACUUM INTO has no page count to hand out; the output file's size tracks it
+                if tracker.due() :
+                    tracker.update(tmp.stat().st_size if tmp.exists() else 0, used_pages * page_size)
+                return 0
+
+            conn.set_progress_handler(report, _VACUUM_PROGRESS_OPCODES)
+            try :
+                conn.execute("VACUUM INTO ?", (str(tmp),))
+            except BaseException :
+                if tmp.exists() :
+                    tmp.unlink()
+                raise
+            finally :
+                conn.set_progress_handler(None, 0)
+        finally :
+            conn.close()
+
+        tracker.bytes_done = tracker.bytes_total = tmp.stat().st_size
+        manifest = self._finish(tmp, path, "snapshot", tracker, {
+            'previous': latest['file'] if latest else None,
+            'changes': change_id - latest['change_id'] if latest else None,
+        })
+        if keep > 0 :
+            for old in previous[keep - 1:] :
+                self._delete(Path(old['path']))
+        return manifest
+
+    def snapshot(self, directory: str = None, keep: int = DEFAULT_KEEP, force: bool = False,
+                 progress: ProgressCallback = None) -> Optional[Dict[str, Any]]:
+        """Write a compacted snapshot with VACUUM INTO unless the change_log watermark has not
+        moved since the newest one (force writes it anyway); keeps the newest keep snapshots
+        (0 keeps all)."""
+        directory = Path(directory) if directory else default_backup_dir()
+        try :
+            manifest = self._snapshot(directory, keep, force, progress)
+        except Exception as e :
+            BACKUP_RUNS.inc(kind="snapshot", outcome="error")
+            emit_error(f"Error writing snapshot: {str(e)}")
+            return None
+        if manifest.get('skipped') :
+            BACKUP_RUNS.inc(kind="snapshot", outcome="skipped")
+            return manifest
+        BACKUP_RUNS.inc(kind="snapshot", outcome="ok")
+        emit_success(f"Snapshot of {manifest['size'] / _MIB:.1f} MiB written to {manifest['path']} "
+                     f"in {manifest['elapsed_ms'] / 1000:.2f}s ({manifest['mib_per_s']:.1f} MiB/s)")
+        return manifest
+
+    def _delete(self, path: Path) -> None:
+        for file in (path, _manifest_path(path)) :
+            if file.exists() :
+                file.unlink()
+
+    def _read_manifest(self, path: Path) -> Optional[Dict[str, Any]]:
+        manifest_path = _manifest_path(path)
+        if not manifest_path.exists() :
+            return None
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    def _list(self, directory: Path, kind: str = None) -> List[Dict[str, Any]]:
+        manifests = []
+        if not directory.is_dir() :
+            return manifests
+        for manifest_path in directory.glob(f"*.db{MANIFEST_SUFFIX}") :
+            try :
+                manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) :
+                continue
+            if kind is not None and manifest.get('kind') != kind :
+                continue
+            manifest['path'] = str(directory / manifest['file'])
+            # created_at is to the second; the manifest's mtime orders runs within one
+            manifest['_written'] = manifest_path.stat().st_mtime_ns
+            manifests.append(manifest)
+        manifests.sort(key=lambda manifest: (manifest['created_at'], manifest['_written']), reverse=True)
+        for manifest in manifests :
+            del manifest['_written']
+        return manifests
+
+    def list_backups(self, directory: str = None, kind: str = None) -> List[Dict[str, Any]]:
+        """Manifests of the backups and snapshots in directory, newest first"""
+        try :
+            return self._list(Path(directory) if directory else default_backup_dir(), kind)
+        except Exception as e :
+            emit_error(f"Error listing backups: {str(e)}")
+            return []
+
+    def _verify(self, path: Path, full: bool) -> Dict[str, Any]:
+        if not path.is_file() :
+            raise BackupError(f"{path} does not exist")
+        started = time.perf_counter()
+        manifest = self._read_manifest(path)
+        size = path.stat().st_size
+        digest = _sha256(path)
+        if manifest is not None :
+            if size != manifest['size'] or digest != manifest['sha256'] :
+                raise BackupError(f"{path} does not match its manifest (expected sha256 {manifest['sha256']}, "
+                                  f"got {digest})")
+        pragma = "integrity_check" if full else "quick_check"
+        conn = _open_readonly(path)
+        try :
+            problems = [row[0] for row in conn.execute(f"PRAGMA {pragma}").fetchall()]
+            change_id = _change_id(conn)
+        finally :
+            conn.close()
+        if problems != ["ok"] :
+            raise BackupError(f"{path} failed {pragma}: {problems[0]}")
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        return {
+            'path': str(path),
+            'size': size,
+            'sha256': digest,
+            'checksum': "ok" if manifest is not None else "no manifest",
+            pragma: "ok",
+            'change_id': change_id,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'mib_per_s': round(size / _MIB / elapsed, 2),
+        }
+
+    def verify(self, path: str, full: bool = False) -> Optional[Dict[str, Any]]:
+        """Check a backup against its manifest's SHA-256 and run PRAGMA quick_check on it
+        (integrity_check with full). Returns the result, None if it fails."""
+        try :
+            result = self._verify(Path(path), full)
+        except Exception as e :
+            BACKUP_RUNS.inc(kind="verify", outcome="error")
+            emit_error(f"Backup verification failed: {str(e)}")
+            return None
+        BACKUP_RUNS.inc(kind="verify", outcome="ok")
+        emit_success(f"{path} verified ({result['checksum']} checksum, "
+                     f"{result['size'] / _MIB:.1f} MiB at {result['mib_per_s']:.1f} MiB/s)")
+        return result
+
+    def _restore(self, path: Path, pages: int, safety_backup: bool, progress: ProgressCallback) -> Dict[str, Any]:
+        checked = self._verify(path, full=False)
+        result = {'restored_from': str(path), 'sha256': checked['sha256'], 'safety_backup': None}
+        if safety_backup and database.DB_PATH.exists() :
+            result['safety_backup'] = self._backup(None, DEFAULT_PAGES, DEFAULT_PAUSE, DEFAULT_MAX_RESTARTS,
+                                                   progress, name="pre-restore")['path']
+
+        tracker = _Progress("Restore", progress)
+        source = _open_readonly(path)
+        try :
+            target = database.get_db_connection()
+            try :
+                # the target stays locked from the first step to the last, so
+                # pausing between steps would only keep writers waiting longer
+                details = self._copy(source, target, pages, 0, 0, tracker)
+                result['change_id'] = _change_id(target)
+            finally :
+                target.close()
+        finally :
+            source.close()
+        result.update(details)
+        result.update({key: value for key, value in tracker.report().items() if key in ('elapsed_ms', 'mib_per_s')})
+        result['size'] = tracker.bytes_total
+        BACKUP_BYTES.inc(result['size'], kind="restore")
+        return result
+
+    def restore(self, path: str, pages: int = DEFAULT_PAGES, safety_backup: bool = True,
+                progress: ProgressCallback = None, confirmed: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """Verify a backup and copy it over the database, after backing up the current
+        database (unless safety_backup is False). Asks first unless confirmed is given.
+        Returns the result, None on failure."""
+        if confirmed is None :
+            emit_warning(f"This replaces every row in {database.DB_PATH} with the contents of {path}.")
+            confirmed = confirm("Do you confirm restoring the backup ?")
+        if not confirmed :
+            emit_info("Restore cancelled")
+            return None
+        try :
+            result = self._restore(Path(path), pages, safety_backup, progress)
+        except Exception as e :
+            BACKUP_RUNS.inc(kind="restore", outcome="error")
+            emit_error(f"Error restoring backup: {str(e)}")
+            return None
+        BACKUP_RUNS.inc(kind="restore", outcome="ok")
+        emit_success(f"Restored {database.DB_PATH} from {path} ({result['mib_per_s']:.1f} MiB/s)")
+        return result
+
+
+# Singleton instance
+backup_manager = BackupManager()
@@ -0,0 +1,159 @@
+from typing import List, Optional, Dict, Any, Iterator, Callable, Iterable
+from ..database import execute_query, transaction, set_job_state, CHANGE_LOG_TABLES
+from ..events import emit_success, emit_error, emit_warning
+
+
+CURSOR_PREFIX = "change_log.cursor."
+
+
+class ChangeLogGap(Exception) :
+    """The entries after a cursor were compacted away; the consumer must resync"""
+
+
+class ChangeLog :
+    """Reader for change_log, the trigger-maintained list of row changes.
+
+    Each entry is (id, table_name, row_id, op, changed_at) with op one of
+    insert / update / delete. Entries only say which row changed; consumers
+    re-read the row (or note that it is gone). Cursors are change_log ids:
+    read_since(cursor) returns the entries after it. Named consumers keep
+    their cursor in job_state so they can resume after a restart, and
+    compact() never deletes entries a named consumer has not processed yet.
+    """
+
+    def __init__(self, batch_size: int = 1000) :
+        self.batch_size = batch_size
+
+    def latest_id(self) -> int:
+        """Id of the newest entry; a watermark that moves on every write"""
+        # the AUTOINCREMENT sequence survives compaction, MAX(id) would not
+        rows = execute_query("SELECT COALESCE(MAX(seq), 0) as latest FROM sqlite_sequence WHERE name = 'change_log'")
+        return rows[0]['latest'] if rows else 0
+
+    def check_cursor(self, cursor: int) -> None:
+        """Raise ChangeLogGap if entries after cursor have been compacted"""
+        # an empty log after compaction still has a gap up to the last id issued
+        rows = execute_query("""
+            SELECT COALESCE(
+                (SELECT MIN(id) FROM change_log),
+                (SELECT seq + 1 FROM sqlite_sequence WHERE name = 'change_log')
+            ) as first
+        """)
+        first = rows[0]['first'] if rows else None
+        if first is not None and cursor + 1 < first :
+            raise ChangeLogGap(f"Changes after {cursor} were compacted (oldest entry is {first})")
+
+    def read_since(self, cursor: int, limit: int = None,
+                   tables: Iterable[str] = None) -> List[Dict[str, Any]]:
+        """Up to limit entries with id > cursor, oldest first"""
+        query = "SELECT id, table_name, row_id, op, changed_at FROM change_log WHERE id > ?"
+        params = [cursor]
+        if tables :
+            tables = list(tables)
+            query += f" AND table_name IN ({', '.join('?' for _ in tables)})"
+            params.extend(tables)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit or self.batch_size)
+        return [dict(row) for row in execute_query(query, tuple(params))]
+
+    def iter_batches(self, cursor: int, tables: Iterable[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Batches of entries after cursor until the log is exhausted"""
+        tables = list(tables) if tables else None
+        while True :
+            batch = self.read_since(cursor, self.batch_size, tables)
+            if not batch :
+                return
+            yield batch
+            cursor = batch[-1]['id']
+
+    def get_cursor(self, consumer: str) -> int:
+        rows = execute_query("SELECT value FROM job_state WHERE name = ?", (CURSOR_PREFIX + consumer,))
+        return int(rows[0]['value']) if rows and rows[0]['value'] else 0
+
+    def set_cursor(self, consumer: str, cursor: int) -> None:
+        with transaction() as conn :
+            set_job_state(conn, CURSOR_PREFIX + consumer, str(cursor))
+
+    def consume(self, consumer: str, handler: Callable[[List[Dict[str, Any]]], None],
+                tables: Iterable[str] = None) -> Optional[int]:
+        """Feed a named consumer every entry after its cursor, batch by batch.
+
+        The cursor is advanced after each batch the handler returns from,
+        so a crash replays at most one batch. Returns the number of entries
+        handled, or None on error (including ChangeLogGap).
+        """
+        handled = 0
+        try :
+            cursor = self.get_cursor(consumer)
+            self.check_cursor(cursor)
+            for batch in self.iter_batches(cursor, tables) :
+                handler(batch)
+                self.set_cursor(consumer, batch[-1]['id'])
+                handled += len(batch)
+            return handled
+        except ChangeLogGap as e :
+            emit_error(f"Consumer '{consumer}' must resync: {str(e)}")
+            return None
+        except Exception as e :
+            emit_error(f"Error consuming change log for '{consumer}': {str(e)}")
+            return None
+
+    def consumers(self) -> Dict[str, int]:
+        rows = execute_query("SELECT name, value FROM job_state WHERE name LIKE ?", (CURSOR_PREFIX + "%",))
+        return {row['name'][len(CURSOR_PREFIX):]: int(row['value'] or 0) for row in rows}
+
+    def compact(self, retain_days: float = 7, batch_size: int = 5000, force: bool = False) -> int:
+        """Delete entries older than retain_days, batch_size per transaction.
+
+        Entries a named consumer has not processed yet are kept unless force
+        is set. Returns the number of entries deleted.
+        """
+        deleted_total = 0
+        try :
+            consumers = self.consumers()
+            upper = min(consumers.values()) if consumers and not force else None
+            if upper is not None and upper < self.latest_id() :
+                lagging = [name for name, cursor in consumers.items() if cursor == upper]
+                emit_warning(f"Keeping changes not yet processed by: {', '.join(lagging)}")
+
+            query = """
+                DELETE FROM change_log WHERE id IN (
+                    SELECT id FROM change_log
+                    WHERE changed_at < strftime('%Y-%m-%d %H:%M:%f', 'now', ?)
+                    AND id <= ?
+                    ORDER BY id
+                    LIMIT ?
+                )
+            """
+            while True :
+                with transaction() as conn :
+                    limit_id = upper if upper is not None else conn.execute(
+                        "SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+                    deleted = conn.execute(query, (f"-{float(retain_days)} days", limit_id, batch_size)).rowcount
+                deleted_total += deleted
+                if deleted < batch_size :
+                    break
+            emit_success(f"Compacted {deleted_total} change log entries")
+            return deleted_total
+
+        except Exception as e :
+            emit_error(f"Error compacting change log: {str(e)}")
+            return deleted_total
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'entries': 0, 'oldest_id': None, 'latest_id': None, 'by_table': {},
+                 'consumers': {}}
+        try :
+            row = execute_query("SELECT COUNT(*) as entries, MIN(id) as oldest, MAX(id) as latest FROM change_log")[0]
+            stats.update(entries=row['entries'], oldest_id=row['oldest'], latest_id=row['latest'])
+            stats['by_table'] = {table: 0 for table in CHANGE_LOG_TABLES}
+            for table_row in execute_query("SELECT table_name, COUNT(*) as count FROM change_log GROUP BY table_name") :
+                stats['by_table'][table_row['table_name']] = table_row['count']
+            stats['consumers'] = self.consumers()
+            return stats
+        except Exception as e :
+            emit_error(f"Error retrieving change log statistics: {str(e)}")
+            return stats
+
+# Singleton instance
+change_log = ChangeLog()
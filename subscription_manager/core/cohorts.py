@@ -0,0 +1,181 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import List, Optional, Dict, Any, Tuple
+from .. import database
+from ..database import execute_query
+from .change_log import change_log
+from ..events import emit_error
+from ..metrics import CACHE_REQUESTS
+
+
+COHORT_DIMENSIONS = ("joined", "plan")
+
+MONTH_INDEX = "(CAST(strftime('%Y', {0}) AS INTEGER) * 12 + CAST(strftime('%m', {0}) AS INTEGER) - 1)"
+
+# Where each member starts counting from, per dimension. "joined" groups by
+# the month of members.date_joined; "plan" groups by the plan of the member's
+# first subscription, counting from the month that subscription started.
+_COHORT_BASES = {
+    'joined': f"""
+        SELECT id as member_id, strftime('%Y-%m', date_joined) as cohort,
+               {MONTH_INDEX.format('date_joined')} as base_month
+        FROM members
+        WHERE date_joined IS NOT NULL
+    """,
+    'plan': f"""
+        SELECT s.member_id, p.name as cohort, {MONTH_INDEX.format('s.start_date')} as base_month
+        FROM subscriptions s
+        JOIN plans p ON s.plan_id = p.id
+        WHERE s.id = (
+            SELECT s2.id FROM subscriptions s2
+            WHERE s2.member_id = s.member_id
+            ORDER BY s2.start_date, s2.id LIMIT 1
+        )
+    """,
+}
+
+# One statement yields cohort sizes (month_offset NULL), members with a
+# subscription running in each month since their start, and revenue per month.
+COHORT_QUERY = f"""
+    WITH RECURSIVE
+    base AS ({{base}}),
+    spans AS (
+        SELECT s.member_id, {MONTH_INDEX.format('s.start_date')} as month,
+               MIN({MONTH_INDEX.format('s.end_date')}, :current_month) as last_month
+        FROM subscriptions s
+        WHERE s.is_active = TRUE
+    ),
+    months AS (
+        SELECT member_id, month, last_month FROM spans WHERE month <= last_month
+        UNION ALL
+        SELECT member_id, month + 1, last_month FROM months WHERE month < last_month
+    )
+    SELECT cohort, month_offset, SUM(members) as members, SUM(active) as active, SUM(revenue) as revenue
+    FROM (
+        SELECT cohort, NULL as month_offset, COUNT(*) as members, 0 as active, 0 as revenue
+        FROM base
+        GROUP BY cohort
+
+        UNION ALL
+
+        SELECT b.cohort, m.month - b.base_month, 0, COUNT(DISTINCT m.member_id), 0
+        FROM months m
+        JOIN base b ON m.member_id = b.member_id
+        WHERE m.month - b.base_month BETWEEN 0 AND :max_months
+        GROUP BY b.cohort, m.month - b.base_month
+
+        UNION ALL
+
+        SELECT b.cohort, {MONTH_INDEX.format('p.payment_date')} - b.base_month, 0, 0, SUM(p.amount)
+        FROM payments p
+        JOIN subscriptions s ON p.subscription_id = s.id
+        JOIN base b ON s.member_id = b.member_id
+        WHERE {MONTH_INDEX.format('p.payment_date')} - b.base_month BETWEEN 0 AND :max_months
+        GROUP BY b.cohort, {MONTH_INDEX.format('p.payment_date')} - b.base_month
+    )
+    GROUP BY cohort, month_offset
+    ORDER BY cohort, month_offset
+"""
+
+
+def build_cohorts(rows, by: str, current_month: int, max_months: int) -> List[Dict[str, Any]]:
+    """Cohort entries from (cohort, month_offset, members, active, revenue) rows,
+    ordered by cohort with each cohort's size row (month_offset None) first"""
+    cohorts = OrderedDict()
+    for row in rows :
+        cohort = cohorts.setdefault(row['cohort'], {'size': 0, 'active': {}, 'revenue': {}})
+        if row['month_offset'] is None :
+            cohort['size'] = row['members']
+        else :
+            cohort['active'][row['month_offset']] = row['active']
+            cohort['revenue'][row['month_offset']] = row['revenue']
+
+    result = []
+    for name, cohort in cohorts.items() :
+        if by == "joined" :
+            # a cohort's curve stops at the current month
+            year, month = (int(part) for part in name.split("-"))
+            months = min(max_months, current_month - (year * 12 + month - 1))
+        else :
+            months = max(cohort['active'] or cohort['revenue'] or {0: 0})
+        offsets = range(months + 1)
+        size = cohort['size']
+        active = [cohort['active'].get(offset, 0) for offset in offsets]
+        revenue = [round(float(cohort['revenue'].get(offset, 0.0)), 2) for offset in offsets]
+        result.append({
+            'cohort': name,
+            'size': size,
+            'active': active,
+            'retention': [round(count / size, 4) if size else 0.0 for count in active],
+            'revenue': revenue,
+            'total_revenue': round(sum(revenue), 2)
+        })
+    return result
+
+
+class CohortEngine :
+    """Monthly cohort retention and revenue.
+
+    Each cohort gets a retention curve (share of its members with a running
+    subscription in month 0, 1, 2, ... after they started) and the revenue
+    paid in each of those months. The whole matrix comes from one SQL
+    statement. Results are cached under the data watermark, so repeated
+    reports cost nothing until members, subscriptions or payments change.
+    """
+
+    def __init__(self, cache_size: int = 32) :
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def watermark(self) -> Tuple:
+        """Changes whenever a member, plan, subscription or payment is written"""
+        return (str(database.DB_PATH), change_log.latest_id())
+
+    def get_cohorts(self, by: str = "joined", max_months: int = 12,
+                    use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        if by not in COHORT_DIMENSIONS :
+            emit_error(f"Unknown cohort dimension '{by}'. Use one of: {', '.join(COHORT_DIMENSIONS)}")
+            return None
+        if max_months < 0 :
+            emit_error("Number of months cannot be negative")
+            return None
+
+        try :
+            today = date.today()
+            key = (by, max_months, today, self.watermark())
+            if use_cache :
+                with self._lock :
+                    if key in self._cache :
+                        self._cache.move_to_end(key)
+                        CACHE_REQUESTS.inc(cache="cohorts", result="hit")
+                        return self._cache[key]
+                CACHE_REQUESTS.inc(cache="cohorts", result="miss")
+
+            current_month = today.year * 12 + today.month - 1
+            rows = execute_query(COHORT_QUERY.format(base=_COHORT_BASES[by]),
+                                 {'current_month': current_month, 'max_months': max_months})
+            result = {
+                'by': by,
+                'months': max_months,
+                'cohorts': build_cohorts(rows, by, current_month, max_months)
+            }
+
+            with self._lock :
+                self._cache[key] = result
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size :
+                    self._cache.popitem(last=False)
+            return result
+
+        except Exception as e :
+            emit_error(f"Error computing cohorts: {str(e)}")
+            return None
+
+    def clear_cache(self) -> None:
+        with self._lock :
+            self._cache.clear()
+
+# Singleton instance
+cohort_engine = CohortEngine()
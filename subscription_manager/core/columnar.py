@@ -0,0 +1,455 @@
+"""Columnar extract of payments and subscriptions for the aggregate reports.
+
+ColumnarAnalytics.extract() reads each table once into flat array-module
+columns: ids as int32, amounts as int64 cents, dates as int32 day ordinals
+(date.toordinal()) and month indexes. Payments are kept sorted by day and
+subscriptions by end day, so a date range is two bisects and a slice.
+
+The revenue, expiry and cohort reports are then passes over those columns
+instead of loops over Payment / Subscription objects. With NumPy installed
+the columns are wrapped as zero-copy ndarray views and every pass is
+vectorized; without it the array backend sticks to C-level builtins (sum,
+slicing, bisect, itertools.compress) wherever the report allows.
+"""
+import heapq
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from datetime import date
+from itertools import compress
+from typing import List, Optional, Dict, Any, Tuple
+
+try :
+    import numpy
+except ImportError :
+    numpy = None
+
+from .. import database
+from ..database import execute_query_rows
+from .change_log import change_log
+from .cohorts import COHORT_DIMENSIONS, MONTH_INDEX, build_cohorts
+from ..utils.helpers import parse_date
+from ..utils.validators import validate_payment_date_range
+from ..events import emit_error
+from ..metrics import CACHE_REQUESTS
+
+
+BACKENDS = ("array", "numpy")
+DEFAULT_BACKEND = "numpy" if numpy is not None else "array"
+
+INT32, INT64, FLAG = 'i', 'q', 'b'
+
+# date.toordinal() of an ISO date: julianday('0001-01-01') is 1721425.5
+DAY_ORDINAL = "CAST(julianday({0}) - 1721424.5 AS INTEGER)"
+NO_MONTH = -1
+
+# table -> ((column, typecode), ...) in SELECT order
+SCHEMA = {
+    'payments': (('id', INT32), ('subscription_id', INT32), ('member_id', INT32), ('plan_id', INT32),
+                 ('cents', INT64), ('day', INT32), ('month', INT32)),
+    'subscriptions': (('id', INT32), ('member_id', INT32), ('plan_id', INT32), ('start_day', INT32),
+                      ('end_day', INT32), ('start_month', INT32), ('end_month', INT32), ('is_active', FLAG)),
+    'members': (('id', INT32), ('joined_month', INT32)),
+    'plans': (('id', INT32), ('price_cents', INT64)),
+}
+
+EXTRACT_QUERIES = {
+    'payments': f"""
+        SELECT p.id, p.subscription_id, s.member_id, s.plan_id, CAST(ROUND(p.amount * 100) AS INTEGER),
+               {DAY_ORDINAL.format('p.payment_date')}, {MONTH_INDEX.format('p.payment_date')}
+        FROM payments p
+        JOIN subscriptions s ON p.subscription_id = s.id
+        ORDER BY p.payment_date, p.id
+    """,
+    'subscriptions': f"""
+        SELECT id, member_id, plan_id, {DAY_ORDINAL.format('start_date')}, {DAY_ORDINAL.format('end_date')},
+               {MONTH_INDEX.format('start_date')}, {MONTH_INDEX.format('end_date')}, is_active
+        FROM subscriptions
+        ORDER BY end_date, id
+    """,
+    'members': f"""
+        SELECT id, COALESCE({MONTH_INDEX.format('date_joined')}, {NO_MONTH})
+        FROM members
+        ORDER BY id
+    """,
+    'plans': "SELECT id, CAST(ROUND(price * 100) AS INTEGER) FROM plans ORDER BY id",
+}
+
+
+def _fetch_tuples(query: str, conn=None) -> List[tuple]:
+    if conn is None :
+        return execute_query_rows(query)[1]
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(query).fetchall()
+
+
+def typecode(column) -> str:
+    """array typecode of a column held as an array or as a cast memoryview"""
+    return getattr(column, 'typecode', None) or column.format
+
+
+def _month_label(month: int) -> str:
+    return f"{month // 12:04d}-{month % 12 + 1:02d}"
+
+
+class ColumnarExtract :
+    """One read of payments, subscriptions, members and plans as typed columns"""
+
+    def __init__(self, tables: Dict[str, Dict[str, array]], plan_names: Dict[int, str], watermark: Tuple) :
+        self.tables = tables
+        self.plan_names = plan_names
+        self.watermark = watermark
+
+    @classmethod
+    def load(cls, watermark: Tuple = None, conn=None) -> "ColumnarExtract":
+        """Read the tables; pass conn (inside a read transaction) for one consistent view"""
+        tables = {}
+        for table, schema in SCHEMA.items() :
+            rows = _fetch_tuples(EXTRACT_QUERIES[table], conn)
+            values = list(zip(*rows)) if rows else [()] * len(schema)
+            tables[table] = {name: array(typecode, column) for (name, typecode), column in zip(schema, values)}
+        plan_rows = _fetch_tuples("SELECT id, name FROM plans", conn)
+        return cls(tables, dict(plan_rows), watermark)
+
+    def __len__(self) -> int:
+        return len(self.tables['payments']['id']) + len(self.tables['subscriptions']['id'])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(column) * column.itemsize for columns in self.tables.values() for column in columns.values())
+
+    def columns(self, table: str, backend: str = "array") -> Dict[str, Any]:
+        """The table's columns, as ndarray views over the same buffers for the numpy backend"""
+        columns = self.tables[table]
+        if backend == "numpy" :
+            return {name: numpy.frombuffer(column, dtype=typecode(column)) for name, column in columns.items()}
+        return columns
+
+
+class ColumnarAnalytics :
+    """Revenue, expiry and cohort reports computed from a ColumnarExtract.
+
+    The extract is cached under the same data watermark as the cohort engine
+    and reloaded on the next report after any member, plan, subscription or
+    payment write. With snapshot_path the columns come from a snapshot file
+    instead (see report_snapshot.py) and the database is never opened; the
+    file is re-mapped when a newer snapshot replaces it.
+    """
+
+    def __init__(self, backend: str = None, snapshot_path: str = None) :
+        backend = backend or DEFAULT_BACKEND
+        if backend not in BACKENDS :
+            raise ValueError(f"Unknown backend '{backend}'. Use one of: {', '.join(BACKENDS)}")
+        if backend == "numpy" and numpy is None :
+            raise ValueError("The numpy backend needs NumPy installed")
+        self.backend = backend
+        self.snapshot_path = snapshot_path
+        self._extract = None
+        self._lock = threading.Lock()
+
+    def watermark(self) -> Tuple:
+        if self.snapshot_path :
+            stat = os.stat(self.snapshot_path)
+            return (str(self.snapshot_path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return (str(database.DB_PATH), change_log.latest_id())
+
+    def extract(self, use_cache: bool = True) -> ColumnarExtract:
+        watermark = self.watermark()
+        with self._lock :
+            if use_cache and self._extract is not None and self._extract.watermark == watermark :
+                CACHE_REQUESTS.inc(cache="columnar", result="hit")
+                return self._extract
+            CACHE_REQUESTS.inc(cache="columnar", result="miss")
+            if self.snapshot_path :
+                from .report_snapshot import SnapshotReader
+                # the previous mapping is released once no report holds its columns
+                self._extract = SnapshotReader(self.snapshot_path).extract(watermark)
+            else :
+                self._extract = ColumnarExtract.load(watermark)
+            return self._extract
+
+    def clear_cache(self) -> None:
+        with self._lock :
+            self._extract = None
+
+    # Revenue
+
+    def revenue(self, start_date: str = None, end_date: str = None, top: int = 10) -> Optional[Dict[str, Any]]:
+        """Payment count, total and average between two dates (inclusive, all time
+        without them), plus the ids of the largest payments, newest first on ties"""
+        if start_date or end_date :
+            is_valid, error_msg = validate_payment_date_range(start_date or "", end_date or "")
+            if not is_valid :
+                emit_error(error_msg)
+                return None
+
+        try :
+            payments = self.extract().columns('payments', self.backend)
+            first_day = parse_date(start_date).toordinal() if start_date else None
+            last_day = parse_date(end_date).toordinal() if end_date else None
+            if self.backend == "numpy" :
+                count, total, top_ids = self._revenue_numpy(payments, first_day, last_day, top)
+            else :
+                count, total, top_ids = self._revenue_array(payments, first_day, last_day, top)
+            return {
+                'start_date': start_date,
+                'end_date': end_date,
+                'total_payments': count,
+                'total_revenue': total / 100,
+                'average_payment': total / count / 100 if count else 0.0,
+                'top_payment_ids': top_ids,
+            }
+        except Exception as e :
+            emit_error(f"Error computing revenue: {str(e)}")
+            return None
+
+    def _revenue_array(self, payments, first_day, last_day, top):
+        days, cents = payments['day'], payments['cents']
+        lo = 0 if first_day is None else bisect_left(days, first_day)
+        hi = len(days) if last_day is None else bisect_right(days, last_day)
+        total = sum(cents[lo:hi])
+        # walk the range backwards so ties keep the newest payment first
+        largest = heapq.nlargest(top, range(hi - 1, lo - 1, -1), key=cents.__getitem__)
+        return max(hi - lo, 0), total, [payments['id'][index] for index in largest]
+
+    def _revenue_numpy(self, payments, first_day, last_day, top):
+        days, cents = payments['day'], payments['cents']
+        lo = 0 if first_day is None else int(numpy.searchsorted(days, first_day, 'left'))
+        hi = len(days) if last_day is None else int(numpy.searchsorted(days, last_day, 'right'))
+        if hi <= lo :
+            return 0, 0, []
+        newest_first = cents[lo:hi][::-1]
+        largest = numpy.argsort(-newest_first, kind='stable')[:top]
+        return hi - lo, int(cents[lo:hi].sum()), payments['id'][hi - 1 - largest].tolist()
+
+    # Expiry
+
+    def expiry(self, days: int = 7, on_date: str = None) -> Optional[Dict[str, Any]]:
+        """Active subscriptions ending within days of on_date (today by default),
+        per day left, with the plan value up for renewal, and those already expired"""
+        if days < 0 :
+            emit_error("Number of days cannot be negative")
+            return None
+        as_of = parse_date(on_date) if on_date else date.today()
+        if as_of is None :
+            emit_error("Date must be in YYYY-MM-DD format")
+            return None
+
+        try :
+            extract = self.extract()
+            subscriptions = extract.columns('subscriptions', self.backend)
+            plans = extract.columns('plans', self.backend)
+            today = as_of.toordinal()
+            if self.backend == "numpy" :
+                expiring, expired, by_days_left, renewal_cents = self._expiry_numpy(subscriptions, plans, today, days)
+            else :
+                expiring, expired, by_days_left, renewal_cents = self._expiry_array(subscriptions, plans, today, days)
+            return {
+                'as_of': as_of.isoformat(),
+                'days': days,
+                'expiring': expiring,
+                'expired': expired,
+                'by_days_left': by_days_left,
+                'renewal_value': renewal_cents / 100,
+            }
+        except Exception as e :
+            emit_error(f"Error computing subscription expiry: {str(e)}")
+            return None
+
+    def _expiry_array(self, subscriptions, plans, today, days):
+        end_days, is_active = subscriptions['end_day'], subscriptions['is_active']
+        lo, hi = bisect_left(end_days, today), bisect_right(end_days, today + days)
+        active = is_active[lo:hi]
+        by_days_left = [0] * (days + 1)
+        for end_day in compress(end_days[lo:hi], active) :
+            by_days_left[end_day - today] += 1
+        prices = dict(zip(plans['id'], plans['price_cents']))
+        renewal_cents = sum(prices.get(plan_id, 0) for plan_id in compress(subscriptions['plan_id'][lo:hi], active))
+        return sum(active), sum(is_active[:lo]), by_days_left, renewal_cents
+
+    def _expiry_numpy(self, subscriptions, plans, today, days):
+        end_days, is_active = subscriptions['end_day'], subscriptions['is_active'] != 0
+        lo = int(numpy.searchsorted(end_days, today, 'left'))
+        hi = int(numpy.searchsorted(end_days, today + days, 'right'))
+        active = is_active[lo:hi]
+        by_days_left = numpy.bincount(end_days[lo:hi][active] - today, minlength=days + 1)
+        plan_ids = subscriptions['plan_id'][lo:hi][active]
+        prices = numpy.zeros(int(max(plans['id'].max(initial=0), plan_ids.max(initial=0))) + 1, dtype=numpy.int64)
+        prices[plans['id']] = plans['price_cents']
+        return (int(active.sum()), int(is_active[:lo].sum()), by_days_left.tolist(),
+                int(prices[plan_ids].sum()))
+
+    # Cohorts
+
+    def cohorts(self, by: str = "joined", max_months: int = 12) -> Optional[Dict[str, Any]]:
+        """Same result as CohortEngine.get_cohorts, computed from the extract"""
+        if by not in COHORT_DIMENSIONS :
+            emit_error(f"Unknown cohort dimension '{by}'. Use one of: {', '.join(COHORT_DIMENSIONS)}")
+            return None
+        if max_months < 0 :
+            emit_error("Number of months cannot be negative")
+            return None
+
+        try :
+            extract = self.extract()
+            today = date.today()
+            current_month = today.year * 12 + today.month - 1
+            if self.backend == "numpy" :
+                sizes, active, revenue = self._cohorts_numpy(extract, by, current_month, max_months)
+            else :
+                sizes, active, revenue = self._cohorts_array(extract, by, current_month, max_months)
+            return {
+                'by': by,
+                'months': max_months,
+                'cohorts': build_cohorts(self._cohort_rows(sizes, active, revenue), by, current_month, max_months)
+            }
+        except Exception as e :
+            emit_error(f"Error computing cohorts: {str(e)}")
+            return None
+
+    def _cohort_rows(self, sizes: Dict[str, int], active: Dict[Tuple[str, int], int],
+                     revenue: Dict[Tuple[str, int], int]) -> List[Dict[str, Any]]:
+        # the rows COHORT_QUERY returns: size first, then every offset with members or payments
+        offsets = defaultdict(set)
+        for cohort, offset in list(active) + list(revenue) :
+            offsets[cohort].add(offset)
+        rows = []
+        for cohort in sorted(sizes) :
+            rows.append({'cohort': cohort, 'month_offset': None, 'members': sizes[cohort], 'active': 0, 'revenue': 0})
+            for offset in sorted(offsets[cohort]) :
+                rows.append({'cohort': cohort, 'month_offset': offset, 'members': 0,
+                             'active': active.get((cohort, offset), 0),
+                             'revenue': revenue.get((cohort, offset), 0) / 100})
+        return rows
+
+    def _cohort_bases_array(self, extract, by) -> Dict[int, Tuple[str, int]]:
+        """member_id -> (cohort, month the member starts counting from)"""
+        if by == "joined" :
+            members = extract.tables['members']
+            return {member_id: (_month_label(month), month)
+                    for member_id, month in zip(members['id'], members['joined_month']) if month != NO_MONTH}
+
+        # plan: the member's first subscription, by start date then id
+        subscriptions = extract.tables['subscriptions']
+        first = {}
+        for subscription_id, member_id, plan_id, start_day, start_month in zip(
+                subscriptions['id'], subscriptions['member_id'], subscriptions['plan_id'],
+                subscriptions['start_day'], subscriptions['start_month']) :
+            key = (start_day, subscription_id)
+            current = first.get(member_id)
+            if current is None or key < current[0] :
+                first[member_id] = (key, plan_id, start_month)
+        return {member_id: (extract.plan_names[plan_id], month)
+                for member_id, (_, plan_id, month) in first.items() if plan_id in extract.plan_names}
+
+    def _cohorts_array(self, extract, by, current_month, max_months):
+        bases = self._cohort_bases_array(extract, by)
+        sizes = Counter(cohort for cohort, _ in bases.values())
+
+        subscriptions = extract.tables['subscriptions']
+        covered = set()
+        for member_id, start_month, end_month, is_active in zip(
+                subscriptions['member_id'], subscriptions['start_month'],
+                subscriptions['end_month'], subscriptions['is_active']) :
+            base = bases.get(member_id) if is_active else None
+            if base is None :
+                continue
+            first_month = max(start_month, base[1])
+            last_month = min(end_month, current_month, base[1] + max_months)
+            covered.update((member_id, month - base[1]) for month in range(first_month, last_month + 1))
+        active = Counter((bases[member_id][0], offset) for member_id, offset in covered)
+
+        payments = extract.tables['payments']
+        revenue = defaultdict(int)
+        for member_id, month, cents in zip(payments['member_id'], payments['month'], payments['cents']) :
+            base = bases.get(member_id)
+            if base is not None and 0 <= month - base[1] <= max_months :
+                revenue[(base[0], month - base[1])] += cents
+        return sizes, active, revenue
+
+    def _cohorts_numpy(self, extract, by, current_month, max_months):
+        members = extract.columns('members', "numpy")
+        subscriptions = extract.columns('subscriptions', "numpy")
+        payments = extract.columns('payments', "numpy")
+
+        if by == "joined" :
+            joined = members['joined_month'] != NO_MONTH
+            base_members, base_months = members['id'][joined], members['joined_month'][joined]
+            keys = base_months
+            label = _month_label
+        else :
+            # first subscription per member: sort by member, start day, id and keep each member's first row
+            order = numpy.lexsort((subscriptions['id'], subscriptions['start_day'], subscriptions['member_id']))
+            sorted_members = subscriptions['member_id'][order]
+            first = numpy.ones(len(order), dtype=bool)
+            first[1:] = sorted_members[1:] != sorted_members[:-1]
+            picks = order[first]
+            names = sorted(set(extract.plan_names.values()))
+            name_index = {name: index for index, name in enumerate(names)}
+            plan_ids = subscriptions['plan_id'][picks]
+            key_by_plan = numpy.full(int(max(max(extract.plan_names, default=0), plan_ids.max(initial=0))) + 1, -1)
+            for plan_id, name in extract.plan_names.items() :
+                key_by_plan[plan_id] = name_index[name]
+            keys = key_by_plan[plan_ids]
+            known = keys >= 0
+            base_members, base_months, keys = subscriptions['member_id'][picks][known], \
+                subscriptions['start_month'][picks][known], keys[known]
+            label = names.__getitem__
+
+        if not len(base_members) :
+            return {}, {}, {}
+        # cohort keys sort like their labels, so the dense index keeps that order
+        cohort_keys, cohort_index = numpy.unique(keys, return_inverse=True)
+        labels = [label(int(key)) for key in cohort_keys]
+        width = max_months + 1
+        slots = len(labels) * width
+
+        size = int(max(members['id'].max(initial=0), subscriptions['member_id'].max(initial=0),
+                       payments['member_id'].max(initial=0))) + 1
+        has_base = numpy.zeros(size, dtype=bool)
+        has_base[base_members] = True
+        base_month_of = numpy.zeros(size, dtype=numpy.int64)
+        base_month_of[base_members] = base_months
+        cohort_of = numpy.zeros(size, dtype=numpy.int64)
+        cohort_of[base_members] = cohort_index.ravel()
+        sizes = numpy.bincount(cohort_index.ravel(), minlength=len(labels))
+
+        # expand every running span into the (member, offset) pairs it covers
+        span_members = subscriptions['member_id']
+        keep = (subscriptions['is_active'] != 0) & has_base[span_members]
+        span_members = span_members[keep].astype(numpy.int64)
+        bases = base_month_of[span_members]
+        first_month = numpy.maximum(subscriptions['start_month'][keep], bases)
+        last_month = numpy.minimum(numpy.minimum(subscriptions['end_month'][keep], current_month), bases + max_months)
+        spans = last_month >= first_month
+        span_members, bases = span_members[spans], bases[spans]
+        first_month, last_month = first_month[spans], last_month[spans]
+        lengths = last_month - first_month + 1
+        steps = numpy.arange(int(lengths.sum())) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        offsets = numpy.repeat(first_month - bases, lengths) + steps
+        covered = numpy.unique(numpy.repeat(span_members, lengths) * width + offsets)
+        active_slots = cohort_of[covered // width] * width + covered % width
+        active = numpy.bincount(active_slots, minlength=slots)
+
+        payment_members = payments['member_id']
+        keep = has_base[payment_members]
+        payment_members = payment_members[keep]
+        offsets = payments['month'][keep] - base_month_of[payment_members]
+        inside = (offsets >= 0) & (offsets <= max_months)
+        revenue_slots = cohort_of[payment_members[inside]] * width + offsets[inside]
+        revenue = numpy.bincount(revenue_slots, weights=payments['cents'][keep][inside], minlength=slots)
+        has_payments = numpy.bincount(revenue_slots, minlength=slots) > 0
+
+        active_counts, revenue_cents = {}, {}
+        for slot in numpy.flatnonzero(active > 0).tolist() :
+            active_counts[(labels[slot // width], slot % width)] = int(active[slot])
+        for slot in numpy.flatnonzero(has_payments).tolist() :
+            revenue_cents[(labels[slot // width], slot % width)] = int(round(revenue[slot]))
+        return dict(zip(labels, sizes.tolist())), active_counts, revenue_cents
+
+
+# Singleton instance
+columnar_analytics = ColumnarAnalytics()
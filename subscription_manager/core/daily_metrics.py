@@ -0,0 +1,222 @@
+import sqlite3
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Optional, Dict, Any, Tuple
+from ..database import execute_query, transaction, get_job_state, set_job_state
+from ..utils.validators import validate_date, validate_payment_date_range
+from ..utils.helpers import parse_date, format_date
+from ..events import emit_success, emit_error, emit_info
+
+
+WATERMARK = "daily_metrics.last_day"
+
+DAILY_METRICS_QUERY = """
+    SELECT dm.day,
+           SUM(dm.active) as active,
+           SUM(dm.new) as new,
+           SUM(dm.churned) as churned,
+           SUM(dm.renewed) as renewed,
+           ROUND(SUM(dm.revenue), 2) as revenue,
+           ROUND(SUM(dm.active * p.price * 30.0 / p.duration_days), 2) as mrr
+    FROM daily_metrics dm
+    JOIN plans p ON dm.plan_id = p.id
+    WHERE dm.day BETWEEN ? AND ?
+"""
+
+
+class DailyMetricsManager :
+    """Maintains daily_metrics: one row per day and plan with the active
+    subscription count, new / churned / renewed subscriptions and revenue.
+
+    refresh() only computes the days after the last run plus the days that
+    triggers flagged in daily_metrics_dirty, so it is cheap to run often.
+    Each range is computed with a sweep over subscription start, renewal and
+    end events instead of testing every subscription against every day.
+
+    A subscription is new on its start date and churned the day after its
+    end date. It is renewed the day after each plan term it outlived (renewals
+    extend end_date in place). Cancelled subscriptions are left out, as in
+    get_active_on.
+    """
+
+    def _compute(self, conn: sqlite3.Connection, first: date, last: date) -> List[tuple]:
+        """Metric rows (day, plan_id, active, new, churned, renewed, revenue) for first..last"""
+        durations = dict(conn.execute("SELECT id, duration_days FROM plans").fetchall())
+        first_ord, last_ord = first.toordinal(), last.toordinal()
+
+        active = defaultdict(int)      # plan -> active on first
+        starts = defaultdict(int)      # (day, plan) -> subscriptions starting
+        ends = defaultdict(int)        # (day, plan) -> subscriptions no longer active from day
+        renewals = defaultdict(int)    # (day, plan) -> subscriptions entering another term
+
+        rows = conn.execute("""
+            SELECT plan_id, start_date, end_date FROM subscriptions
+            WHERE is_active = TRUE AND start_date <= ? AND end_date >= ?
+        """, (format_date(last), format_date(first - timedelta(days=1))))
+        for plan_id, start_date, end_date in rows :
+            start, end = parse_date(start_date), parse_date(end_date)
+            if start is None or end is None :
+                continue
+            start_ord, end_ord = start.toordinal(), end.toordinal()
+            if start_ord <= first_ord <= end_ord :
+                active[plan_id] += 1
+            if first_ord <= start_ord <= last_ord :
+                starts[(start_ord, plan_id)] += 1
+            if first_ord <= end_ord + 1 <= last_ord :
+                ends[(end_ord + 1, plan_id)] += 1
+
+            duration = durations.get(plan_id) or 0
+            if duration > 0 :
+                # term k ends on start + k * duration; skip terms ending before first
+                k = max(1, (first_ord - 1 - start_ord) // duration)
+                boundary = start_ord + k * duration
+                while boundary < end_ord and boundary + 1 <= last_ord :
+                    if boundary + 1 >= first_ord :
+                        renewals[(boundary + 1, plan_id)] += 1
+                    k += 1
+                    boundary = start_ord + k * duration
+
+        revenue = {}
+        for payment_date, plan_id, total in conn.execute("""
+            SELECT p.payment_date, s.plan_id, SUM(p.amount)
+            FROM payments p
+            JOIN subscriptions s ON p.subscription_id = s.id
+            WHERE p.payment_date BETWEEN ? AND ?
+            GROUP BY p.payment_date, s.plan_id
+        """, (format_date(first), format_date(last))) :
+            day = parse_date(payment_date)
+            if day is not None :
+                revenue[(day.toordinal(), plan_id)] = total
+
+        plan_ids = sorted(set(durations) | set(active)
+                          | {key[1] for key in starts} | {key[1] for key in revenue})
+        result = []
+        for day_ord in range(first_ord, last_ord + 1) :
+            day = format_date(date.fromordinal(day_ord))
+            for plan_id in plan_ids :
+                key = (day_ord, plan_id)
+                # the count on the first day already reflects that day's events
+                if day_ord > first_ord :
+                    active[plan_id] += starts.get(key, 0) - ends.get(key, 0)
+                row = (day, plan_id, active[plan_id], starts.get(key, 0), ends.get(key, 0),
+                       renewals.get(key, 0), round(revenue.get(key, 0.0), 2))
+                if any(row[2:]) :
+                    result.append(row)
+        return result
+
+    @staticmethod
+    def _merge(ranges: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+        merged = []
+        for first, last in sorted(ranges) :
+            if merged and first <= merged[-1][1] + timedelta(days=1) :
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else :
+                merged.append((first, last))
+        return merged
+
+    def refresh(self, until: str = None, full: bool = False) -> Optional[Dict[str, Any]]:
+        """Bring daily_metrics up to date through until (default today)"""
+        if until :
+            is_valid, error_msg = validate_date(until, "Date")
+            if not is_valid :
+                emit_error(error_msg)
+                return None
+        until_day = parse_date(until) if until else date.today()
+
+        try :
+            with transaction() as conn :
+                watermark = parse_date(get_job_state(conn, WATERMARK) or "")
+                dirty = conn.execute("SELECT id, first_day, last_day FROM daily_metrics_dirty ORDER BY id").fetchall()
+
+                ranges = []
+                if full or watermark is None :
+                    earliest = conn.execute("""
+                        SELECT MIN(day) FROM (
+                            SELECT MIN(start_date) as day FROM subscriptions
+                            UNION ALL SELECT MIN(payment_date) FROM payments
+                        )
+                    """).fetchone()[0]
+                    if earliest and parse_date(earliest) <= until_day :
+                        ranges.append((parse_date(earliest), until_day))
+                else :
+                    if watermark < until_day :
+                        ranges.append((watermark + timedelta(days=1), until_day))
+                    # days after the watermark are computed by the range above anyway
+                    for _, first_day, last_day in dirty :
+                        first, last = parse_date(first_day), parse_date(last_day)
+                        if first is None or last is None :
+                            continue
+                        last = min(last, watermark)
+                        if first <= last :
+                            ranges.append((first, last))
+
+                days = 0
+                for first, last in self._merge(ranges) :
+                    conn.execute("DELETE FROM daily_metrics WHERE day BETWEEN ? AND ?",
+                                 (format_date(first), format_date(last)))
+                    conn.executemany("""
+                        INSERT INTO daily_metrics (day, plan_id, active, new, churned, renewed, revenue)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, self._compute(conn, first, last))
+                    days += (last - first).days + 1
+
+                if dirty :
+                    conn.execute("DELETE FROM daily_metrics_dirty WHERE id <= ?", (dirty[-1][0],))
+                if watermark is None or until_day > watermark :
+                    set_job_state(conn, WATERMARK, format_date(until_day))
+
+            if days :
+                emit_success(f"Daily metrics recomputed for {days} days")
+            else :
+                emit_info("Daily metrics are up to date")
+            return {'days_computed': days, 'through': format_date(max(until_day, watermark or until_day))}
+
+        except Exception as e :
+            emit_error(f"Error refreshing daily metrics: {str(e)}")
+            return None
+
+    def get_daily_metrics(self, start_date: str, end_date: str, plan_id: int = None) -> List[Dict[str, Any]]:
+        """Per-day totals (or one plan's) read from daily_metrics, one entry per day.
+
+        MRR is the active subscriptions' current plan prices normalised to 30
+        days. Days after the last refresh are not reported.
+        """
+        if not start_date or not end_date :
+            emit_error("A start and end date are required")
+            return []
+        is_valid, error_msg = validate_payment_date_range(start_date, end_date)
+        if not is_valid :
+            emit_error(error_msg)
+            return []
+
+        try :
+            query = DAILY_METRICS_QUERY
+            params = [start_date, end_date]
+            if plan_id is not None :
+                query += " AND dm.plan_id = ?"
+                params.append(plan_id)
+            query += " GROUP BY dm.day ORDER BY dm.day"
+            rows = {row['day']: dict(row) for row in execute_query(query, tuple(params))}
+
+            watermark = execute_query("SELECT value FROM job_state WHERE name = ?", (WATERMARK,))
+            last = min(parse_date(end_date), parse_date(watermark[0]['value'])) if watermark else None
+            if last is None :
+                emit_info("Daily metrics have not been computed yet")
+                return []
+
+            # days without any row had no activity at all
+            series = []
+            day = parse_date(start_date)
+            while day <= last :
+                key = format_date(day)
+                series.append(rows.get(key) or {'day': key, 'active': 0, 'new': 0, 'churned': 0,
+                                                'renewed': 0, 'revenue': 0.0, 'mrr': 0.0})
+                day += timedelta(days=1)
+            return series
+
+        except Exception as e :
+            emit_error(f"Error retrieving daily metrics: {str(e)}")
+            return []
+
+# Singleton instance
+daily_metrics_manager = DailyMetricsManager()
@@ -0,0 +1,274 @@
+import csv
+import gzip
+import io
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Tuple, Iterator, Union, IO
+from ..database import get_db_connection
+from ..utils.validators import validate_payment_date_range
+from ..events import emit_error
+from .daily_metrics import DAILY_METRICS_QUERY
+
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# Every report is a plain SELECT so it can be streamed from the cursor
+# without building Member / Subscription / Payment objects.
+REPORT_QUERIES = {
+    'members': """
+        SELECT id, first_name, last_name, email, phone, date_joined, status
+        FROM members
+        ORDER BY id
+    """,
+    'active_members': """
+        SELECT id, first_name, last_name, email, phone, date_joined, status
+        FROM members
+        WHERE status = 'Active'
+        ORDER BY id
+    """,
+    'plans': """
+        SELECT id, name, description, duration_days, price, is_active
+        FROM plans
+        ORDER BY id
+    """,
+    'subscriptions': """
+        SELECT s.id, s.member_id, m.first_name, m.last_name, s.plan_id,
+               p.name as plan_name, s.start_date, s.end_date, s.is_active
+        FROM subscriptions s
+        JOIN members m ON s.member_id = m.id
+        JOIN plans p ON s.plan_id = p.id
+        ORDER BY s.id
+    """,
+    'expiring_subscriptions': """
+        SELECT s.id, s.member_id, m.first_name, m.last_name, s.plan_id,
+               p.name as plan_name, s.start_date, s.end_date
+        FROM subscriptions s
+        JOIN members m ON s.member_id = m.id
+        JOIN plans p ON s.plan_id = p.id
+        WHERE s.is_active = TRUE
+        AND s.end_date BETWEEN date('now') AND date('now', ?)
+        ORDER BY s.end_date ASC
+    """,
+    'expired_subscriptions': """
+        SELECT s.id, s.member_id, m.first_name, m.last_name, s.plan_id,
+               p.name as plan_name, s.start_date, s.end_date
+        FROM subscriptions s
+        JOIN members m ON s.member_id = m.id
+        JOIN plans p ON s.plan_id = p.id
+        WHERE s.is_active = TRUE
+        AND s.end_date < date('now')
+        ORDER BY s.end_date ASC
+    """,
+    'payments': """
+        SELECT p.id, p.subscription_id, s.member_id, m.first_name, m.last_name,
+               s.plan_id, pl.name as plan_name, p.amount, p.payment_date, p.notes
+        FROM payments p
+        JOIN subscriptions s ON p.subscription_id = s.id
+        JOIN members m ON s.member_id = m.id
+        JOIN plans pl ON s.plan_id = pl.id
+        ORDER BY p.payment_date DESC, p.id DESC
+    """,
+    'revenue': """
+        SELECT p.id, p.subscription_id, s.member_id, m.first_name, m.last_name,
+               s.plan_id, pl.name as plan_name, p.amount, p.payment_date, p.notes
+        FROM payments p
+        JOIN subscriptions s ON p.subscription_id = s.id
+        JOIN members m ON s.member_id = m.id
+        JOIN plans pl ON s.plan_id = pl.id
+        WHERE p.payment_date BETWEEN ? AND ?
+        ORDER BY p.payment_date DESC, p.id DESC
+    """,
+    'plan_popularity': """
+        SELECT
+            p.id as plan_id,
+            p.name as plan_name,
+            COUNT(DISTINCT s.id) as total_subscriptions,
+            SUM(CASE WHEN s.is_active THEN 1 ELSE 0 END) as active_subscriptions,
+            COALESCE(SUM(pm.amount), 0) as total_revenue
+        FROM plans p
+        LEFT JOIN subscriptions s ON p.id = s.plan_id
+        LEFT JOIN payments pm ON s.id = pm.subscription_id
+        GROUP BY p.id, p.name
+        ORDER BY p.id
+    """,
+    'daily_metrics': DAILY_METRICS_QUERY + " GROUP BY dm.day ORDER BY dm.day",
+}
+
+# reports that take a start_date / end_date range
+DATE_RANGE_REPORTS = ('revenue', 'daily_metrics')
+
+
+class _ChunkedWriter:
+    """Text sink that rolls over to a new (optionally gzipped) file every chunk_rows rows"""
+
+    def __init__(self, target, compress: bool = False, chunk_rows: int = None):
+        self.compress = compress
+        self.chunk_rows = chunk_rows
+        self.files = []
+        self._stream = None
+        self._owns_stream = False
+        self._rows_in_chunk = 0
+        self._started = False
+
+        if hasattr(target, 'write'):
+            # Caller supplied an open stream (e.g. sys.stdout); never chunk it
+            self._stream = target
+            self.chunk_rows = None
+            self.base_path = None
+        else:
+            self.base_path = Path(target)
+
+    def _chunk_path(self) -> Path:
+        path = self.base_path
+        if self.chunk_rows:
+            suffix = "".join(path.suffixes)
+            stem = path.name[:len(path.name) - len(suffix)] if suffix else path.name
+            path = path.with_name(f"{stem}.part{len(self.files) + 1:04d}{suffix}")
+        if self.compress and path.suffix != '.gz':
+            path = path.with_name(path.name + '.gz')
+        return path
+
+    def _open_next(self) -> None:
+        self.close()
+        path = self._chunk_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.compress:
+            self._stream = io.TextIOWrapper(gzip.open(path, 'wb'), encoding='utf-8', newline='')
+        else:
+            self._stream = open(path, 'w', encoding='utf-8', newline='')
+        self._owns_stream = True
+        self.files.append(str(path))
+
+    def needs_new_chunk(self) -> bool:
+        if not self._started:
+            return True
+        return bool(self.chunk_rows) and self._rows_in_chunk >= self.chunk_rows
+
+    def start_chunk(self) -> IO[str]:
+        if self.base_path is not None:
+            self._open_next()
+        self._started = True
+        self._rows_in_chunk = 0
+        return self._stream
+
+    @property
+    def stream(self) -> IO[str]:
+        return self._stream
+
+    def row_written(self) -> None:
+        self._rows_in_chunk += 1
+
+    def close(self) -> None:
+        if self._stream is not None and self._owns_stream:
+            self._stream.close()
+            self._stream = None
+        self._owns_stream = False
+
+
+class ExportManager:
+    def __init__(self, batch_size: int = 1000):
+        # rows pulled from the cursor per fetchmany() call; bounds memory use
+        self.batch_size = batch_size
+
+    @contextmanager
+    def _streaming_cursor(self, query: str, params: Tuple) -> Iterator[sqlite3.Cursor]:
+        conn = get_db_connection()
+        # plain tuples are cheaper than sqlite3.Row and all we need here
+        conn.row_factory = None
+        try:
+            yield conn.execute(query, params)
+        finally:
+            conn.close()
+
+    def _iter_rows(self, cursor: sqlite3.Cursor) -> Iterator[tuple]:
+        while True:
+            batch = cursor.fetchmany(self.batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield row
+
+    def _begin_chunk(self, writer: _ChunkedWriter, columns: List[str], format: str):
+        stream = writer.start_chunk()
+        if format != "csv":
+            return None
+        csv_writer = csv.writer(stream)
+        csv_writer.writerow(columns)
+        return csv_writer
+
+    def export_query(self, query: str, target: Union[str, Path, IO[str]],
+                     params: Tuple = None, format: str = "csv",
+                     compress: bool = False, chunk_rows: int = None) -> Optional[Dict[str, Any]]:
+        """Stream the result of query into target as CSV or JSON Lines"""
+        if format not in EXPORT_FORMATS:
+            emit_error(f"Export format must be one of: {', '.join(EXPORT_FORMATS)}")
+            return None
+        if chunk_rows is not None and chunk_rows <= 0:
+            emit_error("Chunk size must be greater than zero")
+            return None
+
+        writer = _ChunkedWriter(target, compress=compress, chunk_rows=chunk_rows)
+        row_count = 0
+        try:
+            with self._streaming_cursor(query, params or ()) as cursor:
+                columns = [column[0] for column in cursor.description]
+                for row in self._iter_rows(cursor):
+                    if writer.needs_new_chunk():
+                        csv_writer = self._begin_chunk(writer, columns, format)
+
+                    if format == "csv":
+                        csv_writer.writerow(row)
+                    else:
+                        writer.stream.write(json.dumps(dict(zip(columns, row))))
+                        writer.stream.write("\n")
+                    writer.row_written()
+                    row_count += 1
+
+                # An empty result still produces an output (with the CSV header)
+                if row_count == 0:
+                    self._begin_chunk(writer, columns, format)
+
+            return {
+                'rows': row_count,
+                'files': writer.files,
+                'format': format,
+                'compressed': compress and writer.base_path is not None
+            }
+
+        except (sqlite3.Error, OSError) as e:
+            emit_error(f"Error exporting data: {str(e)}")
+            return None
+        finally:
+            writer.close()
+
+    def export_report(self, report: str, target: Union[str, Path, IO[str]],
+                      format: str = "csv", compress: bool = False, chunk_rows: int = None,
+                      start_date: str = None, end_date: str = None,
+                      days: int = 7) -> Optional[Dict[str, Any]]:
+        if report not in REPORT_QUERIES:
+            emit_error(f"Unknown report '{report}'. Available: {', '.join(sorted(REPORT_QUERIES))}")
+            return None
+
+        params = ()
+        if report in DATE_RANGE_REPORTS:
+            if not start_date or not end_date:
+                emit_error(f"{report.replace('_', ' ').capitalize()} export requires a start and end date")
+                return None
+            is_valid, error_msg = validate_payment_date_range(start_date, end_date)
+            if not is_valid:
+                emit_error(error_msg)
+                return None
+            params = (start_date, end_date)
+        elif report == 'expiring_subscriptions':
+            params = (f"+{int(days)} days",)
+
+        return self.export_query(REPORT_QUERIES[report], target, params, format=format,
+                                 compress=compress, chunk_rows=chunk_rows)
+
+    def available_reports(self) -> List[str]:
+        return sorted(REPORT_QUERIES)
+
+# Singleton instance
+export_manager = ExportManager()
@@ -0,0 +1,103 @@
+import sqlite3
+from typing import Optional, Tuple
+from ..database import execute_query, transaction
+from ..events import emit_error, emit_success
+from ..metrics import CACHE_REQUESTS
+
+
+PAYMENT_SCOPE = "payment"
+SUBSCRIPTION_SCOPE = "subscription"
+
+
+class IdempotencyManager :
+    """Maps client-supplied idempotency keys to the row they created.
+
+    Keys live in idempotency_keys with a unique (scope, key) index, so a
+    duplicate submission is resolved with one index lookup. A key stops
+    counting once its window has passed, and purge_expired() removes such
+    keys in small batches.
+    """
+
+    def __init__(self, window_seconds: int = 24 * 60 * 60) :
+        self.window_seconds = window_seconds
+
+    def lookup(self, scope: str, key: str) -> Optional[int] :
+        """Return the resource id recorded for an unexpired key, if any"""
+        query = """
+            SELECT resource_id FROM idempotency_keys
+            WHERE scope = ? AND key = ? AND expires_at > datetime('now')
+        """
+        rows = execute_query(query, (scope, key))
+        CACHE_REQUESTS.inc(cache="idempotency", result="hit" if rows else "miss")
+        return rows[0]['resource_id'] if rows else None
+
+    def claim(self, conn: sqlite3.Connection, scope: str, key: str, resource_id: int,
+              window_seconds: int = None) -> bool :
+        """Record key -> resource_id inside the caller's transaction.
+
+        Returns False when another request already holds the key; the caller
+        should then roll back its own insert and return the original row.
+        """
+        window = window_seconds if window_seconds is not None else self.window_seconds
+        # an expired key may be reused
+        conn.execute("""
+            DELETE FROM idempotency_keys
+            WHERE scope = ? AND key = ? AND expires_at <= datetime('now')
+        """, (scope, key))
+        try :
+            conn.execute("""
+                INSERT INTO idempotency_keys (scope, key, resource_id, expires_at)
+                VALUES (?, ?, ?, datetime('now', ?))
+            """, (scope, key, resource_id, f"+{int(window)} seconds"))
+            return True
+        except sqlite3.IntegrityError :
+            return False
+
+    def insert_once(self, scope: str, key: str, query: str, params: tuple) -> Tuple[Optional[int], bool] :
+        """Run an INSERT and claim key for the new row atomically.
+
+        Returns (resource_id, created). When a concurrent request claimed the
+        key first, our insert is rolled back and the original id is returned
+        with created=False. resource_id is None if the insert failed.
+        """
+        try :
+            with transaction() as conn :
+                resource_id = conn.execute(query, params).lastrowid
+                if not self.claim(conn, scope, key, resource_id) :
+                    raise _KeyTaken()
+            return resource_id, True
+        except _KeyTaken :
+            return self.lookup(scope, key), False
+        except sqlite3.Error as e :
+            emit_error(f"Error executing insert: {e}")
+            return None, False
+
+    def purge_expired(self, batch_size: int = 1000) -> int :
+        """Delete expired keys batch_size rows per transaction; returns the number removed"""
+        total = 0
+        try :
+            while True :
+                with transaction() as conn :
+                    deleted = conn.execute("""
+                        DELETE FROM idempotency_keys
+                        WHERE id IN (
+                            SELECT id FROM idempotency_keys
+                            WHERE expires_at <= datetime('now')
+                            LIMIT ?
+                        )
+                    """, (batch_size,)).rowcount
+                total += deleted
+                if deleted < batch_size :
+                    break
+            emit_success(f"Purged {total} expired idempotency keys")
+            return total
+        except sqlite3.Error as e :
+            emit_error(f"Error purging idempotency keys: {e}")
+            return total
+
+
+class _KeyTaken(Exception) :
+    pass
+
+# Singleton instance
+idempotency_manager = IdempotencyManager()
@@ -1,11 +1,12 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import date
-from ..models import Member
+from ..models import Member, MemberRow
 from ..database import execute_query, execute_insert
+from ..queries import QUERIES
+from ..hydration import MEMBER, MEMBER_ROW
 from ..utils.validators import validate_name, validate_email, validate_phone, validate_status
 from ..utils.helpers import get_current_date, sanitize_input
-from ..utils.display import (display_members_table, display_member_details,
- display_success_message, display_error_message)
+from ..events import emit_success, emit_error
 
 
 class MemberManager :
@@ -17,28 +18,29 @@ class MemberManager :
         # sanitize
         first_name = sanitize_input(first_name)
         last_name = sanitize_input(last_name)
-        email = sanitize_input(email)
-        phone = sanitize_input(phone)
+        # empty contact details are stored as NULL so they don't collide on the UNIQUE columns
+        email = sanitize_input(email) or None
+        phone = sanitize_input(phone) or None
         # validate
         is_valid, error_msg = validate_name(first_name, "First name")
         if not is_valid :
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return None
 
         is_valid, error_msg = validate_name(last_name, "Last name")
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return None
         
         if email:
             is_valid, error_msg = validate_email(email)
             if not is_valid:
-                display_error_message(error_msg)
+                emit_error(error_msg)
                 return None
         if phone:
             is_valid, error_msg = validate_phone(phone)
             if not is_valid:
-                display_error_message(error_msg)
+                emit_error(error_msg)
                 return None
         
         join_date = date_joined or get_current_date()
@@ -60,64 +62,49 @@ class MemberManager :
                     date_joined = join_date,
                     status = "Active"
                 )
-                display_success_message(f"Member '{first_name} {last_name}' added successfully with ID: {member_id}")
+                emit_success(f"Member '{first_name} {last_name}' added successfully with ID: {member_id}")
                 return member
             else:
-                display_error_message("Failed to add member to database")
+                emit_error("Failed to add member to database")
                 return None
                 
         except Exception as e:
-            display_error_message(f"Error adding member: {str(e)}")
+            emit_error(f"Error adding member: {str(e)}")
             return None
 
     
-    def get_all_members(self) -> List[Member] :
+    def get_all_members(self, lean: bool = False) -> List[Union[Member, MemberRow]] :
+        # lean: MemberRow namedtuples instead of Member objects
         try :
-            query = "SELECT * FROM members ORDER BY id"
-            rows = execute_query(query)
-
-            members = []
-            for row in rows :
-                members.append(Member.from_db_row(row))
-
-            return members
+            query = QUERIES['members.all']
+            return (MEMBER_ROW if lean else MEMBER).fetch(query)
 
         except Exception as e :
-            display_error_message(f"Error retrieving members: {str(e)}")
+            emit_error(f"Error retrieving members: {str(e)}")
             return []
 
     
     def get_member_by_id(self, member_id: int) -> Optional[Member] :
         try :
-            query = "SELECT * FROM members WHERE id = ?"
-            rows = execute_query(query, (member_id,)) 
-            if rows :
-                return Member.from_db_row(rows[0])
+            query = QUERIES['members.by_id']
+            members = MEMBER.fetch(query, (member_id,))
+            if members :
+                return members[0]
             else :
-                display_error_message(f"Member with ID {member_id} not found")
+                emit_error(f"Member with ID {member_id} not found")
                 return None
         except Exception as e :
-            display_error_message(f"Error retrieving member: {str(e)}")
+            emit_error(f"Error retrieving member: {str(e)}")
             return None
     
-    def get_members_by_name(self, name: str) -> List[Member] :
+    def get_members_by_name(self, name: str, lean: bool = False) -> List[Union[Member, MemberRow]] :
 
         try :
             search_term = f"%{name}%"
-            query = """
-                SELECT * FROM members
-                WHERE first_name LIKE ? OR last_name LIKE ?
-                ORDER BY id
-            """
-            rows = execute_query(query, (search_term, search_term))
-
-            members = []
-            for row in rows:
-                members.append(Member.from_db_row(row))
-                
-            return members
+            query = QUERIES['members.by_name']
+            return (MEMBER_ROW if lean else MEMBER).fetch(query, (search_term, search_term))
         except Exception as e :
-            display_error_message(f"Error searching members: {str(e)}")
+            emit_error(f"Error searching members: {str(e)}")
             return []
 
     
@@ -127,12 +114,12 @@ class MemberManager :
 
         is_valid, error_msg = validate_name(first_name, "First name")
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return False
 
         is_valid, error_msg = validate_name(last_name, "Last name")
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return False
         
         try :
@@ -141,10 +128,10 @@ class MemberManager :
                 WHERE id = ?
             """
             execute_query(query, (first_name, last_name, member_id))
-            display_success_message(f"Member {member_id} name updated successfully")
+            emit_success(f"Member {member_id} name updated successfully")
             return True
         except Exception as e :
-            display_error_message(f"Error updating member name: {str(e)}")
+            emit_error(f"Error updating member name: {str(e)}")
             return False
         
 
@@ -155,7 +142,7 @@ class MemberManager :
             email = sanitize_input(email)
             is_valid, error_msg = validate_email(email)
             if not is_valid:
-                display_error_message(error_msg)
+                emit_error(error_msg)
                 return False
         else:
             email = None
@@ -163,10 +150,10 @@ class MemberManager :
         try:
             query = "UPDATE members SET email = ? WHERE id = ?"
             execute_query(query, (email, member_id))
-            display_success_message(f"Member {member_id} email updated successfully")
+            emit_success(f"Member {member_id} email updated successfully")
             return True
         except Exception as e:
-            display_error_message(f"Error updating member email: {str(e)}")
+            emit_error(f"Error updating member email: {str(e)}")
             return False
 
     def update_member_phone(self, member_id: int, phone: str) -> bool:
@@ -176,7 +163,7 @@ class MemberManager :
             phone = sanitize_input(phone)
             is_valid, error_msg = validate_phone(phone)
             if not is_valid:
-                display_error_message(error_msg)
+                emit_error(error_msg)
                 return False
         else:
             phone = None
@@ -184,10 +171,10 @@ class MemberManager :
         try:
             query = "UPDATE members SET phone = ? WHERE id = ?"
             execute_query(query, (phone, member_id))
-            display_success_message(f"Member {member_id} phone updated successfully")
+            emit_success(f"Member {member_id} phone updated successfully")
             return True
         except Exception as e:
-            display_error_message(f"Error updating member phone: {str(e)}")
+            emit_error(f"Error updating member phone: {str(e)}")
             return False
 
 
@@ -196,16 +183,16 @@ class MemberManager :
             return False
         is_valid, error_msg = validate_status(status)
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return False
         
         try:
             query = "UPDATE members SET status = ? WHERE id = ?"
             execute_query(query, (status, member_id))
-            display_success_message(f"Member {member_id} status updated to {status}")
+            emit_success(f"Member {member_id} status updated to {status}")
             return True
         except Exception as e:
-            display_error_message(f"Error updating member status: {str(e)}")
+            emit_error(f"Error updating member status: {str(e)}")
             return False
 
 # Singleton instance
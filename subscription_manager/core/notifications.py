@@ -0,0 +1,211 @@
+import abc
+import json
+import threading
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Iterable, Union
+from ..database import execute_query, transaction
+from ..utils.helpers import get_current_date, days_between_dates
+from ..events import emit_success, emit_error, emit_info
+from ..metrics import NOTIFICATIONS
+
+
+DEFAULT_OFFSETS = (7, 3, 1)
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+DUE_NOTIFICATIONS_QUERY = """
+    SELECT n.id, n.subscription_id, n.member_id, n.offset_days, n.end_date, n.due_date,
+           n.attempts, m.first_name, m.last_name, m.email, m.phone, p.name as plan_name
+    FROM notifications n
+    JOIN subscriptions s ON n.subscription_id = s.id
+    JOIN members m ON n.member_id = m.id
+    JOIN plans p ON s.plan_id = p.id
+    WHERE n.status = 'pending' AND n.due_date <= ? AND n.id > ?
+    ORDER BY n.id
+    LIMIT ?
+"""
+
+
+class NotificationSink(abc.ABC) :
+    """Delivers reminder notifications; deliver() raises to report a failure"""
+
+    @abc.abstractmethod
+    def deliver(self, notification: Dict[str, Any]) -> None:
+        """Send one notification"""
+
+    def flush(self) -> None:
+        """Called after every batch"""
+
+    def close(self) -> None:
+        pass
+
+
+class FileNotificationSink(NotificationSink) :
+    """Appends each notification to a JSON Lines file (for testing and local setups)"""
+
+    def __init__(self, path: Union[str, Path]) :
+        self.path = Path(path)
+        self._stream = None
+
+    def deliver(self, notification: Dict[str, Any]) -> None:
+        if self._stream is None :
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._stream = open(self.path, "a", encoding="utf-8")
+        self._stream.write(json.dumps(notification, default=str) + "\n")
+
+    def flush(self) -> None:
+        if self._stream is not None :
+            self._stream.flush()
+
+    def close(self) -> None:
+        if self._stream is not None :
+            self._stream.close()
+            self._stream = None
+
+
+class NotificationScheduler :
+    """Expiry reminders sent offsets days before a subscription ends.
+
+    schedule() enqueues one notifications row per subscription, offset and
+    end date; the unique index makes re-running it harmless, and a renewal
+    (new end date) gets a fresh set. Rows are bucketed by due_date, so
+    drain() only reads the buckets that are due and hands them to a sink in
+    batches. A reminder is skipped rather than sent when the subscription was
+    cancelled or renewed since, or when a closer reminder is already due.
+    drain() assumes a single worker at a time.
+    """
+
+    def __init__(self, offsets: Iterable[int] = DEFAULT_OFFSETS, batch_size: int = 100, max_attempts: int = 3) :
+        self.offsets = tuple(sorted(set(int(offset) for offset in offsets), reverse=True))
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+    def schedule(self, today: str = None) -> int:
+        """Enqueue reminders for subscriptions ending within the largest offset; returns rows added"""
+        today = today or get_current_date()
+        offsets = ", ".join("(?)" for _ in self.offsets)
+        query = f"""
+            INSERT OR IGNORE INTO notifications (subscription_id, member_id, offset_days, end_date, due_date)
+            SELECT s.id, s.member_id, o.offset_days, s.end_date, date(s.end_date, '-' || o.offset_days || ' days')
+            FROM subscriptions s
+            JOIN (SELECT column1 as offset_days FROM (VALUES {offsets})) o
+            WHERE s.is_active = TRUE
+            AND s.end_date BETWEEN ? AND date(?, ?)
+        """
+        try :
+            with transaction() as conn :
+                added = conn.execute(query, self.offsets + (today, today, f"+{max(self.offsets)} days")).rowcount
+            emit_info(f"Scheduled {added} reminders")
+            return added
+        except Exception as e :
+            emit_error(f"Error scheduling reminders: {str(e)}")
+            return 0
+
+    def _skip_stale(self, conn, today: str) -> int:
+        return conn.execute("""
+            UPDATE notifications SET status = 'skipped'
+            WHERE status = 'pending' AND due_date <= ?
+            AND (
+                NOT EXISTS (
+                    SELECT 1 FROM subscriptions s
+                    WHERE s.id = notifications.subscription_id
+                    AND s.is_active = TRUE AND s.end_date = notifications.end_date
+                    AND s.end_date >= ?
+                )
+                OR EXISTS (
+                    SELECT 1 FROM notifications closer
+                    WHERE closer.subscription_id = notifications.subscription_id
+                    AND closer.end_date = notifications.end_date
+                    AND closer.offset_days < notifications.offset_days
+                    AND closer.due_date <= ?
+                )
+            )
+        """, (today, today, today)).rowcount
+
+    def _message(self, notification: Dict[str, Any], today: str) -> str:
+        # a late drain sends the reminder after its due date, so count from today
+        days = days_between_dates(today, notification['end_date'])
+        return (f"Hi {notification['first_name']}, your {notification['plan_name']} subscription "
+                f"ends on {notification['end_date']} ({days} day{'s' if days != 1 else ''} left).")
+
+    def drain(self, sink: NotificationSink, limit: int = None, today: str = None) -> Dict[str, int]:
+        """Deliver due reminders batch_size at a time; returns counts by outcome"""
+        today = today or get_current_date()
+        totals = {SENT: 0, FAILED: 0, SKIPPED: 0}
+        try :
+            with transaction() as conn :
+                totals[SKIPPED] = self._skip_stale(conn, today)
+            NOTIFICATIONS.inc(totals[SKIPPED], outcome=SKIPPED)
+
+            last_id = 0
+            while limit is None or totals[SENT] + totals[FAILED] < limit :
+                size = self.batch_size if limit is None else min(self.batch_size, limit - totals[SENT] - totals[FAILED])
+                rows = execute_query(DUE_NOTIFICATIONS_QUERY, (today, last_id, size))
+                if not rows :
+                    break
+                last_id = rows[-1]['id']
+
+                sent, failed = [], []
+                for row in rows :
+                    notification = dict(row)
+                    notification['message'] = self._message(notification, today)
+                    try :
+                        sink.deliver(notification)
+                        sent.append((row['id'],))
+                    except Exception as e :
+                        failed.append((self.max_attempts, str(e), row['id']))
+                sink.flush()
+
+                with transaction() as conn :
+                    conn.executemany("""
+                        UPDATE notifications
+                        SET status = 'sent', attempts = attempts + 1, sent_at = datetime('now'), last_error = NULL
+                        WHERE id = ?
+                    """, sent)
+                    # failures are retried on later runs until max_attempts
+                    conn.executemany("""
+                        UPDATE notifications
+                        SET attempts = attempts + 1, last_error = ?2,
+                            status = CASE WHEN attempts + 1 >= ?1 THEN 'failed' ELSE 'pending' END
+                        WHERE id = ?3
+                    """, failed)
+                totals[SENT] += len(sent)
+                totals[FAILED] += len(failed)
+                NOTIFICATIONS.inc(len(sent), outcome=SENT)
+                NOTIFICATIONS.inc(len(failed), outcome=FAILED)
+
+            if totals[SENT] or totals[FAILED] :
+                emit_success(f"Sent {totals[SENT]} reminders ({totals[FAILED]} failed, {totals[SKIPPED]} skipped)")
+            return totals
+
+        except Exception as e :
+            emit_error(f"Error sending reminders: {str(e)}")
+            return totals
+
+    def run_worker(self, sink: NotificationSink, interval: float = 60.0,
+                   stop_event: threading.Event = None) -> None:
+        """Schedule and drain every interval seconds until stop_event is set"""
+        stop_event = stop_event or threading.Event()
+        try :
+            while not stop_event.is_set() :
+                self.schedule()
+                self.drain(sink)
+                stop_event.wait(interval)
+        finally :
+            sink.close()
+
+    def get_notification_stats(self) -> Dict[str, int]:
+        stats = {PENDING: 0, SENT: 0, FAILED: 0, SKIPPED: 0}
+        try :
+            for row in execute_query("SELECT status, COUNT(*) as count FROM notifications GROUP BY status") :
+                stats[row['status']] = row['count']
+            return stats
+        except Exception as e :
+            emit_error(f"Error retrieving notification statistics: {str(e)}")
+            return stats
+
+# Singleton instance
+notification_scheduler = NotificationScheduler()
@@ -0,0 +1,174 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Dict, Any
+from ..database import get_db_connection, begin_write
+from ..events import ManagerError, capture_events
+from ..metrics import metrics, PAYMENTS_RECORDED, PAYMENT_AMOUNT, PAYMENT_WRITER_BATCH
+from .payments import payment_manager
+
+
+# The existence check runs inside the writer's transaction, so callers
+# don't pay for the three-way subscription join before enqueueing.
+INSERT_PAYMENT_QUERY = """
+    INSERT INTO payments (subscription_id, amount, payment_date, notes)
+    SELECT ?, ?, ?, ?
+    WHERE EXISTS (SELECT 1 FROM subscriptions WHERE id = ?)
+"""
+
+_STOP = object()
+
+
+class _PendingPayment:
+    __slots__ = ("subscription_id", "amount", "payment_date", "notes", "future")
+
+    def __init__(self, subscription_id, amount, payment_date, notes, future):
+        self.subscription_id = subscription_id
+        self.amount = amount
+        self.payment_date = payment_date
+        self.notes = notes
+        self.future = future
+
+
+class PaymentWriter:
+    """Single writer thread that commits queued payment inserts in groups.
+
+    Callers submit() payments from any thread and get a Future resolving to
+    the new payment id. The writer commits whatever has queued up every
+    flush_interval seconds or every max_batch rows, whichever comes first,
+    so a burst of payments costs one transaction instead of one per call.
+    """
+
+    def __init__(self, flush_interval: float = 0.005, max_batch: int = 500, max_queue: int = 10000):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches_committed = 0
+        self.rows_committed = 0
+
+    def start(self) -> "PaymentWriter":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="payment-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        """Flush everything already queued, then stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread = None
+        thread.join(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches_committed': self.batches_committed,
+            'rows_committed': self.rows_committed,
+            'average_batch_size': self.rows_committed / self.batches_committed if self.batches_committed else 0.0,
+            'pending': self.pending
+        }
+
+    def submit(self, subscription_id: int, amount: float, payment_date: str = None,
+               notes: str = None) -> "Future[int]":
+        """Queue a payment; blocks only when max_queue payments are already waiting"""
+        future = Future()
+        with capture_events() as events:
+            fields = payment_manager.validate_payment(amount, payment_date, notes)
+        if fields is None:
+            future.set_exception(ManagerError(events.last_error))
+            return future
+
+        payment_date, notes = fields
+        # stop() queues _STOP under the same lock, so every payment accepted
+        # here is ahead of it and gets written before the thread exits
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                future.set_exception(ManagerError("Payment writer is not running"))
+                return future
+            self._queue.put(_PendingPayment(subscription_id, amount, payment_date, notes, future))
+        return future
+
+    def _run(self) -> None:
+        conn = get_db_connection()
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                # a caller may have cancelled its future while it was queued;
+                # claimed futures can no longer be cancelled, so resolving them is safe
+                batch = [item] if item.future.set_running_or_notify_cancel() else []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    if item.future.set_running_or_notify_cancel():
+                        batch.append(item)
+                if batch:
+                    self._commit(conn, batch)
+        finally:
+            conn.close()
+            # anything submitted while we were shutting down will never be written
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP and item.future.set_running_or_notify_cancel():
+                    item.future.set_exception(ManagerError("Payment writer stopped"))
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[_PendingPayment]) -> None:
+        payment_ids: List[Optional[int]] = []
+        try:
+            begin_write(conn, "writer")
+            cursor = conn.cursor()
+            for pending in batch:
+                cursor.execute(INSERT_PAYMENT_QUERY, (pending.subscription_id, pending.amount,
+                                                      pending.payment_date, pending.notes,
+                                                      pending.subscription_id))
+                payment_ids.append(cursor.lastrowid if cursor.rowcount == 1 else None)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            error = ManagerError(f"Error recording payment: {e}")
+            for pending in batch:
+                pending.future.set_exception(error)
+            return
+
+        self.batches_committed += 1
+        if metrics.enabled:
+            written = [pending for pending, payment_id in zip(batch, payment_ids) if payment_id is not None]
+            PAYMENT_WRITER_BATCH.observe(len(batch))
+            PAYMENTS_RECORDED.inc(len(written), source="writer")
+            PAYMENT_AMOUNT.inc(sum(pending.amount for pending in written), source="writer")
+        for pending, payment_id in zip(batch, payment_ids):
+            if payment_id is None:
+                pending.future.set_exception(
+                    ManagerError(f"Subscription with ID {pending.subscription_id} not found"))
+            else:
+                self.rows_committed += 1
+                pending.future.set_result(payment_id)
@@ -1,91 +1,74 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union
 from datetime import date, datetime
-from ..models import Payment, Subscription, Member, Plan
-from ..database import execute_query, execute_insert
+from ..models import Payment, Subscription, Member, Plan, PaymentRow
+from ..database import execute_query, execute_insert, transaction, MEMBER_BALANCES_QUERY, MEMBER_BALANCES_REBUILD
+from ..queries import QUERIES, PAYMENT_DETAIL_SELECT, PAYMENT_ROW_SELECT
+from ..hydration import PAYMENT_DETAIL, PAYMENT_ROW
 from ..utils.validators import validate_date, validate_positive_number, validate_date_ranges, validate_payment_date_range
 from ..utils.helpers import get_current_date, format_date, parse_date, format_currency, sanitize_input
-from ..utils.display import (display_payments_table, display_success_message, 
-                          display_error_message, display_info_message)
+from ..events import emit_success, emit_error, emit_warning, emit_info
+from ..metrics import PAYMENTS_RECORDED, PAYMENT_AMOUNT
+from .idempotency import idempotency_manager, PAYMENT_SCOPE
 
 class PaymentManager:
     def __init__(self):
         pass
-    # Helper Functions
-    def _create_member_from_row(self, row):
-        row = dict(row)
-        return Member(
-            id=row['member_id'] if 'member_id' in row else None,
-            first_name=row['first_name'],
-            last_name=row['last_name'],
-            email=row['email'],
-            phone=row.get('phone'),  # Use get() for optional fields
-            date_joined=row.get('date_joined'),
-            status=row.get('status')
-        )
-    def _create_plan_from_row(self, row):
-        row = dict(row)
-        return Plan(
-            id=row['plan_id'] if 'plan_id' in row else None,
-            name=row['plan_name'],
-            description=row.get('description'),
-            duration_days=row['duration_days'],
-            price=row['price'],
-            is_active=bool(row.get('is_active', True))
-        )
-    def _create_subscription_from_row(self, row, member, plan):
-        return Subscription(
-            id=row['subscription_id'],
-            member_id=row['member_id'] if 'member_id' in row else None,
-            plan_id=row['plan_id'] if 'plan_id' in row else None,
-            start_date=row['start_date'],
-            end_date=row['end_date'],
-            is_active=bool(row['is_active']),
-            member=member,
-            plan=plan
-        )
-    def _create_payment_from_row(self, row, subscription=None):
-        return Payment(
-            id=row['id'],
-            subscription_id=row['subscription_id'],
-            amount=row['amount'],
-            payment_date=row['payment_date'],
-            notes=row['notes'],
-            subscription=subscription
-        )
 
-
-    def record_payment(self, subscription_id: int, amount: float, 
-                      payment_date: str = None, notes: str = None) -> Optional[Payment]:
-        # Check if subscription exists
-        from .subscriptions import subscription_manager
-        subscription = subscription_manager.get_subscription_by_id(subscription_id)
-        if not subscription:
-            display_error_message(f"Subscription with ID {subscription_id} not found")
-            return None
-            
+    def validate_payment(self, amount: float, payment_date: str = None,
+                         notes: str = None) -> Optional[Tuple[str, str]]:
+        """Validate payment fields; returns (payment_date, notes) ready to store, or None"""
         # Validate amount
         is_valid, error_msg = validate_positive_number(amount, "Amount", allow_zero=False)
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return None
             
         # Validate and set payment date
         if payment_date:
             is_valid, error_msg = validate_date(payment_date, "Payment date")
             if not is_valid:
-                display_error_message(error_msg)
+                emit_error(error_msg)
                 return None
         else:
             payment_date = get_current_date()
             
-        notes = sanitize_input(notes)
+        return payment_date, sanitize_input(notes)
+
+    def record_payment(self, subscription_id: int, amount: float, 
+                      payment_date: str = None, notes: str = None,
+                      idempotency_key: str = None) -> Optional[Payment]:
+        # A retried submission returns the payment recorded the first time
+        if idempotency_key:
+            existing_id = idempotency_manager.lookup(PAYMENT_SCOPE, idempotency_key)
+            if existing_id:
+                emit_info(f"Payment already recorded with ID: {existing_id}")
+                return self.get_payment_by_id(existing_id)
+
+        # Check if subscription exists
+        from .subscriptions import subscription_manager
+        subscription = subscription_manager.get_subscription_by_id(subscription_id)
+        if not subscription:
+            emit_error(f"Subscription with ID {subscription_id} not found")
+            return None
+            
+        fields = self.validate_payment(amount, payment_date, notes)
+        if fields is None:
+            return None
+        payment_date, notes = fields
             
         try:
             query = """
                 INSERT INTO payments (subscription_id, amount, payment_date, notes)
                 VALUES (?, ?, ?, ?)
             """
-            payment_id = execute_insert(query, (subscription_id, amount, payment_date, notes))
+            params = (subscription_id, amount, payment_date, notes)
+            if idempotency_key:
+                payment_id, created = idempotency_manager.insert_once(PAYMENT_SCOPE, idempotency_key, query, params)
+                if payment_id and not created:
+                    # lost the race to a concurrent retry with the same key
+                    return self.get_payment_by_id(payment_id)
+            else:
+                payment_id = execute_insert(query, params)
             
             if payment_id:
                 payment = Payment(
@@ -96,182 +79,104 @@ class PaymentManager:
                     notes = notes,
                     subscription = subscription
                 )
-                display_success_message(f"Payment recorded successfully with ID: {payment_id}")
+                PAYMENTS_RECORDED.inc(source="record_payment")
+                PAYMENT_AMOUNT.inc(amount, source="record_payment")
+                emit_success(f"Payment recorded successfully with ID: {payment_id}")
                 return payment
             else:
-                display_error_message("Failed to record payment")
+                emit_error("Failed to record payment")
                 return None
                 
         except Exception as e:
-            display_error_message(f"Error recording payment: {str(e)}")
+            emit_error(f"Error recording payment: {str(e)}")
             return None
 
 
 
-    def get_all_payments(self) -> List[Payment]:
+    def _fetch(self, name: str, params=None, lean: bool = False) -> List[Union[Payment, PaymentRow]]:
+        # lean: PaymentRow namedtuples, without the subscription / member / plan graph
+        if lean :
+            return PAYMENT_ROW.fetch(QUERIES[f'payments.{name}.lean'], params)
+        return PAYMENT_DETAIL.fetch(QUERIES[f'payments.{name}'], params)
+
+    def get_all_payments(self, lean: bool = False) -> List[Union[Payment, PaymentRow]]:
         try:
-            query = """
-                SELECT p.*, 
-                s.member_id, s.plan_id, s.start_date, s.end_date, s.is_active,
-                m.first_name, m.last_name, m.email, m.phone, m.date_joined, m.status,
-                pl.name as plan_name, pl.description, pl.duration_days, pl.price, pl.is_active as plan_is_active
-                FROM payments p
-                JOIN subscriptions s ON p.subscription_id = s.id
-                JOIN members m ON s.member_id = m.id
-                JOIN plans pl ON s.plan_id = pl.id
-                ORDER BY p.payment_date DESC, p.id DESC
-            """
-            rows = execute_query(query)
-            
-            payments = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)                
-                payment = self._create_payment_from_row(row, subscription)
-                payments.append(payment)
-                
-            return payments
+            return self._fetch('all', lean=lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving payments: {str(e)}")
+            emit_error(f"Error retrieving payments: {str(e)}")
             return []
 
     def get_payment_by_id(self, payment_id:int) -> Optional[Payment]:
         try:
-            query = """
-                SELECT p.*, 
-                s.member_id, s.plan_id, s.start_date, s.end_date, s.is_active,
-                m.first_name, m.last_name, m.email, m.phone, m.date_joined, m.status,
-                pl.name as plan_name, pl.description, pl.duration_days, pl.price, pl.is_active as plan_is_active
-                FROM payments p
-                JOIN subscriptions s ON p.subscription_id = s.id
-                JOIN members m ON s.member_id = m.id
-                JOIN plans pl ON s.plan_id = pl.id
-                WHERE p.id = ?
-            """
-            rows = execute_query(query, (payment_id,))
+            query = QUERIES['payments.by_id']
+            payments = PAYMENT_DETAIL.fetch(query, (payment_id,))
             
-            if rows:
-                row = rows[0]
-                
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)                
-                return self._create_payment_from_row(row, subscription)
+            if payments:
+                return payments[0]
             else:
-                display_error_message(f"Payment with ID {payment_id} not found")
+                emit_error(f"Payment with ID {payment_id} not found")
                 return None
                 
         except Exception as e:
-            display_error_message(f"Error retrieving payment: {str(e)}")
+            emit_error(f"Error retrieving payment: {str(e)}")
             return None
 
-    def get_payments_by_subscription(self, subscription_id: int) -> List[Payment]:
+    def get_payments_by_ids(self, payment_ids: List[int], lean: bool = False) -> List[Union[Payment, PaymentRow]]:
+        # in the order given; unknown ids are skipped
+        if not payment_ids :
+            return []
+        try:
+            select, hydrator = (PAYMENT_ROW_SELECT, PAYMENT_ROW) if lean else (PAYMENT_DETAIL_SELECT, PAYMENT_DETAIL)
+            query = select + f"WHERE p.id IN ({', '.join('?' * len(payment_ids))})"
+            by_id = {payment.id: payment for payment in hydrator.fetch(query, tuple(payment_ids))}
+            return [by_id[payment_id] for payment_id in payment_ids if payment_id in by_id]
+
+        except Exception as e:
+            emit_error(f"Error retrieving payments: {str(e)}")
+            return []
+
+    def get_payments_by_subscription(self, subscription_id: int,
+                                     lean: bool = False) -> List[Union[Payment, PaymentRow]]:
 
         try:
-            query = """
-                SELECT p.*, 
-                s.member_id, s.plan_id, s.start_date, s.end_date, s.is_active,
-                m.first_name, m.last_name, m.email, m.phone, m.date_joined, m.status,
-                pl.name as plan_name, pl.description, pl.duration_days, pl.price, pl.is_active as plan_is_active
-                FROM payments p
-                JOIN subscriptions s ON p.subscription_id = s.id
-                JOIN members m ON s.member_id = m.id
-                JOIN plans pl ON s.plan_id = pl.id
-                WHERE p.subscription_id = ?
-                ORDER BY p.payment_date DESC, p.id DESC
-            """
-            rows = execute_query(query, (subscription_id,))
-            
-            payments = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)                
-                payment = self._create_payment_from_row(row, subscription)
-                payments.append(payment)
-                
-            return payments
+            return self._fetch('by_subscription', (subscription_id,), lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving subscription payments: {str(e)}")
+            emit_error(f"Error retrieving subscription payments: {str(e)}")
             return []
 
-    def get_payments_by_member(self, member_id: int) -> List[Payment]:
+    def get_payments_by_member(self, member_id: int, lean: bool = False) -> List[Union[Payment, PaymentRow]]:
 
         try:
-            query = """
-                SELECT p.*, 
-                s.member_id, s.plan_id, s.start_date, s.end_date, s.is_active,
-                m.first_name, m.last_name, m.email, m.phone, m.date_joined, m.status,
-                pl.name as plan_name, pl.description, pl.duration_days, pl.price, pl.is_active as plan_is_active
-                FROM payments p
-                JOIN subscriptions s ON p.subscription_id = s.id
-                JOIN members m ON s.member_id = m.id
-                JOIN plans pl ON s.plan_id = pl.id
-                WHERE s.member_id = ?
-                ORDER BY p.payment_date DESC, p.id DESC
-            """
-            rows = execute_query(query, (member_id,))
-            
-            payments = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)                
-                payment = self._create_payment_from_row(row, subscription)
-                payments.append(payment)
-                
-            return payments
+            return self._fetch('by_member', (member_id,), lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving member payments: {str(e)}")
+            emit_error(f"Error retrieving member payments: {str(e)}")
             return []
 
-    def get_payments_by_date_range(self, start_date: str, end_date: str) -> List[Payment]:
+    def get_payments_by_date_range(self, start_date: str, end_date: str,
+                                   lean: bool = False) -> List[Union[Payment, PaymentRow]]:
         
         # Validate date range
         is_valid, error_msg = validate_payment_date_range(start_date, end_date)
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return []
             
         try:
-            query = """
-                SELECT p.*, 
-                s.member_id, s.plan_id, s.start_date, s.end_date, s.is_active,
-                m.first_name, m.last_name, m.email, m.phone, m.date_joined, m.status,
-                pl.name as plan_name, pl.description, pl.duration_days, pl.price, pl.is_active as plan_is_active
-                FROM payments p
-                JOIN subscriptions s ON p.subscription_id = s.id
-                JOIN members m ON s.member_id = m.id
-                JOIN plans pl ON s.plan_id = pl.id
-                WHERE p.payment_date BETWEEN ? AND ?
-                ORDER BY p.payment_date DESC, p.id DESC
-            """
-            rows = execute_query(query, (start_date, end_date))
-            
-            payments = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)                
-                payment = self._create_payment_from_row(row, subscription)
-                payments.append(payment)
-                
-            return payments
+            return self._fetch('by_date_range', (start_date, end_date), lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving payments by date range: {str(e)}")
+            emit_error(f"Error retrieving payments by date range: {str(e)}")
             return []
 
-    def get_todays_payments(self) -> List[Payment]:
+    def get_todays_payments(self, lean: bool = False) -> List[Union[Payment, PaymentRow]]:
         try:
             today = get_current_date()
-            return self.get_payments_by_date_range(today, today)
+            return self.get_payments_by_date_range(today, today, lean)
         except Exception as e:
-            display_error_message(f"Error retrieving today's payments: {str(e)}")
+            emit_error(f"Error retrieving today's payments: {str(e)}")
             return []
 
     def update_payment_notes(self, payment_id:int, notes:str) -> bool:
@@ -287,11 +192,11 @@ class PaymentManager:
             query = "UPDATE payments SET notes = ? WHERE id = ?"
             execute_query(query, (notes, payment_id))
             
-            display_success_message(f"Payment {payment_id} notes updated successfully")
+            emit_success(f"Payment {payment_id} notes updated successfully")
             return True
             
         except Exception as e:
-            display_error_message(f"Error updating payment notes: {str(e)}")
+            emit_error(f"Error updating payment notes: {str(e)}")
             return False
 
     def get_payment_stats(self, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
@@ -300,7 +205,7 @@ class PaymentManager:
                 # Validate date range
                 is_valid, error_msg = validate_date_ranges(start_date, end_date)
                 if not is_valid:
-                    display_error_message(error_msg)
+                    emit_error(error_msg)
                     return {}
                     
                 query_total = """
@@ -323,13 +228,79 @@ class PaymentManager:
             }
             
         except Exception as e:
-            display_error_message(f"Error retrieving payment statistics: {str(e)}")
+            emit_error(f"Error retrieving payment statistics: {str(e)}")
             return {
                 'total_payments': 0,
                 'total_revenue': 0.0,
                 'average_payment': 0.0
             }
 
+    def get_member_balance(self, member_id: int) -> Dict[str, Any]:
+        """Payment totals for a member from member_balances (a single primary key lookup)"""
+        balance = {
+            'member_id': member_id,
+            'total_paid': 0.0,
+            'payment_count': 0,
+            'last_payment_date': None
+        }
+        try:
+            query = """
+                SELECT total_paid, payment_count, last_payment_date
+                FROM member_balances WHERE member_id = ?
+            """
+            rows = execute_query(query, (member_id,))
+            if rows:
+                balance.update(dict(rows[0]))
+            return balance
+
+        except Exception as e:
+            emit_error(f"Error retrieving member balance: {str(e)}")
+            return balance
+
+    def rebuild_member_balances(self, verify_only: bool = False) -> Optional[Dict[str, Any]]:
+        """Check member_balances against the raw payments and rebuild it when they differ"""
+        # members whose stored totals differ from a fresh aggregate, in either direction
+        query = f"""
+            WITH expected AS ({MEMBER_BALANCES_QUERY}),
+            stored AS (
+                SELECT member_id, total_paid, payment_count, last_payment_date
+                FROM member_balances WHERE payment_count > 0
+            )
+            SELECT COUNT(DISTINCT member_id) as mismatched FROM (
+                SELECT * FROM (
+                    SELECT member_id, ROUND(total_paid, 2), payment_count, last_payment_date FROM stored
+                    EXCEPT
+                    SELECT member_id, ROUND(total_paid, 2), payment_count, last_payment_date FROM expected
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT member_id, ROUND(total_paid, 2), payment_count, last_payment_date FROM expected
+                    EXCEPT
+                    SELECT member_id, ROUND(total_paid, 2), payment_count, last_payment_date FROM stored
+                )
+            )
+        """
+        try:
+            with transaction() as conn:
+                mismatched = conn.execute(query).fetchone()[0]
+                rebuilt = bool(mismatched) and not verify_only
+                if rebuilt:
+                    conn.execute("DELETE FROM member_balances")
+                    conn.execute(MEMBER_BALANCES_REBUILD)
+                members = conn.execute("SELECT COUNT(*) FROM member_balances").fetchone()[0]
+
+            if not mismatched:
+                emit_success(f"Member balances verified for {members} members")
+            elif rebuilt:
+                emit_success(f"Rebuilt member balances ({mismatched} members were out of date)")
+            else:
+                emit_warning(f"{mismatched} member balances differ from the payments table")
+            return {'members': members, 'mismatched': mismatched, 'rebuilt': rebuilt}
+
+        except Exception as e:
+            emit_error(f"Error rebuilding member balances: {str(e)}")
+            return None
+
 # Singleton instance for use throughout the application
 payment_manager = PaymentManager()
 
@@ -1,10 +1,11 @@
-from typing import List, Optional, Dict, Any
-from ..models import Plan
+from typing import List, Optional, Dict, Any, Union
+from ..models import Plan, PlanRow
 from ..database import execute_query, execute_insert
+from ..queries import QUERIES
+from ..hydration import PLAN, PLAN_ROW
 from ..utils.validators import validate_positive_number, validate_name
 from ..utils.helpers import sanitize_input, format_currency
-from ..utils.display import (display_plans_table, display_plan_details, 
- display_success_message, display_error_message)
+from ..events import emit_success, emit_error
 
 
 class PlanManager :
@@ -19,17 +20,17 @@ class PlanManager :
 
         is_valid, error_msg = validate_name(name, "Plan name")
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return None
             
         is_valid, error_msg = validate_positive_number(duration_days, "Duration", allow_zero=False)
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return None
 
         is_valid, error_msg = validate_positive_number(price, "Price", allow_zero=True)
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return None
 
         try :
@@ -48,75 +49,70 @@ class PlanManager :
                     price = price,
                     is_active = is_active
                 )
-                display_success_message(f"Plan '{name}' added successfully with ID: {plan_id}")
+                emit_success(f"Plan '{name}' added successfully with ID: {plan_id}")
                 return plan
             else :
-                display_error_message("Failed to add plan to database")
+                emit_error("Failed to add plan to database")
                 return None
         except Exception as e:
-            display_error_message(f"Error adding plan: {str(e)}")
+            emit_error(f"Error adding plan: {str(e)}")
             return None
     
 
-    def get_all_plans(self, include_inactive:bool = False) -> List[Plan] :
+    def get_all_plans(self, include_inactive:bool = False, lean: bool = False) -> List[Union[Plan, PlanRow]] :
+        # lean: PlanRow namedtuples instead of Plan objects
         try:
             if include_inactive:
-                query = "SELECT * FROM plans ORDER BY id"
+                query = QUERIES['plans.all']
             else:
-                query = "SELECT * FROM plans WHERE is_active = TRUE ORDER BY id"
+                query = QUERIES['plans.active']
                 
-            rows = execute_query(query)
-            
-            plans = []
-            for row in rows:
-                plans.append(Plan.from_db_row(row))
-                
-            return plans
+            return (PLAN_ROW if lean else PLAN).fetch(query)
             
         except Exception as e:
-            display_error_message(f"Error retrieving plans: {str(e)}")
+            emit_error(f"Error retrieving plans: {str(e)}")
             return []
 
     
 
     def get_plan_by_id(self, plan_id:int) -> Optional[Plan] :
         try :
-            query = "SELECT * FROM plans WHERE id = ?"
-            rows = execute_query(query, (plan_id,))
+            query = QUERIES['plans.by_id']
+            plans = PLAN.fetch(query, (plan_id,))
 
-            if rows : 
-                return Plan.from_db_row(rows[0])
+            if plans :
+                return plans[0]
             else :
-                display_error_message(f"Plan with ID {plan_id} not found")
+                emit_error(f"Plan with ID {plan_id} not found")
                 return None
         except Exception as e :
-            display_error_message(f"Error retrieving plan: {str(e)}")
+            emit_error(f"Error retrieving plan: {str(e)}")
             return None
         
     def update_plan_name(self, plan_id:int, name:str) -> bool :
         if self.get_plan_by_id(plan_id) is None :
-            display_error_message(f"Plan with id {plan_id} doesn't exist")
+            emit_error(f"Plan with id {plan_id} doesn't exist")
             return False
 
         name = sanitize_input(name)
         is_valid, error_msg = validate_name(name, "Plan name")
         if not is_valid :
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return False
         
         try :
             query = "UPDATE plans SET name = ? WHERE id = ?"
             execute_query(query, (name, plan_id))
-            display_success_message(f"Plan {plan_id} name updated successfully")
+            emit_success(f"Plan {plan_id} name updated successfully")
             return True
         except Exception as e :
-            display_error_message(f"Error updating plan name: {str(e)}")
+            emit_error(f"Error updating plan name: {str(e)}")
             return False
     
 
     def update_plan_description(self, plan_id:int, description:str) -> bool :
         if self.get_plan_by_id(plan_id) is None :
-            display_error_message(f"Plan with id {plan_id} doesn't exist")
+            emit_error(f"Plan with id {plan_id} doesn't exist")
             return False
 
         description = sanitize_input(description) if description else None
@@ -124,54 +120,54 @@ class PlanManager :
         try:
             query = "UPDATE plans SET description = ? WHERE id = ?"
             execute_query(query, (description, plan_id))
-            display_success_message(f"Plan {plan_id} description updated successfully")
+            emit_success(f"Plan {plan_id} description updated successfully")
             return True
             
         except Exception as e:
-            display_error_message(f"Error updating plan description: {str(e)}")
+            emit_error(f"Error updating plan description: {str(e)}")
             return False
 
 
     def update_plan_duration(self, plan_id: int, duration_days: int) -> bool:
         if self.get_plan_by_id(plan_id) is None :
-            display_error_message(f"Plan with id {plan_id} doesn't exist")
+            emit_error(f"Plan with id {plan_id} doesn't exist")
             return False
 
         is_valid, error_msg = validate_positive_number(duration_days, "Duration", allow_zero=False)
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return False
             
         try:
             query = "UPDATE plans SET duration_days = ? WHERE id = ?"
             execute_query(query, (duration_days, plan_id))
-            display_success_message(f"Plan {plan_id} duration updated to {duration_days} days")
+            emit_success(f"Plan {plan_id} duration updated to {duration_days} days")
             return True
             
         except Exception as e:
-            display_error_message(f"Error updating plan duration: {str(e)}")
+            emit_error(f"Error updating plan duration: {str(e)}")
             return False
 
 
             
     def update_plan_price(self, plan_id: int, price: float) -> bool:
         if self.get_plan_by_id(plan_id) is None :
-            display_error_message(f"Plan with id {plan_id} doesn't exist")
+            emit_error(f"Plan with id {plan_id} doesn't exist")
             return False
             
         is_valid, error_msg = validate_positive_number(price, "Price", allow_zero=False)
         if not is_valid:
-            display_error_message(error_msg)
+            emit_error(error_msg)
             return False
             
         try:
             query = "UPDATE plans SET price = ? WHERE id = ?"
             execute_query(query, (price, plan_id))
-            display_success_message(f"Plan {plan_id} price updated to {format_currency(price)}")
+            emit_success(f"Plan {plan_id} price updated to {format_currency(price)}")
             return True
             
         except Exception as e:
-            display_error_message(f"Error updating plan price: {str(e)}")
+            emit_error(f"Error updating plan price: {str(e)}")
             return False
 
     def set_plan_status(self, plan_id: int, is_active: bool) -> bool:
@@ -180,11 +176,11 @@ class PlanManager :
             execute_query(query, (is_active, plan_id))
             
             status_text = "activated" if is_active else "deactivated"
-            display_success_message(f"Plan {plan_id} {status_text} successfully")
+            emit_success(f"Plan {plan_id} {status_text} successfully")
             return True
             
         except Exception as e:
-            display_error_message(f"Error updating plan status: {str(e)}")
+            emit_error(f"Error updating plan status: {str(e)}")
             return False
     
     def activate_plan(self, plan_id: int) -> bool:
@@ -211,7 +207,7 @@ class PlanManager :
             rows = execute_query(query)
             return rows
         except Exception as e:
-            display_error_message(f"Error retrieving plan statistics: {str(e)}")
+            emit_error(f"Error retrieving plan statistics: {str(e)}")
             return []
 
 # Singleton instance
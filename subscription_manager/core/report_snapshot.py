@@ -0,0 +1,223 @@
+"""Versioned, memory-mapped snapshot of the columnar extract for reporting replicas.
+
+write_snapshot() dumps the fixed-width columns of columnar.ColumnarExtract
+(subscriptions, payments, members, plans) to one binary file:
+
+    header    <8sHHIQ: magic b"SUBMSNAP", format version, reserved,
+              metadata length, data offset
+    metadata  JSON: creation time, source database, change_log watermark,
+              byte order, plan names, CRC32 of the data and, per table,
+              the row count and (column, typecode, offset, length)
+    data      each column's raw array bytes, 8-byte aligned
+
+SnapshotReader maps the file read-only and hands every column out as a
+memoryview cast to its typecode, so nothing is copied or parsed per row:
+ColumnarAnalytics(snapshot_path=...) answers the revenue, expiry and cohort
+reports straight from the page cache without opening the database. New
+snapshots replace the file atomically, so readers never see a partial one.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from .. import database
+from ..database import transaction
+from .columnar import ColumnarExtract, SCHEMA, typecode
+from ..events import emit_error, emit_success
+
+
+SNAPSHOT_MAGIC = b"SUBMSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snap"
+
+_HEADER = struct.Struct("<8sHHIQ")
+_ALIGNMENT = 8
+
+
+class SnapshotFormatError(Exception) :
+    """The file is not a snapshot this version can read"""
+
+
+def default_snapshot_path() -> Path:
+    return database.DB_PATH.parent / "snapshots" / f"reporting{SNAPSHOT_SUFFIX}"
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _read_consistent_extract() -> Tuple[ColumnarExtract, int]:
+    # one read transaction, so the tables and the watermark agree with each other
+    with transaction(write=False) as conn :
+        conn.execute("BEGIN")
+        row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        change_id = row[0] if row else 0
+        return ColumnarExtract.load(conn=conn), change_id
+
+
+def write_snapshot(path: str = None) -> Optional[Dict[str, Any]]:
+    """Write a snapshot of the current data to path (atomically); returns its metadata"""
+    path = Path(path) if path else default_snapshot_path()
+    try :
+        metadata = _write(path)
+    except Exception as e :
+        emit_error(f"Error writing snapshot: {str(e)}")
+        return None
+    emit_success(f"Snapshot of {metadata['tables']['payments']['rows']} payments and "
+                 f"{metadata['tables']['subscriptions']['rows']} subscriptions written to {path}")
+    return metadata
+
+
+def _write(path: Path) -> Dict[str, Any]:
+    started = time.perf_counter()
+    extract, change_id = _read_consistent_extract()
+
+    tables, chunks, offset = {}, [], 0
+    for table, schema in SCHEMA.items() :
+        columns = []
+        for name, _ in schema :
+            column = extract.tables[table][name]
+            data = column.tobytes()
+            offset = _aligned(offset)
+            columns.append([name, typecode(column), offset, len(data)])
+            chunks.append((offset, data))
+            offset += len(data)
+        tables[table] = {'rows': len(extract.tables[table]['id']), 'columns': columns}
+
+    data_size = offset
+    body = bytearray(data_size)
+    for chunk_offset, data in chunks :
+        body[chunk_offset:chunk_offset + len(data)] = data
+    checksum = zlib.crc32(body)
+
+    metadata = {
+        'version': SNAPSHOT_VERSION,
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'source': str(database.DB_PATH),
+        'change_id': change_id,
+        'byteorder': sys.byteorder,
+        'plan_names': {str(plan_id): name for plan_id, name in extract.plan_names.items()},
+        'data_size': data_size,
+        'crc32': checksum,
+        'tables': tables,
+    }
+    encoded = json.dumps(metadata, sort_keys=True).encode("utf-8")
+    data_offset = _aligned(_HEADER.size + len(encoded))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=str(path.parent))
+    try :
+        with os.fdopen(fd, "wb") as handle :
+            handle.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(encoded), data_offset))
+            handle.write(encoded)
+            handle.write(b"\0" * (data_offset - _HEADER.size - len(encoded)))
+            handle.write(body)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, path)
+    except BaseException :
+        if os.path.exists(tmp) :
+            os.unlink(tmp)
+        raise
+
+    metadata['path'] = str(path)
+    metadata['file_size'] = data_offset + data_size
+    metadata['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return metadata
+
+
+class SnapshotReader :
+    """Read-only mapping of a snapshot file; columns are zero-copy memoryviews"""
+
+    def __init__(self, path: str, verify: bool = False) :
+        self.path = Path(path)
+        with open(self.path, "rb") as handle :
+            # the mapping keeps its own handle on the file
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try :
+            self.metadata, self._data_offset = self._parse_header()
+            if verify :
+                self.verify()
+        except BaseException :
+            self._map.close()
+            raise
+
+    def _parse_header(self) -> Tuple[Dict[str, Any], int]:
+        if len(self._map) < _HEADER.size :
+            raise SnapshotFormatError(f"{self.path} is too short to be a snapshot")
+        magic, version, _, metadata_size, data_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != SNAPSHOT_MAGIC :
+            raise SnapshotFormatError(f"{self.path} is not a snapshot file")
+        if version > SNAPSHOT_VERSION :
+            raise SnapshotFormatError(f"{self.path} is snapshot format {version}; "
+                                      f"this version reads up to {SNAPSHOT_VERSION}")
+        metadata = json.loads(self._map[_HEADER.size:_HEADER.size + metadata_size].decode("utf-8"))
+        if metadata['byteorder'] != sys.byteorder :
+            raise SnapshotFormatError(f"{self.path} was written on a {metadata['byteorder']}-endian machine")
+        if data_offset + metadata['data_size'] > len(self._map) :
+            raise SnapshotFormatError(f"{self.path} is truncated")
+        return metadata, data_offset
+
+    def verify(self) -> None:
+        """Check the data against the stored CRC32 (reads the whole file)"""
+        data = memoryview(self._map)[self._data_offset:self._data_offset + self.metadata['data_size']]
+        try :
+            if zlib.crc32(data) != self.metadata['crc32'] :
+                raise SnapshotFormatError(f"{self.path} failed its checksum")
+        finally :
+            data.release()
+
+    def column(self, table: str, name: str) -> memoryview:
+        for column, code, offset, size in self.metadata['tables'][table]['columns'] :
+            if column == name :
+                start = self._data_offset + offset
+                return memoryview(self._map)[start:start + size].cast(code)
+        raise KeyError(f"{table}.{name}")
+
+    def extract(self, watermark: Tuple = None) -> ColumnarExtract:
+        tables = {table: {name: self.column(table, name) for name, _ in schema} for table, schema in SCHEMA.items()}
+        plan_names = {int(plan_id): name for plan_id, name in self.metadata['plan_names'].items()}
+        return ColumnarExtract(tables, plan_names, watermark)
+
+    def close(self) -> None:
+        # BufferError while a report still holds columns; the mapping then goes with them
+        try :
+            self._map.close()
+        except BufferError :
+            pass
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'path': str(self.path),
+            'version': self.metadata['version'],
+            'created_at': self.metadata['created_at'],
+            'source': self.metadata['source'],
+            'change_id': self.metadata['change_id'],
+            'file_size': len(self._map),
+            'payments': self.metadata['tables']['payments']['rows'],
+            'subscriptions': self.metadata['tables']['subscriptions']['rows'],
+            'members': self.metadata['tables']['members']['rows'],
+            'plans': self.metadata['tables']['plans']['rows'],
+        }
+
+
+def snapshot_info(path: str = None, verify: bool = False) -> Optional[Dict[str, Any]]:
+    """Metadata of a snapshot file, None (with an error reported) if it cannot be read"""
+    path = path or default_snapshot_path()
+    try :
+        reader = SnapshotReader(path, verify)
+    except (OSError, ValueError, KeyError, SnapshotFormatError) as e :
+        emit_error(f"Error reading snapshot: {str(e)}")
+        return None
+    info = reader.info()
+    reader.close()
+    if verify :
+        info['verified'] = True
+    return info
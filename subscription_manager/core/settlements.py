@@ -0,0 +1,281 @@
+import csv
+import hashlib
+import io
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Tuple, Iterator, Union, IO
+from ..database import get_db_connection, begin_write
+from ..utils.validators import validate_date, validate_positive_number
+from ..utils.helpers import get_current_date, sanitize_input
+from ..events import emit_success, emit_error, emit_warning
+from ..metrics import metrics, PAYMENTS_RECORDED, PAYMENT_AMOUNT
+
+
+# settlement file header for each field; payment_date, notes and reference are optional
+DEFAULT_COLUMNS = {
+    'subscription_id': 'subscription_id',
+    'amount': 'amount',
+    'payment_date': 'payment_date',
+    'notes': 'notes',
+    'reference': 'reference',
+}
+
+REPORT_COLUMNS = ["line", "subscription_id", "amount", "payment_date", "status", "payment_id", "reason"]
+
+MATCHED = "matched"
+UNMATCHED = "unmatched"
+INVALID = "invalid"
+DUPLICATE = "duplicate"
+
+# idempotency_keys scope of imported lines, and how long a line stays imported
+SETTLEMENT_SCOPE = "settlement"
+SETTLEMENT_KEY_DAYS = 400
+
+# unmatched / invalid lines kept in the summary; the --report CSV has them all
+UNMATCHED_SAMPLE = 100
+
+
+class SettlementImporter :
+    """Imports bank / processor settlement files as payments.
+
+    The file is read batch_size lines at a time. Each batch is validated in
+    Python, loaded into a temp table and resolved against subscriptions with
+    a single join, and the matched lines are inserted with executemany in one
+    transaction. Every line ends up matched, unmatched (unknown subscription),
+    invalid or duplicate, and the reconciliation report lists them all.
+
+    Each imported line claims a key in idempotency_keys: its processor
+    reference when the file has one, otherwise the file's SHA-256 digest and
+    line number. Importing the same file again skips those lines as duplicate.
+    """
+
+    def __init__(self, batch_size: int = 1000, columns: Dict[str, str] = None) :
+        self.batch_size = batch_size
+        self.columns = dict(DEFAULT_COLUMNS)
+        if columns :
+            self.columns.update(columns)
+
+    def _parse(self, line_no: int, record: Dict[str, str], default_date: str,
+               digest: str) -> Tuple[Optional[tuple], Optional[str]]:
+        """Return ((line, subscription_id, amount, date, notes, key), None) or (None, reason)"""
+        raw_id = (record.get(self.columns['subscription_id']) or "").strip()
+        try :
+            subscription_id = int(raw_id)
+        except ValueError :
+            return None, f"Invalid subscription id: {raw_id!r}"
+
+        raw_amount = (record.get(self.columns['amount']) or "").strip()
+        is_valid, error_msg = validate_positive_number(raw_amount, "Amount", allow_zero=False)
+        if not is_valid :
+            return None, error_msg
+
+        payment_date = (record.get(self.columns['payment_date']) or "").strip() or default_date
+        is_valid, error_msg = validate_date(payment_date, "Payment date")
+        if not is_valid :
+            return None, error_msg
+
+        notes = sanitize_input(record.get(self.columns['notes']))
+        reference = (record.get(self.columns['reference']) or "").strip()
+        key = f"ref:{reference}" if reference else f"{digest}:{line_no}"
+        return (line_no, subscription_id, round(float(raw_amount), 2), payment_date, notes, key), None
+
+    def _read_batches(self, reader: csv.DictReader, default_date: str,
+                      digest: str) -> Iterator[Tuple[List[tuple], List[tuple]]]:
+        """Yield (valid lines, invalid report rows) per batch_size lines"""
+        valid, invalid = [], []
+        # line 1 is the header
+        for line_no, record in enumerate(reader, 2) :
+            parsed, reason = self._parse(line_no, record, default_date, digest)
+            if parsed :
+                valid.append(parsed)
+            else :
+                invalid.append((line_no, record.get(self.columns['subscription_id']),
+                                record.get(self.columns['amount']),
+                                record.get(self.columns['payment_date']), INVALID, None, reason))
+            if len(valid) + len(invalid) >= self.batch_size :
+                yield valid, invalid
+                valid, invalid = [], []
+        if valid or invalid :
+            yield valid, invalid
+
+    def _import_batch(self, conn: sqlite3.Connection, lines: List[tuple], dry_run: bool) -> List[tuple]:
+        """Resolve and insert one batch in a single transaction; returns its report rows"""
+        try :
+            begin_write(conn, "settlement")
+            conn.execute("DELETE FROM temp.settlement_lines")
+            conn.executemany("""
+                INSERT INTO temp.settlement_lines (line_no, subscription_id, amount, payment_date, notes, key)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, lines)
+            # an expired key may be claimed again
+            conn.execute("""
+                DELETE FROM idempotency_keys
+                WHERE scope = ? AND expires_at <= datetime('now')
+                  AND key IN (SELECT key FROM temp.settlement_lines)
+            """, (SETTLEMENT_SCOPE,))
+            resolved = conn.execute("""
+                SELECT t.line_no, t.subscription_id, t.amount, t.payment_date, t.notes,
+                       s.id IS NOT NULL AS found, t.key, k.resource_id AS imported_as
+                FROM temp.settlement_lines t
+                LEFT JOIN subscriptions s ON s.id = t.subscription_id
+                LEFT JOIN idempotency_keys k ON k.scope = ? AND k.key = t.key
+                ORDER BY t.line_no
+            """, (SETTLEMENT_SCOPE,)).fetchall()
+
+            # a reference repeated within the batch only counts once
+            seen = set()
+            duplicates = {}
+            matched = []
+            for row in resolved :
+                if row[7] is not None or row[6] in seen :
+                    duplicates[row[0]] = row[7]
+                elif row[5] :
+                    seen.add(row[6])
+                    matched.append(row)
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM payments").fetchone()[0]
+            conn.executemany("""
+                INSERT INTO payments (subscription_id, amount, payment_date, notes)
+                VALUES (?, ?, ?, ?)
+            """, [row[1:5] for row in matched])
+            # we hold the write lock, so the new ids are exactly the ones above last_id
+            payment_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM payments WHERE id > ? ORDER BY id", (last_id,))]
+            conn.executemany("""
+                INSERT INTO idempotency_keys (scope, key, resource_id, expires_at)
+                VALUES (?, ?, ?, datetime('now', ?))
+            """, [(SETTLEMENT_SCOPE, row[6], payment_id, f"+{SETTLEMENT_KEY_DAYS} days")
+                  for row, payment_id in zip(matched, payment_ids)])
+
+            if dry_run :
+                conn.rollback()
+                payment_ids = [None] * len(matched)
+            else :
+                conn.commit()
+                if metrics.enabled :
+                    PAYMENTS_RECORDED.inc(len(matched), source="settlement")
+                    PAYMENT_AMOUNT.inc(sum(row[2] for row in matched), source="settlement")
+        except BaseException :
+            conn.rollback()
+            raise
+
+        ids = dict(zip((row[0] for row in matched), payment_ids))
+        report = []
+        for line_no, subscription_id, amount, payment_date, _, found, _, _ in resolved :
+            if line_no in duplicates :
+                report.append((line_no, subscription_id, amount, payment_date, DUPLICATE, duplicates[line_no],
+                               "Already imported"))
+            elif found :
+                report.append((line_no, subscription_id, amount, payment_date, MATCHED, ids[line_no], None))
+            else :
+                report.append((line_no, subscription_id, amount, payment_date, UNMATCHED, None,
+                               f"Subscription with ID {subscription_id} not found"))
+        return report
+
+    def import_file(self, source: Union[str, Path, IO[str]], report: Union[str, Path, IO[str]] = None,
+                    settlement_date: str = None, dry_run: bool = False) -> Optional[Dict[str, Any]]:
+        """Import a settlement CSV file; returns reconciliation totals.
+
+        Lines without a payment_date use settlement_date (default today).
+        When report is given, every line is written to it as CSV with its
+        status and payment id; the summary only keeps the first
+        UNMATCHED_SAMPLE unmatched and invalid lines. dry_run resolves and validates but rolls
+        every batch back. Lines imported before are skipped and reported as
+        duplicate, with the payment id they were imported as.
+        """
+        default_date = settlement_date or get_current_date()
+        summary = {
+            'lines': 0,
+            'matched': 0,
+            'unmatched': 0,
+            'invalid': 0,
+            'duplicate': 0,
+            'matched_amount': 0.0,
+            'unmatched_amount': 0.0,
+            'dry_run': dry_run,
+            'unmatched_lines': [],
+        }
+
+        own_source = not hasattr(source, 'read')
+        own_report = report is not None and not hasattr(report, 'write')
+        source_stream = report_stream = conn = None
+        try :
+            source_stream = open(source, newline='', encoding='utf-8') if own_source else source
+            source_stream, digest = _digest(source_stream)
+            reader = csv.DictReader(source_stream)
+            missing = [self.columns[field] for field in ('subscription_id', 'amount')
+                       if self.columns[field] not in (reader.fieldnames or [])]
+            if missing :
+                emit_error(f"Settlement file is missing column(s): {', '.join(missing)}")
+                return None
+
+            if report is not None :
+                report_stream = open(report, 'w', newline='', encoding='utf-8') if own_report else report
+                report_writer = csv.writer(report_stream)
+                report_writer.writerow(REPORT_COLUMNS)
+
+            conn = get_db_connection()
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS settlement_lines (
+                    line_no INTEGER PRIMARY KEY,
+                    subscription_id INTEGER NOT NULL,
+                    amount REAL NOT NULL,
+                    payment_date DATE NOT NULL,
+                    notes TEXT,
+                    key TEXT NOT NULL
+                )
+            """)
+
+            for valid, invalid in self._read_batches(reader, default_date, digest) :
+                rows = self._import_batch(conn, valid, dry_run) if valid else []
+                rows.extend(invalid)
+                rows.sort(key=lambda row: row[0])
+
+                for row in rows :
+                    summary['lines'] += 1
+                    summary[row[4]] += 1
+                    if row[4] == MATCHED :
+                        summary['matched_amount'] += row[2]
+                    elif row[4] == UNMATCHED :
+                        summary['unmatched_amount'] += row[2]
+                    if row[4] in (UNMATCHED, INVALID) and len(summary['unmatched_lines']) < UNMATCHED_SAMPLE :
+                        summary['unmatched_lines'].append(dict(zip(REPORT_COLUMNS, row)))
+                if report_stream is not None :
+                    report_writer.writerows(rows)
+
+            summary['matched_amount'] = round(summary['matched_amount'], 2)
+            summary['unmatched_amount'] = round(summary['unmatched_amount'], 2)
+            verb = "Would import" if dry_run else "Imported"
+            emit_success(f"{verb} {summary['matched']} of {summary['lines']} settlement lines")
+            if summary['unmatched'] or summary['invalid'] :
+                emit_warning(f"{summary['unmatched']} unmatched and {summary['invalid']} invalid lines")
+            if summary['duplicate'] :
+                emit_warning(f"{summary['duplicate']} lines were already imported and skipped")
+            return summary
+
+        except (OSError, csv.Error, sqlite3.Error) as e :
+            emit_error(f"Error importing settlement file after {summary['matched']} payments: {str(e)}")
+            return None
+        finally :
+            if conn is not None :
+                conn.close()
+            if own_source and source_stream is not None :
+                source_stream.close()
+            if own_report and report_stream is not None :
+                report_stream.close()
+
+
+def _digest(stream: IO[str]) -> Tuple[IO[str], str]:
+    """SHA-256 of the rest of stream; returns a stream positioned where it started"""
+    if not stream.seekable() :
+        # stdin and pipes are read once, so keep the text for the import itself
+        stream = io.StringIO(stream.read())
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1 << 16), "") :
+        digest.update(chunk.encode('utf-8'))
+    stream.seek(start)
+    return stream, digest.hexdigest()
+
+
+# Singleton instance
+settlement_importer = SettlementImporter()
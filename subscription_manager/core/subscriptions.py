@@ -1,9 +1,13 @@
-from typing import List, Optional, Dict
-from ..models import Subscription, Member, Plan
-from ..database import execute_query, execute_insert
+from typing import List, Optional, Dict, Union
+from ..models import Subscription, Member, Plan, SubscriptionRow
+from ..database import execute_query, execute_insert, has_subscription_timeline, TIMELINE_DAY
+from ..queries import QUERIES, SUBSCRIPTION_DETAIL_SELECT, SUBSCRIPTION_ROW_SELECT
+from ..hydration import SUBSCRIPTION_DETAIL, SUBSCRIPTION_ROW
 from ..utils.validators import validate_date
-from ..utils.helpers import get_current_date, format_date, parse_date, add_days_to_date, get_confirmation
-from ..utils.display import (display_success_message, display_error_message, display_warning_message)
+from ..utils.helpers import get_current_date, format_date, parse_date, add_days_to_date
+from ..events import emit_success, emit_error, emit_warning, emit_info, confirm
+from ..metrics import SUBSCRIPTION_EVENTS
+from .idempotency import idempotency_manager, SUBSCRIPTION_SCOPE
 
 
 class SubscriptionManager :
@@ -11,30 +15,40 @@ class SubscriptionManager :
         pass
 
     def create_subscription(self, member_id: int, plan_id: int, 
-                          start_date: str = None) -> Optional[Subscription] :
+                          start_date: str = None, replace_active: bool = None,
+                          idempotency_key: str = None) -> Optional[Subscription] :
+        # replace_active: True/False decides up front what to do when the member already
+        # has an active subscription; None asks through the event sink
+
+        # A retried submission returns the subscription created the first time
+        if idempotency_key :
+            existing_id = idempotency_manager.lookup(SUBSCRIPTION_SCOPE, idempotency_key)
+            if existing_id :
+                emit_info(f"Subscription already created with ID: {existing_id}")
+                return self.get_subscription_by_id(existing_id)
 
         # Check if member exists
         from .members import member_manager
         member = member_manager.get_member_by_id(member_id)
         if not member:
-            display_error_message(f"Member with ID {member_id} not found")
+            emit_error(f"Member with ID {member_id} not found")
             return None
             
         # Check if plan exists and is active
         from .plans import plan_manager
         plan = plan_manager.get_plan_by_id(plan_id)
         if not plan:
-            display_error_message(f"Plan with ID {plan_id} not found")
+            emit_error(f"Plan with ID {plan_id} not found")
             return None
         if not plan.is_active:
-            display_error_message(f"Plan with ID {plan_id} is not active")
+            emit_error(f"Plan with ID {plan_id} is not active")
             return None
             
         # Validate and set start date
         if start_date:
             is_valid, error_msg = validate_date(start_date, "Start date")
             if not is_valid:
-                display_error_message(error_msg)
+                emit_error(error_msg)
                 return None
         else:
             start_date = get_current_date()
@@ -45,15 +59,26 @@ class SubscriptionManager :
         try:
             active_subs = self.get_active_subscriptions_by_member(member_id)
             if active_subs :
-                display_warning_message(f"Member already has an active subscription. This will replace it.")
-                if not get_confirmation("Do you confirm replacing the current subscription ?") :
+                if replace_active is None :
+                    emit_warning(f"Member already has an active subscription. This will replace it.")
+                    if not confirm("Do you confirm replacing the current subscription ?") :
+                        return None
+                elif not replace_active :
+                    emit_error(f"Member {member_id} already has an active subscription")
                     return None
         
             query = """
                 INSERT INTO subscriptions (member_id, plan_id, start_date, end_date, is_active)
                 VALUES (?, ?, ?, ?, ?)
             """
-            subscription_id = execute_insert(query, (member_id, plan_id, start_date, end_date, True))
+            params = (member_id, plan_id, start_date, end_date, True)
+            if idempotency_key :
+                subscription_id, created = idempotency_manager.insert_once(SUBSCRIPTION_SCOPE, idempotency_key,
+                                                                          query, params)
+                if subscription_id and not created :
+                    return self.get_subscription_by_id(subscription_id)
+            else :
+                subscription_id = execute_insert(query, params)
             
             if subscription_id:
                 subscription = Subscription(
@@ -66,165 +91,67 @@ class SubscriptionManager :
                     member=member,
                     plan=plan
                 )
-                display_success_message(f"Subscription created successfully with ID: {subscription_id}")
+                SUBSCRIPTION_EVENTS.inc(event="created")
+                emit_success(f"Subscription created successfully with ID: {subscription_id}")
                 return subscription
             else:
-                display_error_message("Failed to create subscription")
+                emit_error("Failed to create subscription")
                 return None
                 
         except Exception as e:
-            display_error_message(f"Error creating subscription: {str(e)}")
+            emit_error(f"Error creating subscription: {str(e)}")
             return None
 
 
-    def _create_member_from_row(self, row):
-        """Create a Member object from a database row"""
-        return Member(
-            id=row['member_id'],
-            first_name=row['first_name'],
-            last_name=row['last_name'],
-            email=row['email'],
-            phone=row['phone']
-        )
-    def _create_plan_from_row(self, row):
-        """Create a Plan object from a database row"""
-        return Plan(
-            id=row['plan_id'],
-            name=row['plan_name'],
-            duration_days=row['duration_days'],
-            price=row['price']
-        )
-    def _create_subscription_from_row(self, row, member, plan):
-        """Create a Subscription object from a database row with Member and Plan objects"""
-        return Subscription(
-            id=row['id'],
-            member_id=row['member_id'],
-            plan_id=row['plan_id'],
-            start_date=row['start_date'],
-            end_date=row['end_date'],
-            is_active=bool(row['is_active']),
-            member=member,
-            plan=plan
-        )
-        
-
+    def _fetch(self, name: str, params=None, lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        # lean: SubscriptionRow namedtuples (names instead of Member / Plan objects)
+        if lean :
+            return SUBSCRIPTION_ROW.fetch(QUERIES[f'subscriptions.{name}.lean'], params)
+        return SUBSCRIPTION_DETAIL.fetch(QUERIES[f'subscriptions.{name}'], params)
 
-    def get_all_subscriptions(self, include_inactive: bool = False) -> List[Subscription]:
+    def get_all_subscriptions(self, include_inactive: bool = False,
+                              lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
 
         try:
-            if include_inactive:
-                query = """
-                    SELECT s.*, m.first_name, m.last_name, m.email, m.phone,
-                           p.name as plan_name, p.duration_days, p.price
-                    FROM subscriptions s
-                    JOIN members m ON s.member_id = m.id
-                    JOIN plans p ON s.plan_id = p.id
-                    ORDER BY s.id
-                """
-            else:
-                query = """
-                    SELECT s.*, m.first_name, m.last_name, m.email, m.phone,
-                           p.name as plan_name, p.duration_days, p.price
-                    FROM subscriptions s
-                    JOIN members m ON s.member_id = m.id
-                    JOIN plans p ON s.plan_id = p.id
-                    WHERE s.is_active = TRUE
-                    ORDER BY s.id
-                """
-                
-            rows = execute_query(query)
-            
-            subscriptions = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)
-                subscriptions.append(subscription)
-                
-            return subscriptions
+            return self._fetch('all' if include_inactive else 'active', lean=lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving subscriptions: {str(e)}")
+            emit_error(f"Error retrieving subscriptions: {str(e)}")
             return []
 
 
     def get_subscription_by_id(self, subscription_id: int) -> Optional[Subscription]:
         try:
-            query = """
-                SELECT s.*, m.first_name, m.last_name, m.email, m.phone,
-                       p.name as plan_name, p.duration_days, p.price
-                FROM subscriptions s
-                JOIN members m ON s.member_id = m.id
-                JOIN plans p ON s.plan_id = p.id
-                WHERE s.id = ?
-            """
-            rows = execute_query(query, (subscription_id,))
+            query = QUERIES['subscriptions.by_id']
+            subscriptions = SUBSCRIPTION_DETAIL.fetch(query, (subscription_id,))
             
-            if rows:
-                row = rows[0]
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)
-                return subscription
+            if subscriptions:
+                return subscriptions[0]
             else:
-                display_error_message(f"Subscription with ID {subscription_id} not found")
+                emit_error(f"Subscription with ID {subscription_id} not found")
                 return None
                 
         except Exception as e:
-            display_error_message(f"Error retrieving subscription: {str(e)}")
+            emit_error(f"Error retrieving subscription: {str(e)}")
             return None
 
 
-    def get_subscriptions_by_member(self, member_id: int) -> List[Subscription]:
+    def get_subscriptions_by_member(self, member_id: int,
+                                    lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
         try:
-            query = """
-                SELECT s.*, m.first_name, m.last_name, m.email, m.phone, 
-                       p.name as plan_name, p.duration_days, p.price
-                FROM subscriptions s
-                JOIN members m ON s.member_id = m.id
-                JOIN plans p ON s.plan_id = p.id
-                WHERE s.member_id = ?
-                ORDER BY s.start_date DESC
-            """
-            rows = execute_query(query, (member_id,))
-            
-            subscriptions = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)
-                subscriptions.append(subscription)
-                
-            return subscriptions
+            return self._fetch('by_member', (member_id,), lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving member subscriptions: {str(e)}")
+            emit_error(f"Error retrieving member subscriptions: {str(e)}")
             return []
 
-    def get_active_subscriptions_by_member(self, member_id: int) -> List[Subscription]:
+    def get_active_subscriptions_by_member(self, member_id: int,
+                                           lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
         try:
-            query = """
-                SELECT s.*, m.first_name, m.last_name, m.email, m.phone, 
-                       p.name as plan_name, p.duration_days, p.price
-                FROM subscriptions s
-                JOIN members m ON s.member_id = m.id
-                JOIN plans p ON s.plan_id = p.id
-                WHERE s.member_id = ? AND s.is_active = TRUE
-                ORDER BY s.start_date DESC
-            """
-            rows = execute_query(query, (member_id,))
-            
-            subscriptions = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)
-                subscriptions.append(subscription)
-
-            return subscriptions
+            return self._fetch('active_by_member', (member_id,), lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving active member subscriptions: {str(e)}")
+            emit_error(f"Error retrieving active member subscriptions: {str(e)}")
             return []
 
 
@@ -240,10 +167,11 @@ class SubscriptionManager :
             query = "UPDATE subscriptions SET end_date = ? WHERE id = ?"
             execute_query(query, (format_date(new_end_date), subscription_id))
 
-            display_success_message(f"Subscription {subscription_id} renewed until {format_date(new_end_date)}")
+            SUBSCRIPTION_EVENTS.inc(event="renewed")
+            emit_success(f"Subscription {subscription_id} renewed until {format_date(new_end_date)}")
             return True
         except Exception as e :
-            display_error_message(f"Error renewing subscription: {str(e)}")
+            emit_error(f"Error renewing subscription: {str(e)}")
             return False
 
     def cancel_subscription(self, subscription_id: int) -> bool:
@@ -251,11 +179,12 @@ class SubscriptionManager :
             query = "UPDATE subscriptions SET is_active = FALSE WHERE id = ?"
             execute_query(query, (subscription_id,))
             
-            display_success_message(f"Subscription {subscription_id} cancelled successfully")
+            SUBSCRIPTION_EVENTS.inc(event="cancelled")
+            emit_success(f"Subscription {subscription_id} cancelled successfully")
             return True
             
         except Exception as e:
-            display_error_message(f"Error cancelling subscription: {str(e)}")
+            emit_error(f"Error cancelling subscription: {str(e)}")
             return False
 
     def activate_subscription(self, subscription_id: int) -> bool:
@@ -263,68 +192,113 @@ class SubscriptionManager :
             query = "UPDATE subscriptions SET is_active = TRUE WHERE id = ?"
             execute_query(query, (subscription_id,))
             
-            display_success_message(f"Subscription {subscription_id} activated successfully")
+            SUBSCRIPTION_EVENTS.inc(event="activated")
+            emit_success(f"Subscription {subscription_id} activated successfully")
             return True
             
         except Exception as e:
-            display_error_message(f"Error activating subscription: {str(e)}")
+            emit_error(f"Error activating subscription: {str(e)}")
             return False
 
-    def get_expiring_subscriptions(self, days: int = 7) -> List[Subscription]:
+    def get_expiring_subscriptions(self, days: int = 7,
+                                   lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
 
         try:
-            query = """
-                SELECT s.*, m.first_name, m.last_name, m.email, m.phone, 
-                       p.name as plan_name, p.duration_days, p.price
-                FROM subscriptions s
-                JOIN members m ON s.member_id = m.id
-                JOIN plans p ON s.plan_id = p.id
-                WHERE s.is_active = TRUE 
-                AND s.end_date BETWEEN date('now') AND date('now', ?)
-                ORDER BY s.end_date ASC
-            """
-            rows = execute_query(query, (f"+{days} days",))
+            return self._fetch('expiring', (f"+{days} days",), lean)
             
-            subscriptions = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)
-                subscriptions.append(subscription)
-                
-            return subscriptions
+        except Exception as e:
+            emit_error(f"Error retrieving expiring subscriptions: {str(e)}")
+            return []
+
+    def get_expired_subscriptions(self, lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+
+        try:
+            return self._fetch('expired', lean=lean)
             
         except Exception as e:
-            display_error_message(f"Error retrieving expiring subscriptions: {str(e)}")
+            emit_error(f"Error retrieving expired subscriptions: {str(e)}")
             return []
 
-    def get_expired_subscriptions(self) -> List[Subscription]:
+    def _overlap_condition(self, include_inactive: bool) -> str:
+        """WHERE clause matching subscriptions that overlap (end_date, start_date) params"""
+        if has_subscription_timeline():
+            # R*Tree lookup instead of scanning every subscription
+            condition = f"""s.id IN (
+                SELECT id FROM subscription_timeline
+                WHERE start_day <= {TIMELINE_DAY.format('?')} AND end_day >= {TIMELINE_DAY.format('?')}
+            )"""
+        else:
+            condition = "s.start_date <= ? AND s.end_date >= ?"
+        if not include_inactive:
+            condition += " AND s.is_active = TRUE"
+        return condition
+
+    def _get_subscriptions_overlapping(self, start_date: str, end_date: str,
+                                       include_inactive: bool,
+                                       lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        select, hydrator = ((SUBSCRIPTION_ROW_SELECT, SUBSCRIPTION_ROW) if lean
+                            else (SUBSCRIPTION_DETAIL_SELECT, SUBSCRIPTION_DETAIL))
+        query = select + f"""
+            WHERE {self._overlap_condition(include_inactive)}
+            ORDER BY s.id
+        """
+        return hydrator.fetch(query, (end_date, start_date))
+
+    def get_active_on(self, on_date: str, include_inactive: bool = False,
+                      lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        """Subscriptions running on on_date (start_date <= on_date <= end_date).
+
+        Cancellations are not dated, so cancelled subscriptions are left out
+        unless include_inactive is set.
+        """
+        is_valid, error_msg = validate_date(on_date, "Date", allow_future=True)
+        if not is_valid:
+            emit_error(error_msg)
+            return []
 
         try:
-            query = """
-                SELECT s.*, m.first_name, m.last_name, m.email, m.phone, 
-                       p.name as plan_name, p.duration_days, p.price
+            return self._get_subscriptions_overlapping(on_date, on_date, include_inactive, lean)
+        except Exception as e:
+            emit_error(f"Error retrieving subscriptions active on {on_date}: {str(e)}")
+            return []
+
+    def get_active_between(self, start_date: str, end_date: str,
+                           include_inactive: bool = False,
+                           lean: bool = False) -> List[Union[Subscription, SubscriptionRow]]:
+        """Subscriptions running at any point between start_date and end_date (inclusive)"""
+        for value, field_name in ((start_date, "Start date"), (end_date, "End date")):
+            is_valid, error_msg = validate_date(value, field_name, allow_future=True)
+            if not is_valid:
+                emit_error(error_msg)
+                return []
+        if start_date > end_date:
+            emit_error("Start date must be before end date")
+            return []
+
+        try:
+            return self._get_subscriptions_overlapping(start_date, end_date, include_inactive, lean)
+        except Exception as e:
+            emit_error(f"Error retrieving subscriptions between {start_date} and {end_date}: {str(e)}")
+            return []
+
+    def count_members_active_on(self, on_date: str, include_inactive: bool = False) -> int:
+        """Number of distinct members with a subscription running on on_date"""
+        is_valid, error_msg = validate_date(on_date, "Date", allow_future=True)
+        if not is_valid:
+            emit_error(error_msg)
+            return 0
+
+        try:
+            query = f"""
+                SELECT COUNT(DISTINCT s.member_id) as count
                 FROM subscriptions s
-                JOIN members m ON s.member_id = m.id
-                JOIN plans p ON s.plan_id = p.id
-                WHERE s.is_active = TRUE 
-                AND s.end_date < date('now')
-                ORDER BY s.end_date ASC
+                WHERE {self._overlap_condition(include_inactive)}
             """
-            rows = execute_query(query)
-            
-            subscriptions = []
-            for row in rows:
-                member = self._create_member_from_row(row)
-                plan = self._create_plan_from_row(row)
-                subscription = self._create_subscription_from_row(row, member, plan)
-                subscriptions.append(subscription)
-
-            return subscriptions
-            
+            rows = execute_query(query, (on_date, on_date))
+            return rows[0]['count'] if rows else 0
         except Exception as e:
-            display_error_message(f"Error retrieving expired subscriptions: {str(e)}")
-            return []
+            emit_error(f"Error counting members active on {on_date}: {str(e)}")
+            return 0
 
     def get_subscription_stats(self) -> Dict[str, int]:
         try:
@@ -350,7 +324,7 @@ class SubscriptionManager :
             }
             
         except Exception as e:
-            display_error_message(f"Error retrieving subscription statistics: {str(e)}")
+            emit_error(f"Error retrieving subscription statistics: {str(e)}")
             return {
                 'total_subscriptions': 0,
                 'active_subscriptions': 0,
@@ -1,16 +1,287 @@
 import sqlite3
 import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from .events import emit_error, is_headless
+from .query_stats import query_stats, _is_lock_error
+from .profiling import span, DB
+from .metrics import (metrics, DB_STATEMENTS, DB_STATEMENT_SECONDS, DB_ERRORS, DB_LOCK_TIMEOUTS,
+                      DB_TRANSACTIONS, DB_SIZE_BYTES, DB_WRITE_LOCK_WAIT)
 
-DB_PATH = Path("data") / "subscription_manager.db"
+DB_PATH = Path(os.environ.get("SUBMAN_DB_PATH", Path("data") / "subscription_manager.db"))
+
+# sqlite3 keeps this many prepared statements per connection, keyed by the
+# SQL text; room for the whole query catalog plus the ad hoc statements
+STATEMENT_CACHE_SIZE = 256
 
 def get_db_connection():
     os.makedirs(DB_PATH.parent, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+# Long-lived connections bound to worker threads (server / executor pools).
+# Threads without one keep the default connection-per-call behaviour.
+_thread_state = threading.local()
+
+def bind_thread_connection():
+    conn = getattr(_thread_state, "conn", None)
+    if conn is None:
+        conn = get_db_connection()
+        _thread_state.conn = conn
+    return conn
+
+def release_thread_connection():
+    conn = getattr(_thread_state, "conn", None)
+    if conn is not None:
+        conn.close()
+        _thread_state.conn = None
+
+def release_pool_connections(executor, workers, timeout=60):
+    # sqlite3 connections can only be closed by their own thread: run one
+    # release task per worker, held at a barrier so no thread takes two
+    barrier = threading.Barrier(workers)
+
+    def release():
+        try:
+            barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            pass
+        release_thread_connection()
+
+    try:
+        for _ in range(workers):
+            executor.submit(release)
+    except RuntimeError:
+        # already shut down
+        barrier.abort()
+
+@contextmanager
+def _connection():
+    conn = getattr(_thread_state, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+# Every write path (record_payment, PaymentWriter, settlement imports) goes
+# through these, so member_balances never needs a full recount.
+MEMBER_BALANCES_QUERY = """
+    SELECT s.member_id, SUM(p.amount) as total_paid, COUNT(*) as payment_count,
+           MAX(p.payment_date) as last_payment_date
+    FROM payments p
+    JOIN subscriptions s ON p.subscription_id = s.id
+    GROUP BY s.member_id
+"""
+
+MEMBER_BALANCES_REBUILD = (
+    "INSERT INTO member_balances (member_id, total_paid, payment_count, last_payment_date)"
+    + MEMBER_BALANCES_QUERY
+)
+
+_ADD_PAYMENT = """
+        INSERT INTO member_balances (member_id, total_paid, payment_count, last_payment_date)
+        SELECT member_id, NEW.amount, 1, NEW.payment_date FROM subscriptions WHERE id = NEW.subscription_id
+        ON CONFLICT (member_id) DO UPDATE SET
+            total_paid = total_paid + excluded.total_paid,
+            payment_count = payment_count + 1,
+            last_payment_date = MAX(COALESCE(last_payment_date, excluded.last_payment_date),
+                                    excluded.last_payment_date);
+"""
+
+_REMOVE_PAYMENT = """
+        UPDATE member_balances SET
+            total_paid = total_paid - OLD.amount,
+            payment_count = payment_count - 1,
+            last_payment_date = (
+                SELECT MAX(p.payment_date) FROM payments p
+                JOIN subscriptions s ON p.subscription_id = s.id
+                WHERE s.member_id = member_balances.member_id
+            )
+        WHERE member_id = (SELECT member_id FROM subscriptions WHERE id = OLD.subscription_id);
+"""
+
+MEMBER_BALANCE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_member_balances_insert
+    AFTER INSERT ON payments
+    BEGIN {_ADD_PAYMENT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_member_balances_delete
+    AFTER DELETE ON payments
+    BEGIN {_REMOVE_PAYMENT}
+    END
+    """,
+    # the new row is already in payments when _REMOVE_PAYMENT recomputes the
+    # last payment date, so removing first and adding second stays correct
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_member_balances_update
+    AFTER UPDATE OF subscription_id, amount, payment_date ON payments
+    BEGIN {_REMOVE_PAYMENT} {_ADD_PAYMENT}
+    END
+    """,
+]
+
+
+# Interval index over subscription dates for point-in-time queries. Dates are
+# stored as integer day numbers; SQLite builds without the RTREE module fall
+# back to range scans on subscriptions.
+TIMELINE_DAY = "CAST(julianday({}) AS INTEGER)"
+
+SUBSCRIPTION_TIMELINE_BACKFILL = f"""
+    INSERT OR REPLACE INTO subscription_timeline (id, start_day, end_day)
+    SELECT id, {TIMELINE_DAY.format('start_date')}, {TIMELINE_DAY.format('end_date')}
+    FROM subscriptions
+"""
+
+SUBSCRIPTION_TIMELINE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_subscription_timeline_insert
+    AFTER INSERT ON subscriptions
+    BEGIN
+        INSERT INTO subscription_timeline (id, start_day, end_day)
+        VALUES (NEW.id, {TIMELINE_DAY.format('NEW.start_date')}, {TIMELINE_DAY.format('NEW.end_date')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_subscription_timeline_update
+    AFTER UPDATE OF start_date, end_date ON subscriptions
+    BEGIN
+        UPDATE subscription_timeline
+        SET start_day = {TIMELINE_DAY.format('NEW.start_date')}, end_day = {TIMELINE_DAY.format('NEW.end_date')}
+        WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_subscription_timeline_delete
+    AFTER DELETE ON subscriptions
+    BEGIN
+        DELETE FROM subscription_timeline WHERE id = OLD.id;
+    END
+    """,
+]
+
+# str(DB_PATH) -> whether that database has subscription_timeline; filled by
+# init_database, or on first use for databases initialized by another process
+_timeline_available = {}
+
+def _has_timeline_table(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'subscription_timeline'").fetchone() is not None
+
+def _create_subscription_timeline(conn):
+    if _has_timeline_table(conn):
+        return True
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE subscription_timeline
+            USING rtree_i32(id, start_day, end_day)
+        """)
+    except sqlite3.OperationalError:
+        # no RTREE module in this SQLite build
+        return False
+    conn.execute(SUBSCRIPTION_TIMELINE_BACKFILL)
+    for trigger in SUBSCRIPTION_TIMELINE_TRIGGERS:
+        conn.execute(trigger)
+    return True
+
+def has_subscription_timeline():
+    # checked once per database instead of on every overlap query
+    key = str(DB_PATH)
+    if key not in _timeline_available:
+        with _connection() as conn:
+            _timeline_available[key] = _has_timeline_table(conn)
+    return _timeline_available[key]
+
+
+# Days whose daily_metrics rows are stale because a subscription or payment
+# changed; the daily metrics job recomputes them and clears the rows.
+DAILY_METRICS_DIRTY_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_metrics_subscription_insert
+    AFTER INSERT ON subscriptions
+    BEGIN
+        INSERT INTO daily_metrics_dirty (first_day, last_day)
+        VALUES (NEW.start_date, date(NEW.end_date, '+1 day'));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_metrics_subscription_update
+    AFTER UPDATE OF plan_id, start_date, end_date, is_active ON subscriptions
+    BEGIN
+        INSERT INTO daily_metrics_dirty (first_day, last_day)
+        VALUES (MIN(OLD.start_date, NEW.start_date), date(MAX(OLD.end_date, NEW.end_date), '+1 day'));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_metrics_subscription_delete
+    AFTER DELETE ON subscriptions
+    BEGIN
+        INSERT INTO daily_metrics_dirty (first_day, last_day)
+        VALUES (OLD.start_date, date(OLD.end_date, '+1 day'));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_metrics_payment_insert
+    AFTER INSERT ON payments
+    BEGIN
+        INSERT INTO daily_metrics_dirty (first_day, last_day)
+        VALUES (NEW.payment_date, NEW.payment_date);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_metrics_payment_update
+    AFTER UPDATE OF subscription_id, amount, payment_date ON payments
+    BEGIN
+        INSERT INTO daily_metrics_dirty (first_day, last_day)
+        VALUES (MIN(OLD.payment_date, NEW.payment_date), MAX(OLD.payment_date, NEW.payment_date));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_daily_metrics_payment_delete
+    AFTER DELETE ON payments
+    BEGIN
+        INSERT INTO daily_metrics_dirty (first_day, last_day)
+        VALUES (OLD.payment_date, OLD.payment_date);
+    END
+    """,
+]
+
+# Change data capture: every write to the main tables leaves a change_log row
+CHANGE_LOG_TABLES = ("members", "plans", "subscriptions", "payments")
+
+def _change_log_triggers():
+    for table in CHANGE_LOG_TABLES:
+        for event, op, row in (("INSERT", "insert", "NEW"), ("UPDATE", "update", "NEW"), ("DELETE", "delete", "OLD")):
+            yield f"""
+                CREATE TRIGGER IF NOT EXISTS trg_change_log_{table}_{op}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+                END
+            """
+
+def get_job_state(conn, name):
+    row = conn.execute("SELECT value FROM job_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+def set_job_state(conn, name, value):
+    conn.execute("""
+        INSERT INTO job_state (name, value, updated_at) VALUES (?, ?, datetime('now'))
+        ON CONFLICT (name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+    """, (name, value))
+
+
 def init_database():
     conn = get_db_connection()
     try :
@@ -67,12 +338,119 @@ def init_database():
             )
         """)
 
+        # Create idempotency keys table (dedup of retried payments / subscriptions)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                resource_id INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT (datetime('now')),
+                expires_at TIMESTAMP NOT NULL
+            )
+        """)
+
+        # Create member balances table (running payment totals, kept by the triggers below)
+        has_balances = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'member_balances'").fetchone()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS member_balances (
+                member_id INTEGER PRIMARY KEY,
+                total_paid REAL NOT NULL DEFAULT 0,
+                payment_count INTEGER NOT NULL DEFAULT 0,
+                last_payment_date DATE,
+                FOREIGN KEY (member_id) REFERENCES members (id)
+            )
+        """)
+        if not has_balances:
+            # first run against an existing database
+            conn.execute(MEMBER_BALANCES_REBUILD)
+        for trigger in MEMBER_BALANCE_TRIGGERS:
+            conn.execute(trigger)
+
+        timeline = _create_subscription_timeline(conn)
+
+        # Create daily metrics tables (per day and plan, filled by core.daily_metrics)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_metrics (
+                day DATE NOT NULL,
+                plan_id INTEGER NOT NULL,
+                active INTEGER NOT NULL DEFAULT 0,
+                new INTEGER NOT NULL DEFAULT 0,
+                churned INTEGER NOT NULL DEFAULT 0,
+                renewed INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, plan_id),
+                FOREIGN KEY (plan_id) REFERENCES plans (id)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_metrics_dirty (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_day DATE NOT NULL,
+                last_day DATE NOT NULL
+            )
+        """)
+        for trigger in DAILY_METRICS_DIRTY_TRIGGERS:
+            conn.execute(trigger)
+
+        # Create notifications table (expiry reminders, one per subscription, offset and end date)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subscription_id INTEGER NOT NULL,
+                member_id INTEGER NOT NULL,
+                offset_days INTEGER NOT NULL,
+                end_date DATE NOT NULL,
+                due_date DATE NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT (datetime('now')),
+                sent_at TIMESTAMP,
+                FOREIGN KEY (subscription_id) REFERENCES subscriptions (id),
+                FOREIGN KEY (member_id) REFERENCES members (id)
+            )
+        """)
+
+        # Create change log table (filled by triggers, read through core.change_log)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                changed_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+            )
+        """)
+        for trigger in _change_log_triggers():
+            conn.execute(trigger)
+
+        # Create job state table (watermarks and cursors of background jobs)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_state (
+                name TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT (datetime('now'))
+            )
+        """)
+
         # indexes
         conn.execute("CREATE INDEX IF NOT EXISTS idx_members_status ON members(status)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_end_date ON subscriptions(end_date)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_member_id ON subscriptions(member_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_start_date ON subscriptions(start_date)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_active ON plans(is_active)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(payment_date)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_subscription_id ON payments(subscription_id)")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_idempotency_scope_key ON idempotency_keys(scope, key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys(expires_at)")
+        conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_dedup
+            ON notifications(subscription_id, offset_days, end_date)
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications(status, due_date)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_changed_at ON change_log(changed_at)")
 
         default_plans = [
             ("Monthly Basic", "Limited Access", 30, 50.0),
@@ -88,48 +466,127 @@ def init_database():
         
 
         conn.commit()
-        print("Database initialized successfully")
+        _timeline_available[str(DB_PATH)] = timeline
+        if not is_headless():
+            print("Database initialized successfully", file=sys.stderr)
 
     except sqlite3.Error as e:
-        print(f"Error initializing database: {e}")
         conn.rollback()
+        emit_error(f"Error initializing database: {e}")
     finally:
         conn.close()
 
-def execute_query(query, params=None):
+def configure_database(path):
+    # point the application at another database file and make sure it is initialized
+    global DB_PATH
+    DB_PATH = Path(path)
+    init_database()
+
+def _database_size():
+    # the WAL holds committed pages until the next checkpoint
+    return sum(path.stat().st_size for path in (DB_PATH, Path(f"{DB_PATH}-wal")) if path.exists())
+
+DB_SIZE_BYTES.set_function(_database_size)
+
+def _record_metrics(kind, started, error=None):
+    DB_STATEMENTS.inc(kind=kind)
+    DB_STATEMENT_SECONDS.observe(time.perf_counter() - started, kind=kind)
+    if error is not None:
+        DB_ERRORS.inc(kind=kind)
+        if _is_lock_error(error):
+            DB_LOCK_TIMEOUTS.inc(kind=kind)
+
+def begin_write(conn, kind="transaction"):
+    # take the write lock up front, so the time spent waiting for it (within
+    # the busy timeout or not) is measured on its own
+    if conn.in_transaction:
+        return
+    if not metrics.enabled:
+        conn.execute("BEGIN IMMEDIATE")
+        return
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    finally:
+        DB_WRITE_LOCK_WAIT.observe(time.perf_counter() - started, kind=kind)
+
+@contextmanager
+def transaction(write=True):
+    # several statements on one connection, committed together or not at all;
+    # write=False leaves the locking to SQLite for read-only blocks
+    with _connection() as conn:
+        try:
+            if write:
+                begin_write(conn)
+            yield conn
+            conn.commit()
+        except BaseException as e:
+            conn.rollback()
+            if metrics.enabled:
+                DB_TRANSACTIONS.inc(outcome="rollback")
+                if isinstance(e, sqlite3.Error) and _is_lock_error(e):
+                    DB_LOCK_TIMEOUTS.inc(kind="transaction")
+            raise
+        DB_TRANSACTIONS.inc(outcome="commit")
+
+def _run_query(query, params, tuples):
     if params == None:
         params = ()
-    conn = get_db_connection()
-    try :
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        conn.commit()
-        return result
-    except sqlite3.Error as e:
-        print(f"Error executing query: {e}")
-        conn.rollback()
-        return []
-    finally:
-        conn.close()
+    with _connection() as conn, span(DB):
+        started = query_stats.start()
+        timed = time.perf_counter() if metrics.enabled else None
+        try :
+            cursor = conn.cursor()
+            if tuples:
+                # plain tuples instead of the connection's sqlite3.Row
+                cursor.row_factory = None
+            cursor.execute(query, params)
+            result = cursor.fetchall()
+            conn.commit()
+            query_stats.record(query, started, len(result))
+            if timed is not None:
+                _record_metrics("query", timed)
+            return cursor, result
+        except sqlite3.Error as e:
+            conn.rollback()
+            query_stats.record(query, started, error=e)
+            if timed is not None:
+                _record_metrics("query", timed, e)
+            emit_error(f"Error executing query: {e}")
+            return None, []
+
+def execute_query(query, params=None):
+    return _run_query(query, params, tuples=False)[1]
+
+def execute_query_rows(query, params=None):
+    # (column names, tuple rows) for hydration.Hydrator
+    cursor, rows = _run_query(query, params, tuples=True)
+    columns = tuple(column[0] for column in cursor.description) if cursor is not None and cursor.description else ()
+    return columns, rows
 
 def execute_insert(query, params=None):
     if params == None:
         params = ()
-    conn = get_db_connection()
-    try :
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        return cursor.lastrowid
-    except sqlite3.Error as e:
-        print(f"Error executing insert: {e}")
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+    with _connection() as conn, span(DB):
+        started = query_stats.start()
+        timed = time.perf_counter() if metrics.enabled else None
+        try :
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            conn.commit()
+            query_stats.record(query, started, cursor.rowcount)
+            if timed is not None:
+                _record_metrics("insert", timed)
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            conn.rollback()
+            query_stats.record(query, started, error=e)
+            if timed is not None:
+                _record_metrics("insert", timed, e)
+            emit_error(f"Error executing insert: {e}")
+            return None
 
-if __name__ != "__main__":
+# SUBMAN_NO_DB=1: processes that only read snapshot files (core/report_snapshot.py)
+# never open, create or migrate the database
+if __name__ != "__main__" and not os.environ.get("SUBMAN_NO_DB"):
     init_database()
-
-
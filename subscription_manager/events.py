@@ -0,0 +1,159 @@
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, Iterator
+from .utils.display import (display_success_message, display_error_message,
+ display_warning_message, display_info_message)
+from .utils.helpers import get_confirmation
+
+
+class ManagerError(Exception):
+    """Raised instead of reporting an error when a RaisingSink is installed"""
+
+
+class EventSink:
+    """Receives the status messages and confirmation requests issued by the managers.
+
+    The base sink is silent and answers confirmations with confirm_default,
+    which makes it suitable for servers, workers and scripts.
+    """
+
+    def __init__(self, confirm_default: bool = True):
+        self.confirm_default = confirm_default
+
+    def success(self, message: str) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def warning(self, message: str) -> None:
+        pass
+
+    def info(self, message: str) -> None:
+        pass
+
+    def confirm(self, prompt: str) -> bool:
+        return self.confirm_default
+
+
+class NullSink(EventSink):
+    """Headless sink: drops every message"""
+
+
+class ConsoleSink(EventSink):
+    """Interactive sink: prints through utils.display and asks on stdin"""
+
+    def success(self, message: str) -> None:
+        display_success_message(message)
+
+    def error(self, message: str) -> None:
+        display_error_message(message)
+
+    def warning(self, message: str) -> None:
+        display_warning_message(message)
+
+    def info(self, message: str) -> None:
+        display_info_message(message)
+
+    def confirm(self, prompt: str) -> bool:
+        return get_confirmation(prompt)
+
+
+class CollectingSink(EventSink):
+    """Records (level, message) pairs so callers can inspect them as structured results"""
+
+    def __init__(self, confirm_default: bool = True):
+        super().__init__(confirm_default)
+        self.events: List[Tuple[str, str]] = []
+
+    def success(self, message: str) -> None:
+        self.events.append(("success", message))
+
+    def error(self, message: str) -> None:
+        self.events.append(("error", message))
+
+    def warning(self, message: str) -> None:
+        self.events.append(("warning", message))
+
+    def info(self, message: str) -> None:
+        self.events.append(("info", message))
+
+    @property
+    def errors(self) -> List[str]:
+        return [message for level, message in self.events if level == "error"]
+
+    @property
+    def last_error(self) -> Optional[str]:
+        errors = self.errors
+        return errors[-1] if errors else None
+
+    def clear(self) -> None:
+        self.events = []
+
+
+class RaisingSink(CollectingSink):
+    """Turns the first reported error into a ManagerError"""
+
+    def error(self, message: str) -> None:
+        super().error(message)
+        # Managers report again from their own except blocks; keep the original error
+        current = sys.exc_info()[1]
+        if isinstance(current, ManagerError):
+            raise current
+        raise ManagerError(message)
+
+
+_default_sink: EventSink = NullSink() if os.environ.get("SUBMAN_HEADLESS") else ConsoleSink()
+_local = threading.local()
+
+
+def set_event_sink(sink: EventSink) -> None:
+    """Install the process-wide default sink (e.g. set_event_sink(NullSink()) for headless mode)"""
+    global _default_sink
+    _default_sink = sink
+
+
+def get_event_sink() -> EventSink:
+    return getattr(_local, "sink", None) or _default_sink
+
+
+def is_headless() -> bool:
+    return not isinstance(get_event_sink(), ConsoleSink)
+
+
+@contextmanager
+def use_event_sink(sink: EventSink) -> Iterator[EventSink]:
+    """Route manager events from the current thread to sink for the duration of the block"""
+    previous = getattr(_local, "sink", None)
+    _local.sink = sink
+    try:
+        yield sink
+    finally:
+        _local.sink = previous
+
+
+@contextmanager
+def capture_events(raise_errors: bool = False, confirm_default: bool = True) -> Iterator[CollectingSink]:
+    sink = RaisingSink(confirm_default) if raise_errors else CollectingSink(confirm_default)
+    with use_event_sink(sink):
+        yield sink
+
+
+# Functions used by the managers
+
+def emit_success(message: str) -> None:
+    get_event_sink().success(message)
+
+def emit_error(message: str) -> None:
+    get_event_sink().error(message)
+
+def emit_warning(message: str) -> None:
+    get_event_sink().warning(message)
+
+def emit_info(message: str) -> None:
+    get_event_sink().info(message)
+
+def confirm(prompt: str) -> bool:
+    return get_event_sink().confirm(prompt)
@@ -0,0 +1,154 @@
+"""Compiled row-to-model hydration.
+
+A Hydrator describes which model objects one result row holds and which
+column feeds each constructor argument. The first time it sees a result
+shape it looks the columns up once and generates a plain function that
+builds the objects straight from the tuple row by position:
+
+    def hydrate(row):
+        member = Member(id=row[5], first_name=row[10], ...)
+        plan = Plan(id=row[6], name=row[16], ...)
+        subscription = Subscription(id=row[1], ..., member=member, plan=plan)
+        return Payment(id=row[0], ..., subscription=subscription)
+
+so no sqlite3.Row name lookups or dict(row) copies happen per row.
+"""
+import threading
+from typing import List, Dict, Any, Callable, Sequence, Tuple, Union
+
+from .database import execute_query_rows
+from .models import Member, Plan, Subscription, Payment, MemberRow, PlanRow, SubscriptionRow, PaymentRow
+from .profiling import span, HYDRATE
+
+
+class Node :
+    """One model object built from a row.
+
+    fields maps constructor arguments to a column name, or to
+    (column name, converter); links maps constructor arguments to the
+    name of a node built earlier from the same row.
+    """
+
+    def __init__(self, name: str, model: type, fields: Dict[str, Union[str, Tuple[str, Callable]]],
+                 links: Dict[str, str] = None) :
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.links = links or {}
+
+
+class Hydrator :
+    """Builds the last node's object (with the others linked in) from tuple rows"""
+
+    def __init__(self, name: str, *nodes: Node) :
+        self.name = name
+        self.nodes = nodes
+        self._compiled: Dict[Tuple[str, ...], Callable[[tuple], Any]] = {}
+        self._lock = threading.Lock()
+
+    def compile(self, columns: Sequence[str]) -> Callable[[tuple], Any]:
+        """The hydration function for rows with these column names (cached per shape)"""
+        key = tuple(columns)
+        function = self._compiled.get(key)
+        if function is None :
+            with self._lock :
+                function = self._compiled.get(key)
+                if function is None :
+                    function = self._compiled[key] = self._generate(key)
+        return function
+
+    def _generate(self, columns: Tuple[str, ...]) -> Callable[[tuple], Any]:
+        positions = {}
+        for index, column in enumerate(columns) :
+            # the first of two same-named columns wins, as with sqlite3.Row
+            positions.setdefault(column, index)
+
+        namespace = {}
+        lines = ["def hydrate(row):"]
+        for node in self.nodes :
+            namespace[node.model.__name__] = node.model
+            arguments = []
+            for argument, source in node.fields.items() :
+                column, converter = source if isinstance(source, tuple) else (source, None)
+                if column not in positions :
+                    raise ValueError(f"Hydrator '{self.name}' needs column '{column}', "
+                                     f"which is not in the result ({', '.join(columns)})")
+                value = f"row[{positions[column]}]"
+                if converter is not None :
+                    namespace[converter.__name__] = converter
+                    value = f"{converter.__name__}({value})"
+                arguments.append(f"{argument}={value}")
+            arguments.extend(f"{argument}={target}" for argument, target in node.links.items())
+            lines.append(f"    {node.name} = {node.model.__name__}({', '.join(arguments)})")
+        lines.append(f"    return {self.nodes[-1].name}")
+
+        exec("\n".join(lines), namespace)
+        return namespace["hydrate"]
+
+    def hydrate_all(self, columns: Sequence[str], rows: List[tuple]) -> List[Any]:
+        if not rows :
+            return []
+        build = self.compile(columns)
+        with span(HYDRATE) :
+            return [build(row) for row in rows]
+
+    def fetch(self, query: str, params=None) -> List[Any]:
+        """Run query and hydrate every row ([] on a database error, like execute_query)"""
+        columns, rows = execute_query_rows(query, params)
+        return self.hydrate_all(columns, rows)
+
+
+MEMBER_FIELDS = {name: name for name in ("id", "first_name", "last_name", "email", "phone", "date_joined", "status")}
+PLAN_FIELDS = {name: name for name in ("id", "name", "description", "duration_days", "price")}
+PLAN_FIELDS['is_active'] = ("is_active", bool)
+
+MEMBER = Hydrator("member", Node("member", Member, MEMBER_FIELDS))
+PLAN = Hydrator("plan", Node("plan", Plan, PLAN_FIELDS))
+
+# rows of queries.SUBSCRIPTION_DETAIL_SELECT
+SUBSCRIPTION_DETAIL = Hydrator(
+    "subscription_detail",
+    Node("member", Member, {'id': "member_id", 'first_name': "first_name", 'last_name': "last_name",
+                            'email': "email", 'phone': "phone"}),
+    Node("plan", Plan, {'id': "plan_id", 'name': "plan_name", 'duration_days': "duration_days", 'price': "price"}),
+    Node("subscription", Subscription, {'id': "id", 'member_id': "member_id", 'plan_id': "plan_id",
+                                        'start_date': "start_date", 'end_date': "end_date",
+                                        'is_active': ("is_active", bool)},
+         links={'member': "member", 'plan': "plan"}),
+)
+
+# rows of queries.PAYMENT_DETAIL_SELECT
+PAYMENT_DETAIL = Hydrator(
+    "payment_detail",
+    Node("member", Member, {'id': "member_id", 'first_name': "first_name", 'last_name': "last_name",
+                            'email': "email", 'phone': "phone", 'date_joined': "date_joined", 'status': "status"}),
+    Node("plan", Plan, {'id': "plan_id", 'name': "plan_name", 'description': "description",
+                        'duration_days': "duration_days", 'price': "price",
+                        'is_active': ("plan_is_active", bool)}),
+    Node("subscription", Subscription, {'id': "subscription_id", 'member_id': "member_id", 'plan_id': "plan_id",
+                                        'start_date': "start_date", 'end_date': "end_date",
+                                        'is_active': ("is_active", bool)},
+         links={'member': "member", 'plan': "plan"}),
+    Node("payment", Payment, {'id': "id", 'subscription_id': "subscription_id", 'amount': "amount",
+                              'payment_date': "payment_date", 'notes': "notes"},
+         links={'subscription': "subscription"}),
+)
+
+# lean=True: one flat namedtuple per row, nothing linked
+MEMBER_ROW = Hydrator("member_row", Node("member", MemberRow, MEMBER_FIELDS))
+PLAN_ROW = Hydrator("plan_row", Node("plan", PlanRow, PLAN_FIELDS))
+
+# rows of queries.SUBSCRIPTION_ROW_SELECT
+SUBSCRIPTION_ROW = Hydrator(
+    "subscription_row",
+    Node("subscription", SubscriptionRow, {'id': "id", 'member_id': "member_id", 'member_name': "member_name",
+                                           'plan_id': "plan_id", 'plan_name': "plan_name",
+                                           'start_date': "start_date", 'end_date': "end_date",
+                                           'is_active': ("is_active", bool)}),
+)
+
+# rows of queries.PAYMENT_ROW_SELECT
+PAYMENT_ROW = Hydrator(
+    "payment_row",
+    Node("payment", PaymentRow, {name: name for name in ("id", "subscription_id", "amount", "payment_date", "notes")}),
+)
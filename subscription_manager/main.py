@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 from typing import Optional
@@ -8,10 +9,13 @@ from subscription_manager import (
     member_manager,
     plan_manager,
     subscription_manager,
-    payment_manager
+    payment_manager,
+    export_manager,
+    columnar_analytics
 )
+from subscription_manager.core.exports import DATE_RANGE_REPORTS
 from subscription_manager.utils import (
-    clear_screen, press_enter_to_continue, get_confirmation, is_valid_id, format_currency,
+    clear_screen, press_enter_to_continue, read_input, get_confirmation, is_valid_id, format_currency,
     validate_date, validate_positive_number, validate_name, validate_email, validate_phone,
     display_main_menu, display_success_message, display_error_message, display_info_message,
     display_warning_message, display_member_management_menu, display_member_details,
@@ -20,6 +24,7 @@ from subscription_manager.utils import (
     display_subscriptions_table, display_payment_menu, display_payments_table,
     display_reports_menu, print_table
 )
+from subscription_manager.profiling import profiled, PROFILE_MODES
 
 
 class SubscriptionManagementSystem :
@@ -27,6 +32,9 @@ class SubscriptionManagementSystem :
     def __init__(self):
         self.running = True
         self.current_user = None
+        # set while a profiled action runs: its "Press Enter" waits for the summary
+        self._defer_pause = False
+        self._pause_requested = False
     
     def run(self):
         """Main application loop"""
@@ -36,7 +44,7 @@ class SubscriptionManagementSystem :
         while self.running:
             try:
                 display_main_menu()
-                choice = input("\nEnter your choice (1-6): ").strip()
+                choice = read_input("\nEnter your choice (1-6): ").strip()
                 
                 if choice == '1':
                     self.member_management_menu()
@@ -52,14 +60,49 @@ class SubscriptionManagementSystem :
                     self.exit_application()
                 else:
                     display_error_message("Invalid choice. Please enter 1-6.")
-                    press_enter_to_continue()
+                    self._pause()
                     
             except KeyboardInterrupt:
                 self.exit_application()
             except Exception as e:
                 display_error_message(f"An unexpected error occurred: {str(e)}")
-                press_enter_to_continue()
-    
+                self._pause()
+    
+    def enable_profiling(self, mode: str, output_dir: Optional[str] = None):
+        """Profile every menu action (the menus themselves are left alone)"""
+        # prompts go through read_input / press_enter_to_continue, whose input
+        # spans keep the time spent typing out of the profile
+        skip = ('run', 'display_welcome', 'exit_application', 'enable_profiling')
+        for name in dir(self):
+            if name.startswith('_') or name in skip or name.endswith('_menu'):
+                continue
+            method = getattr(self, name)
+            if callable(method):
+                setattr(self, name, self._profiled_action(name, method, mode, output_dir))
+
+    def _pause(self):
+        if self._defer_pause:
+            self._pause_requested = True
+            return
+        press_enter_to_continue()
+
+    def _profiled_action(self, name, method, mode, output_dir):
+        run = profiled(method, name, mode, output_dir=output_dir, stream=sys.stdout)
+        def action(*args, **kwargs):
+            outer = self._defer_pause
+            self._defer_pause = True
+            if not outer:
+                self._pause_requested = False
+            try:
+                return run(*args, **kwargs)
+            finally:
+                # the summary is printed by now; an enclosing action takes over the pause
+                self._defer_pause = outer
+                if self._pause_requested and not outer:
+                    self._pause_requested = False
+                    press_enter_to_continue()
+        return action
+
     def display_welcome(self):
         """Display welcome message and system status"""
         print("=" * 60)
@@ -68,9 +111,9 @@ class SubscriptionManagementSystem :
         
         # Display system summary
         try:
-            members = member_manager.get_all_members()
-            plans = plan_manager.get_all_plans()
-            subscriptions = subscription_manager.get_all_subscriptions()
+            members = member_manager.get_all_members(lean=True)
+            plans = plan_manager.get_all_plans(lean=True)
+            subscriptions = subscription_manager.get_all_subscriptions(lean=True)
             payment_stats = payment_manager.get_payment_stats()
             
             print(f"\nSystem Status:")
@@ -82,13 +125,13 @@ class SubscriptionManagementSystem :
         except Exception as e:
             display_error_message(f"Error loading system status: {str(e)}")
         
-        press_enter_to_continue()
+        self._pause()
     
     def member_management_menu(self):
         while True:
             clear_screen()
             display_member_management_menu()
-            choice = input("\nEnter your choice (1-7): ").strip()
+            choice = read_input("\nEnter your choice (1-7): ").strip()
             
             if choice == '1':
                 self.add_member()
@@ -106,34 +149,34 @@ class SubscriptionManagementSystem :
                 break
             else:
                 display_error_message("Invalid choice. Please enter 1-7.")
-                press_enter_to_continue()
+                self._pause()
     
     def add_member(self):
         clear_screen()
         print("ADD NEW MEMBER")
         print("=" * 30)
         
-        first_name = input("First Name: ").strip()
-        last_name = input("Last Name: ").strip()
-        email = input("Email (optional): ").strip() or None
-        phone = input("Phone (optional): ").strip() or None
+        first_name = read_input("First Name: ").strip()
+        last_name = read_input("Last Name: ").strip()
+        email = read_input("Email (optional): ").strip() or None
+        phone = read_input("Phone (optional): ").strip() or None
         
         member = member_manager.add_member(first_name, last_name, email, phone)
         if member:
             display_member_details(member)
         
-        press_enter_to_continue()
+        self._pause()
     
     def view_all_members(self):
         clear_screen()
-        members = member_manager.get_all_members()
+        members = member_manager.get_all_members(lean=True)
         
         if not members:
             display_info_message("No members found in the system.")
         else:
             display_members_table(members)
         
-        press_enter_to_continue()
+        self._pause()
     
     def search_member_by_id(self):
         clear_screen()
@@ -141,49 +184,49 @@ class SubscriptionManagementSystem :
         print("=" * 25)
         
         try:
-            member_id = int(input("Enter Member ID: ").strip())
+            member_id = int(read_input("Enter Member ID: ").strip())
             member = member_manager.get_member_by_id(member_id)
             if member:
                 display_member_details(member)
-            press_enter_to_continue()
+            self._pause()
         except ValueError:
             display_error_message("Invalid Member ID format")
-            press_enter_to_continue()
+            self._pause()
     
     def search_member_by_name(self):
         clear_screen()
         print("SEARCH MEMBERS BY NAME")
         print("=" * 28)
         
-        name = input("Enter name to search: ").strip()
+        name = read_input("Enter name to search: ").strip()
         
         if not name:
             display_error_message("Please enter a name to search.")
         else:
-            members = member_manager.get_members_by_name(name)
+            members = member_manager.get_members_by_name(name, lean=True)
             if members:
                 display_members_table(members)
             else:
                 display_info_message(f"No members found matching '{name}'.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def update_member_info(self):
         clear_screen()
         print("UPDATE MEMBER INFORMATION")
         print("=" * 32)
         
-        member_id = input("Enter Member ID: ").strip()
+        member_id = read_input("Enter Member ID: ").strip()
         
         if not is_valid_id(member_id):
             display_error_message("Invalid member ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         member = member_manager.get_member_by_id(int(member_id))
         if not member:
             display_error_message(f"Member with ID {member_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_member_details(member)
@@ -194,19 +237,19 @@ class SubscriptionManagementSystem :
         print("3. Phone")
         print("4. Cancel")
         
-        choice = input("\nEnter your choice (1-4): ").strip()
+        choice = read_input("\nEnter your choice (1-4): ").strip()
         
         if choice == '1':
-            new_first = input(f"New First Name (current: {member.first_name}): ").strip() or member.first_name
-            new_last = input(f"New Last Name (current: {member.last_name}): ").strip() or member.last_name
+            new_first = read_input(f"New First Name (current: {member.first_name}): ").strip() or member.first_name
+            new_last = read_input(f"New Last Name (current: {member.last_name}): ").strip() or member.last_name
             member_manager.update_member_name(member.id, new_first, new_last)
         
         elif choice == '2':
-            new_email = input(f"New Email (current: {member.email or 'None'}): ").strip() or None
+            new_email = read_input(f"New Email (current: {member.email or 'None'}): ").strip() or None
             member_manager.update_member_email(member.id, new_email)
         
         elif choice == '3':
-            new_phone = input(f"New Phone (current: {member.phone or 'None'}): ").strip() or None
+            new_phone = read_input(f"New Phone (current: {member.phone or 'None'}): ").strip() or None
             member_manager.update_member_phone(member.id, new_phone)
         
         elif choice == '4':
@@ -214,24 +257,24 @@ class SubscriptionManagementSystem :
         else:
             display_error_message("Invalid choice.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def update_member_status(self):
         clear_screen()
         print("UPDATE MEMBER STATUS")
         print("=" * 25)
         
-        member_id = input("Enter Member ID: ").strip()
+        member_id = read_input("Enter Member ID: ").strip()
         
         if not is_valid_id(member_id):
             display_error_message("Invalid member ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         member = member_manager.get_member_by_id(int(member_id))
         if not member:
             display_error_message(f"Member with ID {member_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_member_details(member)
@@ -241,14 +284,14 @@ class SubscriptionManagementSystem :
         if get_confirmation(f"Change status to '{new_status}'?"):
             member_manager.update_member_status(member.id, new_status)
         
-        press_enter_to_continue()
+        self._pause()
     
 
     def plan_management_menu(self):
         while True:
             clear_screen()
             display_plan_management_menu()
-            choice = input("\nEnter your choice (1-5): ").strip()
+            choice = read_input("\nEnter your choice (1-5): ").strip()
             
             if choice == '1':
                 self.create_plan()
@@ -262,17 +305,17 @@ class SubscriptionManagementSystem :
                 break
             else:
                 display_error_message("Invalid choice. Please enter 1-5.")
-                press_enter_to_continue()
+                self._pause()
     
     def create_plan(self):
         clear_screen()
         print("CREATE NEW SUBSCRIPTION PLAN")
         print("=" * 35)
         
-        name = input("Plan Name: ").strip()
-        description = input("Description (optional): ").strip() or None
-        duration_input = input("Duration in days: ").strip()
-        price_input = input("Price: ").strip()
+        name = read_input("Plan Name: ").strip()
+        description = read_input("Description (optional): ").strip() or None
+        duration_input = read_input("Duration in days: ").strip()
+        price_input = read_input("Price: ").strip()
         
         # Validate duration
         try:
@@ -290,35 +333,35 @@ class SubscriptionManagementSystem :
         if plan:
             display_plan_details(plan)
         
-        press_enter_to_continue()
+        self._pause()
     
     def view_all_plans(self):
         clear_screen()
-        plans = plan_manager.get_all_plans(include_inactive=True)
+        plans = plan_manager.get_all_plans(include_inactive=True, lean=True)
         
         if not plans:
             display_info_message("No plans found in the system.")
         else:
             display_plans_table(plans)
         
-        press_enter_to_continue()
+        self._pause()
     
     def update_plan_details(self):
         clear_screen()
         print("UPDATE PLAN DETAILS")
         print("=" * 25)
         
-        plan_id = input("Enter Plan ID: ").strip()
+        plan_id = read_input("Enter Plan ID: ").strip()
         
         if not is_valid_id(plan_id):
             display_error_message("Invalid plan ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         plan = plan_manager.get_plan_by_id(int(plan_id))
         if not plan:
             display_error_message(f"Plan with ID {plan_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_plan_details(plan)
@@ -330,26 +373,26 @@ class SubscriptionManagementSystem :
         print("4. Price")
         print("5. Cancel")
         
-        choice = input("\nEnter your choice (1-5): ").strip()
+        choice = read_input("\nEnter your choice (1-5): ").strip()
         
         if choice == '1':
-            new_name = input(f"New Name (current: {plan.name}): ").strip()
+            new_name = read_input(f"New Name (current: {plan.name}): ").strip()
             if new_name:
                 plan_manager.update_plan_name(plan.id, new_name)
         
         elif choice == '2':
-            new_desc = input(f"New Description (current: {plan.description or 'None'}): ").strip() or None
+            new_desc = read_input(f"New Description (current: {plan.description or 'None'}): ").strip() or None
             plan_manager.update_plan_description(plan.id, new_desc)
         
         elif choice == '3':
-            new_duration = input(f"New Duration in days (current: {plan.duration_days}): ").strip()
+            new_duration = read_input(f"New Duration in days (current: {plan.duration_days}): ").strip()
             if new_duration and new_duration.isdigit():
                 plan_manager.update_plan_duration(plan.id, int(new_duration))
             else:
                 display_error_message("Duration must be a positive integer.")
         
         elif choice == '4':
-            new_price = input(f"New Price (current: {format_currency(plan.price)}): ").strip()
+            new_price = read_input(f"New Price (current: {format_currency(plan.price)}): ").strip()
             try:
                 if new_price:
                     price = float(new_price)
@@ -362,24 +405,24 @@ class SubscriptionManagementSystem :
         else:
             display_error_message("Invalid choice.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def deactivate_plan(self):
         clear_screen()
         print("DEACTIVATE PLAN")
         print("=" * 20)
         
-        plan_id = input("Enter Plan ID: ").strip()
+        plan_id = read_input("Enter Plan ID: ").strip()
         
         if not is_valid_id(plan_id):
             display_error_message("Invalid plan ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         plan = plan_manager.get_plan_by_id(int(plan_id))
         if not plan:
             display_error_message(f"Plan with ID {plan_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_plan_details(plan)
@@ -391,13 +434,13 @@ class SubscriptionManagementSystem :
             if get_confirmation("Activate this plan?"):
                 plan_manager.activate_plan(plan.id)
         
-        press_enter_to_continue()
+        self._pause()
     
     def subscription_management_menu(self):
         while True:
             clear_screen()
             display_subscription_menu()
-            choice = input("\nEnter your choice (1-6): ").strip()
+            choice = read_input("\nEnter your choice (1-6): ").strip()
             
             if choice == '1':
                 self.assign_plan_to_member()
@@ -413,7 +456,7 @@ class SubscriptionManagementSystem :
                 break
             else:
                 display_error_message("Invalid choice. Please enter 1-6.")
-                press_enter_to_continue()
+                self._pause()
     
     def assign_plan_to_member(self):
         clear_screen()
@@ -421,37 +464,37 @@ class SubscriptionManagementSystem :
         print("=" * 28)
         
         # Get member
-        member_id = input("Enter Member ID: ").strip()
+        member_id = read_input("Enter Member ID: ").strip()
         if not is_valid_id(member_id):
             display_error_message("Invalid member ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         member = member_manager.get_member_by_id(int(member_id))
         if not member:
             display_error_message(f"Member with ID {member_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_member_details(member)
         
         # Get plan
-        plan_id = input("\nEnter Plan ID: ").strip()
+        plan_id = read_input("\nEnter Plan ID: ").strip()
         if not is_valid_id(plan_id):
             display_error_message("Invalid plan ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         plan = plan_manager.get_plan_by_id(int(plan_id))
         if not plan:
             display_error_message(f"Plan with ID {plan_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_plan_details(plan)
         
         # Get start date
-        start_date = input(f"\nStart date (YYYY-MM-DD, leave empty for today): ").strip()
+        start_date = read_input(f"\nStart date (YYYY-MM-DD, leave empty for today): ").strip()
         
         subscription = subscription_manager.create_subscription(
             member.id, plan.id, start_date or None
@@ -460,40 +503,40 @@ class SubscriptionManagementSystem :
         if subscription:
             display_subscription_details(subscription)
         
-        press_enter_to_continue()
+        self._pause()
     
     def view_all_subscriptions(self):
         clear_screen()
-        subscriptions = subscription_manager.get_all_subscriptions(include_inactive=True)
+        subscriptions = subscription_manager.get_all_subscriptions(include_inactive=True, lean=True)
         
         if not subscriptions:
             display_info_message("No subscriptions found in the system.")
         else:
             display_subscriptions_table(subscriptions)
         
-        press_enter_to_continue()
+        self._pause()
     
     def check_member_subscription_status(self):
         clear_screen()
         print("CHECK MEMBER SUBSCRIPTION STATUS")
         print("=" * 38)
         
-        member_id = input("Enter Member ID: ").strip()
+        member_id = read_input("Enter Member ID: ").strip()
         
         if not is_valid_id(member_id):
             display_error_message("Invalid member ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         member = member_manager.get_member_by_id(int(member_id))
         if not member:
             display_error_message(f"Member with ID {member_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_member_details(member)
         
-        subscriptions = subscription_manager.get_subscriptions_by_member(member.id)
+        subscriptions = subscription_manager.get_subscriptions_by_member(member.id, lean=True)
         
         if subscriptions:
             print(f"\nSubscriptions for {member.first_name} {member.last_name}:")
@@ -501,24 +544,24 @@ class SubscriptionManagementSystem :
         else:
             display_info_message("No subscriptions found for this member.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def renew_subscription(self):
         clear_screen()
         print("RENEW SUBSCRIPTION")
         print("=" * 22)
         
-        subscription_id = input("Enter Subscription ID: ").strip()
+        subscription_id = read_input("Enter Subscription ID: ").strip()
         
         if not is_valid_id(subscription_id):
             display_error_message("Invalid subscription ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         subscription = subscription_manager.get_subscription_by_id(int(subscription_id))
         if not subscription:
             display_error_message(f"Subscription with ID {subscription_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_subscription_details(subscription)
@@ -526,24 +569,24 @@ class SubscriptionManagementSystem :
         if get_confirmation("Renew this subscription?"):
             subscription_manager.renew_subscription(subscription.id)
         
-        press_enter_to_continue()
+        self._pause()
     
     def cancel_subscription(self):
         clear_screen()
         print("CANCEL SUBSCRIPTION")
         print("=" * 23)
         
-        subscription_id = input("Enter Subscription ID: ").strip()
+        subscription_id = read_input("Enter Subscription ID: ").strip()
         
         if not is_valid_id(subscription_id):
             display_error_message("Invalid subscription ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         subscription = subscription_manager.get_subscription_by_id(int(subscription_id))
         if not subscription:
             display_error_message(f"Subscription with ID {subscription_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_subscription_details(subscription)
@@ -556,13 +599,13 @@ class SubscriptionManagementSystem :
             else:
                 subscription_manager.activate_subscription(subscription.id)
         
-        press_enter_to_continue()
+        self._pause()
     
     def payment_management_menu(self):
         while True:
             clear_screen()
             display_payment_menu()
-            choice = input("\nEnter your choice (1-5): ").strip()
+            choice = read_input("\nEnter your choice (1-5): ").strip()
             
             if choice == '1':
                 self.record_payment()
@@ -576,38 +619,38 @@ class SubscriptionManagementSystem :
                 break
             else:
                 display_error_message("Invalid choice. Please enter 1-5.")
-                press_enter_to_continue()
+                self._pause()
     
     def record_payment(self):
         clear_screen()
         print("RECORD PAYMENT")
         print("=" * 18)
         
-        subscription_id = input("Enter Subscription ID: ").strip()
+        subscription_id = read_input("Enter Subscription ID: ").strip()
         
         if not is_valid_id(subscription_id):
             display_error_message("Invalid subscription ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         subscription = subscription_manager.get_subscription_by_id(int(subscription_id))
         if not subscription:
             display_error_message(f"Subscription with ID {subscription_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_subscription_details(subscription)
         
-        amount_input = input("\nPayment Amount: ").strip()
+        amount_input = read_input("\nPayment Amount: ").strip()
         try:
             amount = float(amount_input)
         except ValueError:
             display_error_message("Amount must be a valid number.")
-            press_enter_to_continue()
+            self._pause()
             return
         
-        payment_date = input("Payment Date (YYYY-MM-DD, leave empty for today): ").strip() or None
-        notes = input("Notes (optional): ").strip() or None
+        payment_date = read_input("Payment Date (YYYY-MM-DD, leave empty for today): ").strip() or None
+        notes = read_input("Notes (optional): ").strip() or None
         
         payment = payment_manager.record_payment(
             subscription.id, amount, payment_date, notes
@@ -619,47 +662,49 @@ class SubscriptionManagementSystem :
             print(f"Amount: {format_currency(payment.amount)}")
             print(f"Date: {payment.payment_date}")
         
-        press_enter_to_continue()
+        self._pause()
     
     def view_payment_history_by_member(self):
         clear_screen()
         print("PAYMENT HISTORY BY MEMBER")
         print("=" * 30)
         
-        member_id = input("Enter Member ID: ").strip()
+        member_id = read_input("Enter Member ID: ").strip()
         
         if not is_valid_id(member_id):
             display_error_message("Invalid member ID format.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         member = member_manager.get_member_by_id(int(member_id))
         if not member:
             display_error_message(f"Member with ID {member_id} not found.")
-            press_enter_to_continue()
+            self._pause()
             return
         
         display_member_details(member)
         
-        payments = payment_manager.get_payments_by_member(member.id)
+        payments = payment_manager.get_payments_by_member(member.id, lean=True)
         
         if payments:
             print(f"\nPayment History for {member.first_name} {member.last_name}:")
             display_payments_table(payments)
             
-            total = sum(p.amount for p in payments)
-            print(f"\nTotal Payments: {format_currency(total)}")
+            balance = payment_manager.get_member_balance(member.id)
+            print(f"\nTotal Payments: {format_currency(balance['total_paid'])}")
+            print(f"Payment Count: {balance['payment_count']}")
+            print(f"Last Payment: {balance['last_payment_date']}")
         else:
             display_info_message("No payments found for this member.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def view_todays_payments(self):
         clear_screen()
         print("TODAY'S PAYMENTS")
         print("=" * 20)
         
-        payments = payment_manager.get_todays_payments()
+        payments = payment_manager.get_todays_payments(lean=True)
         
         if payments:
             display_payments_table(payments)
@@ -669,17 +714,17 @@ class SubscriptionManagementSystem :
         else:
             display_info_message("No payments recorded today.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def view_payments_by_date_range(self):
         clear_screen()
         print("PAYMENTS BY DATE RANGE")
         print("=" * 27)
         
-        start_date = input("Start Date (YYYY-MM-DD): ").strip()
-        end_date = input("End Date (YYYY-MM-DD): ").strip()
+        start_date = read_input("Start Date (YYYY-MM-DD): ").strip()
+        end_date = read_input("End Date (YYYY-MM-DD): ").strip()
         
-        payments = payment_manager.get_payments_by_date_range(start_date, end_date)
+        payments = payment_manager.get_payments_by_date_range(start_date, end_date, lean=True)
         
         if payments:
             display_payments_table(payments)
@@ -689,13 +734,13 @@ class SubscriptionManagementSystem :
         else:
             display_info_message(f"No payments found between {start_date} and {end_date}.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def reports_menu(self):
         while True:
             clear_screen()
             display_reports_menu()
-            choice = input("\nEnter your choice (1-7): ").strip()
+            choice = read_input("\nEnter your choice (1-8): ").strip()
             
             if choice == '1':
                 self.system_summary()
@@ -710,10 +755,12 @@ class SubscriptionManagementSystem :
             elif choice == '6':
                 self.plan_popularity_report()
             elif choice == '7':
+                self.export_report()
+            elif choice == '8':
                 break
             else:
-                display_error_message("Invalid choice. Please enter 1-7.")
-                press_enter_to_continue()
+                display_error_message("Invalid choice. Please enter 1-8.")
+                self._pause()
     
     def system_summary(self):
         clear_screen()
@@ -722,9 +769,9 @@ class SubscriptionManagementSystem :
         
         try:
             # Get basic counts
-            members = member_manager.get_all_members()
-            plans = plan_manager.get_all_plans()
-            subscriptions = subscription_manager.get_all_subscriptions()
+            members = member_manager.get_all_members(lean=True)
+            plans = plan_manager.get_all_plans(lean=True)
+            subscriptions = subscription_manager.get_all_subscriptions(lean=True)
             payment_stats = payment_manager.get_payment_stats()
             subscription_stats = subscription_manager.get_subscription_stats()
             
@@ -744,14 +791,14 @@ class SubscriptionManagementSystem :
         except Exception as e:
             display_error_message(f"Error generating system summary: {str(e)}")
         
-        press_enter_to_continue()
+        self._pause()
     
     def active_members_report(self):
         clear_screen()
         print("ACTIVE MEMBERS REPORT")
         print("=" * 25)
         
-        members = member_manager.get_all_members()
+        members = member_manager.get_all_members(lean=True)
         active_members = [m for m in members if m.status == "Active"]
         
         if active_members:
@@ -759,42 +806,48 @@ class SubscriptionManagementSystem :
         else:
             display_info_message("No active members found.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def expiring_subscriptions_report(self):
         clear_screen()
         print("EXPIRING SUBSCRIPTIONS REPORT")
         print("=" * 35)
         
-        days = input("Days ahead to check (default 7): ").strip()
+        days = read_input("Days ahead to check (default 7): ").strip()
         try:
             days = int(days) if days else 7
         except ValueError:
             days = 7
         
-        subscriptions = subscription_manager.get_expiring_subscriptions(days)
+        subscriptions = subscription_manager.get_expiring_subscriptions(days, lean=True)
         
         if subscriptions:
             print(f"\nSubscriptions expiring in the next {days} days:")
             display_subscriptions_table(subscriptions)
+
+            expiry = columnar_analytics.expiry(days)
+            if expiry:
+                print(f"\nUp for renewal: {format_currency(expiry['renewal_value'])}")
+                print("Per day left: " + ", ".join(f"{left}d: {count}" for left, count in
+                                                   enumerate(expiry['by_days_left']) if count))
         else:
             display_info_message(f"No subscriptions expiring in the next {days} days.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def expired_subscriptions_report(self):
         clear_screen()
         print("EXPIRED SUBSCRIPTIONS REPORT")
         print("=" * 32)
         
-        subscriptions = subscription_manager.get_expired_subscriptions()
+        subscriptions = subscription_manager.get_expired_subscriptions(lean=True)
         
         if subscriptions:
             display_subscriptions_table(subscriptions)
         else:
             display_info_message("No expired subscriptions found.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def revenue_report(self):
         clear_screen()
@@ -806,15 +859,15 @@ class SubscriptionManagementSystem :
         print("2. Date Range")
         print("3. This Month")
         
-        choice = input("\nEnter your choice (1-3): ").strip()
+        choice = read_input("\nEnter your choice (1-3): ").strip()
         
         if choice == '1':
-            payments = payment_manager.get_all_payments()
+            revenue = columnar_analytics.revenue()
             period = "All Time"
         elif choice == '2':
-            start_date = input("Start Date (YYYY-MM-DD): ").strip()
-            end_date = input("End Date (YYYY-MM-DD): ").strip()
-            payments = payment_manager.get_payments_by_date_range(start_date, end_date)
+            start_date = read_input("Start Date (YYYY-MM-DD): ").strip()
+            end_date = read_input("End Date (YYYY-MM-DD): ").strip()
+            revenue = columnar_analytics.revenue(start_date, end_date)
             period = f"{start_date} to {end_date}"
         elif choice == '3':
             # Get current month
@@ -826,29 +879,25 @@ class SubscriptionManagementSystem :
             else:
                 end_date = f"{now.year}-{now.month + 1:02d}-01"
             
-            payments = payment_manager.get_payments_by_date_range(start_date, end_date)
+            revenue = columnar_analytics.revenue(start_date, end_date)
             period = f"Month of {now.strftime('%B %Y')}"
         else:
             display_error_message("Invalid choice.")
-            press_enter_to_continue()
+            self._pause()
             return
         
-        if payments:
-            total_revenue = sum(p.amount for p in payments)
-            avg_payment = total_revenue / len(payments) if payments else 0
-            
+        if revenue and revenue['total_payments']:
             print(f"\nRevenue Report - {period}")
-            print(f"Total Payments: {len(payments)}")
-            print(f"Total Revenue: {format_currency(total_revenue)}")
-            print(f"Average Payment: {format_currency(avg_payment)}")
+            print(f"Total Payments: {revenue['total_payments']}")
+            print(f"Total Revenue: {format_currency(revenue['total_revenue'])}")
+            print(f"Average Payment: {format_currency(revenue['average_payment'])}")
             
-            sorted_payments = sorted(payments, key=lambda p: p.amount, reverse=True)[:10]
             print(f"\nTop 10 Payments:")
-            display_payments_table(sorted_payments)
+            display_payments_table(payment_manager.get_payments_by_ids(revenue['top_payment_ids'], lean=True))
         else:
             display_info_message(f"No payments found for {period.lower()}.")
         
-        press_enter_to_continue()
+        self._pause()
     
     def plan_popularity_report(self):
         clear_screen()
@@ -859,7 +908,7 @@ class SubscriptionManagementSystem :
         
         if not plan_stats:
             display_info_message("No plan statistics available")
-            press_enter_to_continue()
+            self._pause()
             return
         
         headers = ["Plan ID", "Plan Name", "Active Subs", "Total Subs", "Revenue"]
@@ -875,7 +924,47 @@ class SubscriptionManagementSystem :
             ])
         
         print_table(headers, rows, "Plan Popularity Report")
-        press_enter_to_continue()
+        self._pause()
+
+    def export_report(self):
+        clear_screen()
+        print("EXPORT REPORT")
+        print("=" * 17)
+        
+        reports = export_manager.available_reports()
+        for i, report in enumerate(reports, 1):
+            print(f"{i}. {report.replace('_', ' ').title()}")
+        
+        choice = read_input(f"\nEnter your choice (1-{len(reports)}): ").strip()
+        if not choice.isdigit() or not 1 <= int(choice) <= len(reports):
+            display_error_message("Invalid choice.")
+            self._pause()
+            return
+        report = reports[int(choice) - 1]
+        
+        start_date = end_date = None
+        days = 7
+        if report in DATE_RANGE_REPORTS:
+            start_date = read_input("Start Date (YYYY-MM-DD): ").strip()
+            end_date = read_input("End Date (YYYY-MM-DD): ").strip()
+        elif report == 'expiring_subscriptions':
+            days_input = read_input("Days ahead to check (default 7): ").strip()
+            days = int(days_input) if days_input.isdigit() else 7
+        
+        export_format = read_input("Format (csv/jsonl, default csv): ").strip().lower() or "csv"
+        compress = get_confirmation("Compress with gzip?")
+        path = read_input(f"Output file (default exports/{report}.{export_format}): ").strip()
+        path = path or os.path.join("exports", f"{report}.{export_format}")
+        
+        result = export_manager.export_report(
+            report, path, format=export_format, compress=compress,
+            start_date=start_date, end_date=end_date, days=days
+        )
+        
+        if result:
+            display_success_message(f"Exported {result['rows']} rows to {', '.join(result['files'])}")
+        
+        self._pause()
 
     def exit_application(self):
         clear_screen()
@@ -886,9 +975,17 @@ class SubscriptionManagementSystem :
         self.running = False
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Subscription Management System")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="profile each menu action and write a collapsed-stack file")
+    parser.add_argument("--profile-dir", help="where profiles are written (default data/profiles)")
+    args = parser.parse_args(argv)
+
     try:
         app = SubscriptionManagementSystem()
+        if args.profile:
+            app.enable_profiling(args.profile, args.profile_dir)
         app.run()
     except Exception as e:
         print(f"Fatal error: {str(e)}")
@@ -0,0 +1,327 @@
+import bisect
+import os
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Callable, Iterable, Tuple, Union
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class _NullTimer :
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *exc_info) :
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf") :
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric :
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labelnames: Iterable[str] = ()) :
+        self._registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: Tuple[str, str] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra :
+            pairs.append(extra)
+        if not pairs :
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        with self._lock :
+            return [f"{self.name}{self._labels(key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+    def reset(self) -> None:
+        with self._lock :
+            self._values.clear()
+
+
+class Counter(_Metric) :
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self._registry.enabled :
+            return
+        key = self._key(labels)
+        with self._lock :
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric) :
+    """A value that goes up and down, or is read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs) :
+        super().__init__(*args, **kwargs)
+        self._function = None
+
+    def set(self, value: float, **labels) -> None:
+        if not self._registry.enabled :
+            return
+        with self._lock :
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self._registry.enabled :
+            return
+        key = self._key(labels)
+        with self._lock :
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], Union[float, Dict[tuple, float]]]) -> None:
+        """Compute the value when metrics are collected; may return {label values: value}"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None :
+            try :
+                value = self._function()
+            except Exception :
+                return []
+            values = value if isinstance(value, dict) else {(): value}
+            with self._lock :
+                self._values = {tuple(str(part) for part in key): number for key, number in values.items()}
+        return super().samples()
+
+
+class Histogram(_Metric) :
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets: Iterable[float] = LATENCY_BUCKETS) :
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        if not self._registry.enabled :
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock :
+            entry = self._values.get(key)
+            if entry is None :
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed seconds"""
+        if not self._registry.enabled :
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock :
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._values.items())]
+        lines = []
+        for key, counts, total, count in snapshot :
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts) :
+                cumulative += bucket
+                lines.append(f"{self.name}_bucket{self._labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class _Timer :
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]) :
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) :
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) :
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class MetricsRegistry :
+    """Counters, gauges and histograms rendered in the Prometheus text format.
+
+    While disabled every update returns after one attribute check, so the
+    instrumentation can stay in the hot paths. enable() is usually called
+    by the CLI / server flags or SUBMAN_METRICS=1.
+    """
+
+    def __init__(self, enabled: bool = False) :
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock :
+            existing = self._metrics.get(metric.name)
+            if existing is not None :
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def render(self) -> str:
+        lines = []
+        with self._lock :
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics :
+            samples = metric.samples()
+            if not samples :
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock :
+            for metric in self._metrics.values() :
+                metric.reset()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler) :
+    def do_GET(self) :
+        if self.path.split("?")[0].rstrip("/") not in ("", "/metrics") :
+            self.send_error(404)
+            return
+        data = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) :
+        pass
+
+
+def start_http_server(port: int, host: str = "127.0.0.1", registry: "MetricsRegistry" = None) -> HTTPServer:
+    """Serve GET /metrics from a daemon thread; returns the server (call shutdown() to stop)"""
+    registry = registry or metrics
+    registry.enable()
+    server = HTTPServer((host, port), _MetricsHandler)
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class MetricsFileWriter :
+    """Rewrites a file with the current metrics every interval seconds
+    (e.g. for node_exporter's textfile collector)"""
+
+    def __init__(self, path: Union[str, Path], interval: float = 15.0, registry: "MetricsRegistry" = None) :
+        self.path = Path(path)
+        self.interval = interval
+        self.registry = registry or metrics
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(self.registry.render(), encoding="utf-8")
+        # scrapers never see a half-written file
+        os.replace(temporary, self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval) :
+            try :
+                self.write()
+            except OSError :
+                pass
+
+    def start(self) -> "MetricsFileWriter":
+        self.registry.enable()
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None :
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+
+# Singleton instance
+metrics = MetricsRegistry(enabled=os.environ.get("SUBMAN_METRICS", "") not in ("", "0"))
+
+# Metrics updated across the package
+DB_STATEMENTS = metrics.counter("subman_db_statements_total",
+                                "Statements run through execute_query / execute_insert", ("kind",))
+DB_STATEMENT_SECONDS = metrics.histogram("subman_db_statement_seconds",
+                                         "Latency of execute_query / execute_insert", ("kind",))
+DB_ERRORS = metrics.counter("subman_db_errors_total", "Statements that raised a database error", ("kind",))
+DB_LOCK_TIMEOUTS = metrics.counter("subman_db_lock_timeouts_total",
+                                   "Statements and transactions that gave up waiting for a lock", ("kind",))
+DB_WRITE_LOCK_WAIT = metrics.histogram("subman_db_write_lock_wait_seconds",
+                                      "Time spent acquiring the write lock (BEGIN IMMEDIATE), "
+                                      "including waits that gave up", ("kind",))
+DB_TRANSACTIONS = metrics.counter("subman_db_transactions_total", "transaction() blocks by outcome", ("outcome",))
+DB_SIZE_BYTES = metrics.gauge("subman_db_size_bytes", "Size of the database file, including the WAL")
+
+PAYMENTS_RECORDED = metrics.counter("subman_payments_recorded_total", "Payments written", ("source",))
+PAYMENT_AMOUNT = metrics.counter("subman_payment_amount_total", "Sum of the payments written", ("source",))
+PAYMENT_WRITER_BATCH = metrics.histogram("subman_payment_writer_batch_size",
+                                         "Payments committed per PaymentWriter transaction", buckets=SIZE_BUCKETS)
+SUBSCRIPTION_EVENTS = metrics.counter("subman_subscription_events_total",
+                                      "Subscriptions created, renewed, cancelled and activated", ("event",))
+CACHE_REQUESTS = metrics.counter("subman_cache_requests_total", "Cache lookups by cache and result",
+                                 ("cache", "result"))
+SNAPSHOT_REFRESHES = metrics.counter("subman_snapshot_refreshes_total",
+                                     "Check-in snapshot refreshes", ("kind",))
+BACKUP_RUNS = metrics.counter("subman_backup_runs_total", "Backups, snapshots, verifications and restores",
+                              ("kind", "outcome"))
+BACKUP_BYTES = metrics.counter("subman_backup_bytes_total", "Bytes copied by backups, snapshots and restores",
+                               ("kind",))
+NOTIFICATIONS = metrics.counter("subman_notifications_total", "Expiry reminders by outcome", ("outcome",))
+HTTP_REQUESTS = metrics.counter("subman_http_requests_total", "API requests", ("method", "status"))
+HTTP_REQUEST_SECONDS = metrics.histogram("subman_http_request_seconds", "API request latency", ("method",))
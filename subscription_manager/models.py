@@ -1,4 +1,6 @@
+from collections import namedtuple
 from datetime import datetime, timedelta
+from .profiling import traced, HYDRATE
 
 
 class Member:
@@ -40,6 +42,7 @@ class Member:
         )
 
     @classmethod
+    @traced(HYDRATE)
     def from_db_row(cls, row) :
         # creates a member instance from a dictionary (data)
         return cls(
@@ -94,6 +97,7 @@ class Plan:
         )
 
     @classmethod
+    @traced(HYDRATE)
     def from_db_row(cls, row) :
         # creates a plan instance from a database row
         return cls(
@@ -186,6 +190,7 @@ class Subscription :
         )
     
     @classmethod
+    @traced(HYDRATE)
     def from_db_row(cls, row, member=None, plan=None):
         # creates a Subscription instance from a database row
         return cls(
@@ -238,6 +243,7 @@ class Payment :
         )
     
     @classmethod
+    @traced(HYDRATE)
     def from_db_row(cls, row, subscription = None) :
         # creates a Payment instance from a database row
         return cls(
@@ -249,6 +255,37 @@ class Payment :
             subscription = subscription
         )
 
-        
-        
 
+# Flat rows returned by the managers' list methods with lean=True: only the
+# columns the listing tables show, no Member / Plan objects behind them.
+
+class MemberRow(namedtuple("MemberRow", "id first_name last_name email phone date_joined status")) :
+    __slots__ = ()
+
+    def to_dict(self) :
+        return self._asdict()
+
+
+class PlanRow(namedtuple("PlanRow", "id name description duration_days price is_active")) :
+    __slots__ = ()
+
+    def to_dict(self) :
+        return self._asdict()
+
+
+class SubscriptionRow(namedtuple("SubscriptionRow",
+                                 "id member_id member_name plan_id plan_name start_date end_date is_active")) :
+    __slots__ = ()
+
+    is_currently_active = Subscription.is_currently_active
+    remaining_days = Subscription.remaining_days
+
+    def to_dict(self) :
+        return self._asdict()
+
+
+class PaymentRow(namedtuple("PaymentRow", "id subscription_id amount payment_date notes")) :
+    __slots__ = ()
+
+    def to_dict(self) :
+        return self._asdict()
@@ -0,0 +1,265 @@
+import cProfile
+import io
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from pathlib import Path
+from typing import List, Dict, Any, TextIO, Union
+
+
+PROFILE_MODES = ("sample", "cprofile")
+
+# span names used across the package
+DB = "db"
+HYDRATE = "hydrate"
+RENDER = "render"
+INPUT = "input"
+
+DEFAULT_PROFILE_DIR = Path("data") / "profiles"
+
+# the running Profiler; spans cost one global lookup while this is None
+_active = None
+
+
+class _NullSpan :
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *exc_info) :
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span :
+    __slots__ = ("profiler", "name", "frame", "started")
+
+    def __init__(self, profiler, name: str) :
+        self.profiler = profiler
+        self.name = name
+        self.frame = None
+
+    def __enter__(self) :
+        stack = self.profiler._stack()
+        # display_members_table -> print_table is one render span, not two
+        if not stack or stack[-1][0] != self.name :
+            self.frame = [self.name, 0.0]
+            stack.append(self.frame)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) :
+        if self.frame is None :
+            return False
+        elapsed = time.perf_counter() - self.started
+        stack = self.profiler._stack()
+        path = tuple(frame[0] for frame in stack)
+        stack.pop()
+        if stack :
+            stack[-1][1] += elapsed
+        self.profiler._add_span(path, elapsed - self.frame[1])
+        return False
+
+
+def span(name: str):
+    """Context manager timing a phase of the profiled command (no-op when not profiling)"""
+    profiler = _active
+    if profiler is None :
+        return _NULL_SPAN
+    return _Span(profiler, name)
+
+
+def traced(name: str):
+    """Decorator running the function inside span(name)"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None :
+                return function(*args, **kwargs)
+            with _Span(profiler, name) :
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Profiler :
+    """Profiles one CLI command or menu action.
+
+    Code marks its phases with span() / traced(): SQL in database.py (db),
+    building models from rows (hydrate), tables and details on screen
+    (render) and waiting at prompts (input). Span times are exclusive, so a
+    db span inside a render span is not counted twice; whatever no span
+    covers is reported as "other". Time at prompts is left out of the totals.
+
+    In "sample" mode a background thread records the profiled thread's stack
+    every interval seconds, and the output file holds one collapsed stack per
+    line ("label;phase;module:function;... count"), ready for flamegraph.pl
+    or speedscope. In "cprofile" mode the whole run is traced with cProfile
+    and saved next to the output file as .prof; the collapsed file then holds
+    the phase spans weighted in microseconds.
+    """
+
+    def __init__(self, label: str, mode: str = "sample", interval: float = 0.001,
+                 output: Union[str, Path] = None) :
+        if mode not in PROFILE_MODES :
+            raise ValueError(f"Unknown profile mode '{mode}'. Use one of: {', '.join(PROFILE_MODES)}")
+        self.label = re.sub(r"[;\s]+", "_", label.strip()) or "profile"
+        self.mode = mode
+        self.interval = interval
+        self.output = Path(output) if output else DEFAULT_PROFILE_DIR / f"{self.label}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+        self.elapsed = 0.0
+        self._stacks: Dict[int, List[list]] = {}
+        self._spans: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+        self._samples: Dict[str, int] = defaultdict(int)
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._profile = None
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def _stack(self) -> List[list]:
+        ident = threading.get_ident()
+        stack = self._stacks.get(ident)
+        if stack is None :
+            stack = self._stacks[ident] = []
+        return stack
+
+    def _add_span(self, path: tuple, exclusive: float) -> None:
+        with self._lock :
+            entry = self._spans[path]
+            entry[0] += exclusive
+            entry[1] += 1
+
+    def start(self) -> "Profiler":
+        global _active
+        if _active is not None :
+            raise RuntimeError("Another profile is already running")
+        self._thread_id = threading.get_ident()
+        _active = self
+        self._started = time.perf_counter()
+        if self.mode == "cprofile" :
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else :
+            # the sampler only runs when the profiled thread lets go of the GIL
+            self._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self._switch_interval, self.interval))
+            self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        global _active
+        if self._profile is not None :
+            self._profile.disable()
+        if self._sampler is not None :
+            self._stop.set()
+            self._sampler.join()
+            sys.setswitchinterval(self._switch_interval)
+        self.elapsed = time.perf_counter() - self._started
+        _active = None
+
+    def __enter__(self) :
+        return self.start()
+
+    def __exit__(self, *exc_info) :
+        self.stop()
+        return False
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval) :
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None :
+                continue
+            phases = [entry[0] for entry in list(self._stacks.get(self._thread_id, ()))]
+            if INPUT in phases :
+                continue
+            frames = []
+            while frame is not None :
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None :
+                    module = frame.f_globals.get("__name__", "?")
+                    # traced() wrappers would add a frame between every caller and callee
+                    label = self._labels[code] = "" if module == __name__ else f"{module}:{code.co_name}"
+                if label :
+                    frames.append(label)
+                frame = frame.f_back
+            frames.reverse()
+            self._samples[";".join([self.label] + phases + frames)] += 1
+
+    def phases(self) -> Dict[str, Dict[str, Any]]:
+        """Exclusive milliseconds and span count per phase, plus "other" for the rest"""
+        totals = {}
+        for path, (seconds, calls) in self._spans.items() :
+            entry = totals.setdefault(path[-1], {'ms': 0.0, 'calls': 0})
+            entry['ms'] += seconds * 1000
+            entry['calls'] += calls
+        waiting = totals.get(INPUT, {}).get('ms', 0.0)
+        measured = sum(entry['ms'] for name, entry in totals.items() if name != INPUT)
+        totals['other'] = {'ms': max(0.0, self.elapsed * 1000 - waiting - measured), 'calls': 0}
+        for entry in totals.values() :
+            entry['ms'] = round(entry['ms'], 3)
+        return totals
+
+    def collapsed(self) -> List[str]:
+        """Collapsed-stack lines: samples, or span microseconds in cprofile mode"""
+        if self.mode == "sample" :
+            return [f"{stack} {count}" for stack, count in sorted(self._samples.items())]
+        lines = [f"{';'.join((self.label,) + path)} {int(round(seconds * 1e6))}"
+                 for path, (seconds, _) in sorted(self._spans.items()) if path[-1] != INPUT]
+        other = int(round(self.phases()['other']['ms'] * 1000))
+        if other :
+            lines.append(f"{self.label};other {other}")
+        return lines
+
+    def write(self) -> Path:
+        """Write the collapsed-stack file (and the .prof file in cprofile mode)"""
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.output, "w", encoding="utf-8") as stream :
+            for line in self.collapsed() :
+                stream.write(line + "\n")
+        if self._profile is not None :
+            self._profile.dump_stats(str(self.output.with_suffix(".prof")))
+        return self.output
+
+    def summary(self, stream: TextIO = None, top: int = 15) -> None:
+        stream = stream or sys.stderr
+        phases = self.phases()
+        waiting = phases.get(INPUT, {}).get('ms', 0.0)
+        total = max(self.elapsed * 1000 - waiting, 1e-9)
+        stream.write(f"[profile] {self.label}: {total:.2f} ms ({self.mode})\n")
+        for name, entry in sorted(phases.items(), key=lambda item: -item[1]['ms']) :
+            if name == INPUT :
+                continue
+            calls = f", {entry['calls']} spans" if entry['calls'] else ""
+            stream.write(f"[profile]   {name:<8} {entry['ms']:>10.2f} ms {entry['ms'] / total:>6.1%}{calls}\n")
+        if self._profile is not None :
+            buffer = io.StringIO()
+            pstats.Stats(self._profile, stream=buffer).sort_stats("cumulative").print_stats(top)
+            stream.write(buffer.getvalue())
+        elif self.mode == "sample" :
+            stream.write(f"[profile]   {sum(self._samples.values())} samples every {self.interval * 1000:g} ms\n")
+
+
+def profiled(function, label: str, mode: str = "sample", interval: float = 0.001,
+             output_dir: Union[str, Path] = None, stream: TextIO = None):
+    """Wrap function so every call is profiled, written and summarised"""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        profiler = Profiler(label, mode, interval)
+        if output_dir :
+            profiler.output = Path(output_dir) / profiler.output.name
+        try :
+            with profiler :
+                return function(*args, **kwargs)
+        finally :
+            path = profiler.write()
+            profiler.summary(stream)
+            (stream or sys.stderr).write(f"[profile] collapsed stacks written to {path}\n")
+    return wrapper
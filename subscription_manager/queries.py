@@ -0,0 +1,159 @@
+"""Catalog of the SQL the managers run on their hot paths.
+
+Each use case gets its own projection: the columns its hydration code reads
+and nothing else. Keeping one copy of each statement also means the text is
+byte-identical on every call, so sqlite3's per-connection statement cache
+(sized by STATEMENT_CACHE_SIZE in database.py) skips the parse for every
+repeated call on a long-lived connection.
+
+lint() flags SELECT * in the hot-path modules (subman maintenance lint-queries).
+"""
+import re
+from pathlib import Path
+from typing import List, Tuple, Iterable, Union
+
+
+MEMBER_COLUMNS = "id, first_name, last_name, email, phone, date_joined, status"
+PLAN_COLUMNS = "id, name, description, duration_days, price, is_active"
+SUBSCRIPTION_SPAN_COLUMNS = "id, member_id, start_date, end_date"
+
+# Subscription with the member and plan fields SubscriptionManager hydrates
+SUBSCRIPTION_DETAIL_SELECT = """
+    SELECT s.id, s.member_id, s.plan_id, s.start_date, s.end_date, s.is_active,
+           m.first_name, m.last_name, m.email, m.phone,
+           p.name as plan_name, p.duration_days, p.price
+    FROM subscriptions s
+    JOIN members m ON s.member_id = m.id
+    JOIN plans p ON s.plan_id = p.id
+"""
+
+# models.SubscriptionRow: what the subscriptions table shows (lean=True)
+SUBSCRIPTION_ROW_SELECT = """
+    SELECT s.id, s.member_id, m.first_name || ' ' || m.last_name as member_name,
+           s.plan_id, p.name as plan_name, s.start_date, s.end_date, s.is_active
+    FROM subscriptions s
+    JOIN members m ON s.member_id = m.id
+    JOIN plans p ON s.plan_id = p.id
+"""
+
+# Payment with the subscription, member and plan fields PaymentManager hydrates
+PAYMENT_DETAIL_SELECT = """
+    SELECT p.id, p.subscription_id, p.amount, p.payment_date, p.notes,
+           s.member_id, s.plan_id, s.start_date, s.end_date, s.is_active,
+           m.first_name, m.last_name, m.email, m.phone, m.date_joined, m.status,
+           pl.name as plan_name, pl.description, pl.duration_days, pl.price, pl.is_active as plan_is_active
+    FROM payments p
+    JOIN subscriptions s ON p.subscription_id = s.id
+    JOIN members m ON s.member_id = m.id
+    JOIN plans pl ON s.plan_id = pl.id
+"""
+
+# models.PaymentRow: what the payments table shows (lean=True); subscriptions
+# stays joined for the member filter
+PAYMENT_ROW_SELECT = """
+    SELECT p.id, p.subscription_id, p.amount, p.payment_date, p.notes
+    FROM payments p
+    JOIN subscriptions s ON p.subscription_id = s.id
+"""
+
+SUBSCRIPTION_FILTERS = {
+    'all': "ORDER BY s.id",
+    'active': "WHERE s.is_active = TRUE ORDER BY s.id",
+    'by_id': "WHERE s.id = ?",
+    'by_member': "WHERE s.member_id = ? ORDER BY s.start_date DESC",
+    'active_by_member': """
+        WHERE s.member_id = ? AND s.is_active = TRUE
+        ORDER BY s.start_date DESC
+    """,
+    'expiring': """
+        WHERE s.is_active = TRUE
+        AND s.end_date BETWEEN date('now') AND date('now', ?)
+        ORDER BY s.end_date ASC
+    """,
+    'expired': """
+        WHERE s.is_active = TRUE
+        AND s.end_date < date('now')
+        ORDER BY s.end_date ASC
+    """,
+}
+
+PAYMENT_FILTERS = {
+    'all': "ORDER BY p.payment_date DESC, p.id DESC",
+    'by_id': "WHERE p.id = ?",
+    'by_subscription': """
+        WHERE p.subscription_id = ?
+        ORDER BY p.payment_date DESC, p.id DESC
+    """,
+    'by_member': """
+        WHERE s.member_id = ?
+        ORDER BY p.payment_date DESC, p.id DESC
+    """,
+    'by_date_range': """
+        WHERE p.payment_date BETWEEN ? AND ?
+        ORDER BY p.payment_date DESC, p.id DESC
+    """,
+}
+
+QUERIES = {
+    'members.all': f"SELECT {MEMBER_COLUMNS} FROM members ORDER BY id",
+    'members.by_id': f"SELECT {MEMBER_COLUMNS} FROM members WHERE id = ?",
+    'members.by_name': f"""
+        SELECT {MEMBER_COLUMNS} FROM members
+        WHERE first_name LIKE ? OR last_name LIKE ?
+        ORDER BY id
+    """,
+    'plans.all': f"SELECT {PLAN_COLUMNS} FROM plans ORDER BY id",
+    'plans.active': f"SELECT {PLAN_COLUMNS} FROM plans WHERE is_active = TRUE ORDER BY id",
+    'plans.by_id': f"SELECT {PLAN_COLUMNS} FROM plans WHERE id = ?",
+    'subscriptions.running_spans': f"""
+        SELECT {SUBSCRIPTION_SPAN_COLUMNS} FROM subscriptions
+        WHERE is_active = TRUE AND end_date >= date('now')
+    """,
+}
+# subscriptions.<filter> / payments.<filter> build the object graph;
+# the .lean variants feed the flat rows
+for _name, _clause in SUBSCRIPTION_FILTERS.items() :
+    QUERIES[f'subscriptions.{_name}'] = SUBSCRIPTION_DETAIL_SELECT + _clause
+    QUERIES[f'subscriptions.{_name}.lean'] = SUBSCRIPTION_ROW_SELECT + _clause
+for _name, _clause in PAYMENT_FILTERS.items() :
+    QUERIES[f'payments.{_name}'] = PAYMENT_DETAIL_SELECT + _clause
+    QUERIES[f'payments.{_name}.lean'] = PAYMENT_ROW_SELECT + _clause
+
+
+# Modules whose statements run per request / per row; SELECT * there widens
+# every row and breaks silently when a column is added
+HOT_PATH_MODULES = (
+    "server.py",
+    "core/members.py",
+    "core/plans.py",
+    "core/subscriptions.py",
+    "core/payments.py",
+    "core/payment_writer.py",
+    "core/active_snapshot.py",
+    "core/idempotency.py",
+)
+
+# SELECT *, SELECT t.* and ", t.*" -- but not SELECT * FROM (subquery), whose
+# columns are already spelled out inside the parentheses
+_SELECT_STAR = re.compile(r"(?:\bSELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?|,\s*\w+\.)\*(?!\s*FROM\s*\()", re.IGNORECASE)
+LINT_ALLOW = "lint: allow-select-star"
+
+
+def lint(paths: Iterable[Union[str, Path]] = None) -> List[Tuple[str, int, str]]:
+    """(path, line number, line) for every SELECT * in the hot-path modules"""
+    root = Path(__file__).parent
+    paths = [Path(path) for path in paths] if paths else [root / module for module in HOT_PATH_MODULES]
+    findings = []
+    for path in paths :
+        try :
+            lines = path.read_text(encoding="utf-8").splitlines()
+        except OSError :
+            continue
+        for number, line in enumerate(lines, 1) :
+            if _SELECT_STAR.search(line) and LINT_ALLOW not in line :
+                findings.append((str(path), number, line.strip()))
+    for name, statement in QUERIES.items() :
+        if _SELECT_STAR.search(statement) :
+            findings.append(("QUERIES", 0, name))
+    return findings
+
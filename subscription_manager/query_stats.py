@@ -0,0 +1,164 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, TextIO
+
+
+SAMPLE_SIZE = 1024
+
+SORT_KEYS = ("total_ms", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "rows", "errors", "lock_waits")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.?])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_NAMED_PARAM = re.compile(r"[:@$]\w+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """The statement with literals and parameters replaced by ?, so queries
+    that differ only in their values (or IN list lengths) are grouped"""
+    text = _STRING.sub("?", query)
+    text = _NAMED_PARAM.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER_LIST.sub("IN (?...)", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def _is_lock_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class _StatementStats :
+    __slots__ = ("count", "errors", "lock_waits", "rows", "total", "max", "samples")
+
+    def __init__(self) :
+        self.count = 0
+        self.errors = 0
+        self.lock_waits = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+
+class QueryStats :
+    """Per-statement counters for everything run through execute_query and
+    execute_insert.
+
+    Statements are grouped by fingerprint(). Each group keeps the call count,
+    errors, rows returned, total / max time and a fixed-size random sample of
+    latencies that the p50 / p95 / p99 figures are computed from. A lock wait
+    is a call that failed with "database is locked" after the connection's
+    busy timeout. Calls slower than slow_ms are written to the slow query log.
+    When disabled, start() returns None and record() returns straight away.
+    """
+
+    def __init__(self, enabled: bool = False, slow_ms: float = None, slow_log: TextIO = None) :
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self._stats: Dict[str, _StatementStats] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def configure(self, enabled: bool = None, slow_ms: float = None, slow_log: TextIO = None) -> None:
+        if enabled is not None :
+            self.enabled = enabled
+        if slow_ms is not None :
+            self.slow_ms = slow_ms
+            self.enabled = True
+        if slow_log is not None :
+            self.slow_log = slow_log
+
+    def start(self) -> Optional[float]:
+        return time.perf_counter() if self.enabled else None
+
+    def record(self, query: str, started: Optional[float], rows: int = 0, error: Exception = None) -> None:
+        if started is None :
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        key = fingerprint(query)
+        with self._lock :
+            stats = self._stats.get(key)
+            if stats is None :
+                stats = self._stats[key] = _StatementStats()
+            stats.count += 1
+            stats.rows += rows
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            if error is not None :
+                stats.errors += 1
+                if _is_lock_error(error) :
+                    stats.lock_waits += 1
+            # reservoir sampling keeps the percentiles honest in constant memory
+            if len(stats.samples) < SAMPLE_SIZE :
+                stats.samples.append(elapsed)
+            else :
+                slot = self._random.randrange(stats.count)
+                if slot < SAMPLE_SIZE :
+                    stats.samples[slot] = elapsed
+
+        if self.slow_ms is not None and elapsed >= self.slow_ms :
+            self._log_slow(key, elapsed, rows, error)
+
+    def _log_slow(self, key: str, elapsed: float, rows: int, error: Exception = None) -> None:
+        stream = self.slow_log or sys.stderr
+        outcome = f"error: {error}" if error is not None else f"rows={rows}"
+        try :
+            stream.write(f"[slow-query] {time.strftime('%Y-%m-%d %H:%M:%S')} {elapsed:.2f} ms {outcome} {key}\n")
+            stream.flush()
+        except (OSError, ValueError) :
+            pass
+
+    @staticmethod
+    def _percentile(samples: List[float], fraction: float) -> float:
+        if not samples :
+            return 0.0
+        index = min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))
+        return samples[index]
+
+    def report(self, sort_by: str = "total_ms", limit: int = None) -> List[Dict[str, Any]]:
+        """One entry per fingerprint, slowest in total first"""
+        if sort_by not in SORT_KEYS :
+            raise ValueError(f"Cannot sort by '{sort_by}'. Use one of: {', '.join(SORT_KEYS)}")
+        with self._lock :
+            snapshot = [(key, stats.count, stats.errors, stats.lock_waits, stats.rows,
+                         stats.total, stats.max, sorted(stats.samples))
+                        for key, stats in self._stats.items()]
+        entries = []
+        for key, count, errors, lock_waits, rows, total, longest, samples in snapshot :
+            entries.append({
+                'statement': key,
+                'count': count,
+                'errors': errors,
+                'lock_waits': lock_waits,
+                'rows': rows,
+                'total_ms': round(total, 3),
+                'mean_ms': round(total / count, 3) if count else 0.0,
+                'p50_ms': round(self._percentile(samples, 0.50), 3),
+                'p95_ms': round(self._percentile(samples, 0.95), 3),
+                'p99_ms': round(self._percentile(samples, 0.99), 3),
+                'max_ms': round(longest, 3)
+            })
+        entries.sort(key=lambda entry: entry[sort_by], reverse=True)
+        return entries[:limit] if limit else entries
+
+    def reset(self) -> None:
+        with self._lock :
+            self._stats.clear()
+
+_slow_ms = os.environ.get("SUBMAN_SLOW_QUERY_MS")
+
+# Singleton instance, switched on by SUBMAN_QUERY_STATS=1, SUBMAN_SLOW_QUERY_MS
+# or the CLI's --query-stats / --slow-query-ms
+query_stats = QueryStats(
+    enabled=os.environ.get("SUBMAN_QUERY_STATS", "") not in ("", "0") or bool(_slow_ms),
+    slow_ms=float(_slow_ms) if _slow_ms else None
+)
@@ -0,0 +1,680 @@
+import argparse
+import json
+import re
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Tuple, Callable
+from urllib.parse import urlsplit, parse_qs
+
+from .core.members import member_manager
+from .core.plans import plan_manager
+from .core.subscriptions import subscription_manager
+from .core.payments import payment_manager
+from .core.daily_metrics import daily_metrics_manager
+from .core.cohorts import cohort_engine
+from .core.columnar import columnar_analytics
+from .core.active_snapshot import active_snapshot
+from .core.change_log import change_log
+from .database import bind_thread_connection, release_pool_connections
+from .query_stats import query_stats
+from .metrics import metrics, start_http_server, MetricsFileWriter, CONTENT_TYPE, HTTP_REQUESTS, HTTP_REQUEST_SECONDS
+from .events import CollectingSink, use_event_sink
+
+
+MAX_BATCH_REQUESTS = 100
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_to_plain(item) for item in value]
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if hasattr(value, 'keys'):
+        return {key: value[key] for key in value.keys()}
+    return value
+
+
+def _require(body: Dict[str, Any], *fields: str) -> None:
+    missing = [field for field in fields if body.get(field) in (None, "")]
+    if missing:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Missing required field(s): {', '.join(missing)}")
+
+
+def _flag(query: Dict[str, List[str]], name: str) -> bool:
+    return query.get(name, ["0"])[-1].lower() in ("1", "true", "yes")
+
+
+# Route handlers: (match, query, body) -> result
+# None / False results are turned into errors using the messages collected from the managers.
+
+def _list_members(match, query, body):
+    if "name" in query:
+        return member_manager.get_members_by_name(query["name"][-1], lean=_flag(query, "lean"))
+    return member_manager.get_all_members(lean=_flag(query, "lean"))
+
+def _create_member(match, query, body):
+    _require(body, "first_name", "last_name")
+    return member_manager.add_member(body["first_name"], body["last_name"], body.get("email"),
+                                     body.get("phone"), body.get("date_joined"))
+
+def _get_member(match, query, body):
+    return member_manager.get_member_by_id(int(match["id"]))
+
+def _update_member(match, query, body):
+    member_id = int(match["id"])
+    member = member_manager.get_member_by_id(member_id)
+    if not member:
+        return None
+    updates = []
+    if "first_name" in body or "last_name" in body:
+        updates.append(member_manager.update_member_name(member_id, body.get("first_name", member.first_name),
+                                                         body.get("last_name", member.last_name)))
+    if "email" in body:
+        updates.append(member_manager.update_member_email(member_id, body["email"]))
+    if "phone" in body:
+        updates.append(member_manager.update_member_phone(member_id, body["phone"]))
+    if "status" in body:
+        updates.append(member_manager.update_member_status(member_id, body["status"]))
+    if not all(updates):
+        return False
+    return member_manager.get_member_by_id(member_id)
+
+def _member_subscriptions(match, query, body):
+    return subscription_manager.get_subscriptions_by_member(int(match["id"]), lean=_flag(query, "lean"))
+
+def _member_payments(match, query, body):
+    return payment_manager.get_payments_by_member(int(match["id"]), lean=_flag(query, "lean"))
+
+def _member_balance(match, query, body):
+    return payment_manager.get_member_balance(int(match["id"]))
+
+def _member_check(match, query, body):
+    # answered from the in-memory snapshot, no database round trip
+    member_id = int(match["id"])
+    running = active_snapshot.get_running(member_id)
+    return {'member_id': member_id, 'active': bool(running), 'subscriptions': running}
+
+def _list_plans(match, query, body):
+    return plan_manager.get_all_plans(include_inactive=_flag(query, "all"), lean=_flag(query, "lean"))
+
+def _create_plan(match, query, body):
+    _require(body, "name", "duration_days", "price")
+    return plan_manager.add_plan(body["name"], body.get("description"), body["duration_days"],
+                                 body["price"], body.get("is_active", True))
+
+def _get_plan(match, query, body):
+    return plan_manager.get_plan_by_id(int(match["id"]))
+
+def _update_plan(match, query, body):
+    plan_id = int(match["id"])
+    if not plan_manager.get_plan_by_id(plan_id):
+        return None
+    updaters = (
+        ("name", plan_manager.update_plan_name),
+        ("description", plan_manager.update_plan_description),
+        ("duration_days", plan_manager.update_plan_duration),
+        ("price", plan_manager.update_plan_price),
+        ("is_active", plan_manager.set_plan_status),
+    )
+    for field, updater in updaters:
+        if field in body and not updater(plan_id, body[field]):
+            return False
+    return plan_manager.get_plan_by_id(plan_id)
+
+def _list_subscriptions(match, query, body):
+    return subscription_manager.get_all_subscriptions(include_inactive=_flag(query, "all"),
+                                                      lean=_flag(query, "lean"))
+
+def _create_subscription(match, query, body):
+    _require(body, "member_id", "plan_id")
+    return subscription_manager.create_subscription(int(body["member_id"]), int(body["plan_id"]),
+                                                     body.get("start_date"),
+                                                     bool(body.get("replace_active", False)),
+                                                     body.get("idempotency_key"))
+
+def _get_subscription(match, query, body):
+    return subscription_manager.get_subscription_by_id(int(match["id"]))
+
+def _subscription_action(action: Callable[[int], bool]):
+    def handler(match, query, body):
+        subscription_id = int(match["id"])
+        if not subscription_manager.get_subscription_by_id(subscription_id):
+            return None
+        if not action(subscription_id):
+            return False
+        return subscription_manager.get_subscription_by_id(subscription_id)
+    return handler
+
+def _subscription_payments(match, query, body):
+    return payment_manager.get_payments_by_subscription(int(match["id"]), lean=_flag(query, "lean"))
+
+def _expiring_subscriptions(match, query, body):
+    return subscription_manager.get_expiring_subscriptions(int(query.get("days", ["7"])[-1]),
+                                                           lean=_flag(query, "lean"))
+
+def _active_subscriptions(match, query, body):
+    # ?on=DATE for a point in time, ?from=DATE&to=DATE for a range
+    if "on" in query:
+        return subscription_manager.get_active_on(query["on"][-1], include_inactive=_flag(query, "all"),
+                                                  lean=_flag(query, "lean"))
+    if "from" in query and "to" in query:
+        return subscription_manager.get_active_between(query["from"][-1], query["to"][-1],
+                                                       include_inactive=_flag(query, "all"),
+                                                       lean=_flag(query, "lean"))
+    raise RequestError(HTTPStatus.BAD_REQUEST, "Either 'on' or both 'from' and 'to' are required")
+
+def _expired_subscriptions(match, query, body):
+    return subscription_manager.get_expired_subscriptions(lean=_flag(query, "lean"))
+
+def _list_payments(match, query, body):
+    if "from" in query or "to" in query:
+        if not ("from" in query and "to" in query):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Both 'from' and 'to' are required for a date range")
+        return payment_manager.get_payments_by_date_range(query["from"][-1], query["to"][-1],
+                                                          lean=_flag(query, "lean"))
+    return payment_manager.get_all_payments(lean=_flag(query, "lean"))
+
+def _record_payment(match, query, body):
+    _require(body, "subscription_id", "amount")
+    return payment_manager.record_payment(int(body["subscription_id"]), body["amount"],
+                                          body.get("payment_date"), body.get("notes"),
+                                          body.get("idempotency_key"))
+
+def _get_payment(match, query, body):
+    return payment_manager.get_payment_by_id(int(match["id"]))
+
+def _daily_metrics(match, query, body):
+    if not ("from" in query and "to" in query):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Both 'from' and 'to' are required")
+    plan_id = int(query["plan_id"][-1]) if "plan_id" in query else None
+    return daily_metrics_manager.get_daily_metrics(query["from"][-1], query["to"][-1], plan_id)
+
+def _cohorts(match, query, body):
+    by, months = query.get("by", ["joined"])[-1], int(query.get("months", ["12"])[-1])
+    if query.get("engine", ["sql"])[-1] == "columnar":
+        return columnar_analytics.cohorts(by, months)
+    return cohort_engine.get_cohorts(by, months)
+
+def _changes(match, query, body):
+    # clients page through with ?since=<id of the last entry they got>
+    return change_log.read_since(int(query.get("since", ["0"])[-1]), min(int(query.get("limit", ["100"])[-1]), 1000),
+                                 query.get("table"))
+
+def _stats(match, query, body):
+    stats = {}
+    stats.update(subscription_manager.get_subscription_stats())
+    stats.update(payment_manager.get_payment_stats())
+    return stats
+
+def _query_stats(match, query, body):
+    if not query_stats.enabled:
+        raise RequestError(HTTPStatus.NOT_FOUND, "Query statistics are disabled (start with --query-stats)")
+    limit = int(query["limit"][-1]) if "limit" in query else None
+    return query_stats.report(query.get("sort", ["total_ms"])[-1], limit)
+
+def _health(match, query, body):
+    return {"status": "ok"}
+
+
+# (method, path pattern, handler, status when the manager returns None)
+ROUTES = [
+    ("GET", r"/health", _health, HTTPStatus.NOT_FOUND),
+    ("GET", r"/stats", _stats, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("GET", r"/stats/queries", _query_stats, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("GET", r"/changes", _changes, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/reports/daily", _daily_metrics, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/reports/cohorts", _cohorts, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/members", _list_members, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("POST", r"/members", _create_member, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/members/(?P<id>\d+)", _get_member, HTTPStatus.NOT_FOUND),
+    ("PATCH", r"/members/(?P<id>\d+)", _update_member, HTTPStatus.NOT_FOUND),
+    ("GET", r"/members/(?P<id>\d+)/subscriptions", _member_subscriptions, HTTPStatus.NOT_FOUND),
+    ("GET", r"/members/(?P<id>\d+)/payments", _member_payments, HTTPStatus.NOT_FOUND),
+    ("GET", r"/members/(?P<id>\d+)/balance", _member_balance, HTTPStatus.NOT_FOUND),
+    ("GET", r"/members/(?P<id>\d+)/check", _member_check, HTTPStatus.NOT_FOUND),
+    ("GET", r"/plans", _list_plans, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("POST", r"/plans", _create_plan, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/plans/(?P<id>\d+)", _get_plan, HTTPStatus.NOT_FOUND),
+    ("PATCH", r"/plans/(?P<id>\d+)", _update_plan, HTTPStatus.NOT_FOUND),
+    ("GET", r"/subscriptions", _list_subscriptions, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("POST", r"/subscriptions", _create_subscription, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/subscriptions/expiring", _expiring_subscriptions, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("GET", r"/subscriptions/expired", _expired_subscriptions, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("GET", r"/subscriptions/active", _active_subscriptions, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/subscriptions/(?P<id>\d+)", _get_subscription, HTTPStatus.NOT_FOUND),
+    ("GET", r"/subscriptions/(?P<id>\d+)/payments", _subscription_payments, HTTPStatus.NOT_FOUND),
+    ("POST", r"/subscriptions/(?P<id>\d+)/renew", _subscription_action(subscription_manager.renew_subscription), HTTPStatus.NOT_FOUND),
+    ("POST", r"/subscriptions/(?P<id>\d+)/cancel", _subscription_action(subscription_manager.cancel_subscription), HTTPStatus.NOT_FOUND),
+    ("POST", r"/subscriptions/(?P<id>\d+)/activate", _subscription_action(subscription_manager.activate_subscription), HTTPStatus.NOT_FOUND),
+    ("GET", r"/payments", _list_payments, HTTPStatus.INTERNAL_SERVER_ERROR),
+    ("POST", r"/payments", _record_payment, HTTPStatus.BAD_REQUEST),
+    ("GET", r"/payments/(?P<id>\d+)", _get_payment, HTTPStatus.NOT_FOUND),
+]
+
+_COMPILED_ROUTES = [(method, re.compile(pattern + r"/?$"), handler, missing)
+                    for method, pattern, handler, missing in ROUTES]
+
+
+def dispatch(method: str, target: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+    """Run one API request against the managers and return (status, JSON-ready payload)"""
+    parts = urlsplit(target)
+    query = parse_qs(parts.query)
+    body = body or {}
+    if not isinstance(body, dict):
+        return HTTPStatus.BAD_REQUEST, {"error": "Request body must be a JSON object"}
+
+    path_matched = False
+    for route_method, pattern, handler, missing_status in _COMPILED_ROUTES:
+        match = pattern.match(parts.path)
+        if not match:
+            continue
+        path_matched = True
+        if route_method != method:
+            continue
+
+        # confirm_default=False: never replace an active subscription unless asked to
+        sink = CollectingSink(confirm_default=False)
+        try:
+            with use_event_sink(sink):
+                result = handler(match.groupdict(), query, body)
+        except RequestError as e:
+            return e.status, {"error": e.message}
+        except (ValueError, TypeError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+
+        if result is None or result is False:
+            status = missing_status if result is None else HTTPStatus.BAD_REQUEST
+            return status, {"error": sink.last_error or "Request failed"}
+        status = HTTPStatus.CREATED if method == "POST" and not match.groupdict() else HTTPStatus.OK
+        return status, _to_plain(result)
+
+    if path_matched:
+        return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Method {method} not allowed"}
+    return HTTPStatus.NOT_FOUND, {"error": f"No route for {parts.path}"}
+
+
+def dispatch_batch(requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    responses = []
+    for request in requests:
+        if not isinstance(request, dict) or "path" not in request:
+            responses.append({"status": HTTPStatus.BAD_REQUEST, "body": {"error": "Each request needs a path"}})
+            continue
+        status, payload = dispatch(str(request.get("method", "GET")).upper(), request["path"], request.get("body"))
+        responses.append({"status": int(status), "body": payload})
+    return responses
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests from the same terminal
+    protocol_version = "HTTP/1.1"
+    server_version = "SubscriptionManager/1.0"
+    # a client that stalls halfway through a request gives its worker back after this many seconds
+    timeout = 30
+
+    def handle(self):
+        # one request, plus any the client already pipelined behind it; between
+        # requests the connection waits on the server's idle selector, not in a worker
+        self.handle_one_request()
+        while not self.close_connection and _has_buffered_request(self):
+            self.handle_one_request()
+
+    def finish(self):
+        if self.close_connection:
+            super().finish()
+        elif not self.wfile.closed:
+            self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        self._send(status, json.dumps(payload, default=str).encode("utf-8"), "application/json")
+
+    def _send(self, status: int, data: bytes, content_type: str) -> None:
+        self._status = status
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> Any:
+        # a body we refuse is left unread, so the connection cannot carry another request
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Request body must be valid JSON")
+
+    def _handle(self, method: str) -> None:
+        started = time.perf_counter() if metrics.enabled else None
+        self._status = HTTPStatus.INTERNAL_SERVER_ERROR
+        try:
+            body = self._read_body()
+            path = urlsplit(self.path).path.rstrip("/")
+            if path == "/metrics" and method == "GET":
+                if not metrics.enabled:
+                    raise RequestError(HTTPStatus.NOT_FOUND, "Metrics are disabled (start with --metrics)")
+                self._send(HTTPStatus.OK, metrics.render().encode("utf-8"), CONTENT_TYPE)
+            elif path == "/batch":
+                if method != "POST":
+                    raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Batch requests must use POST")
+                requests = body.get("requests") if isinstance(body, dict) else body
+                if not isinstance(requests, list):
+                    raise RequestError(HTTPStatus.BAD_REQUEST, "Batch body must be a list of requests")
+                if len(requests) > MAX_BATCH_REQUESTS:
+                    raise RequestError(HTTPStatus.BAD_REQUEST, f"A batch may hold at most {MAX_BATCH_REQUESTS} requests")
+                self._send_json(HTTPStatus.OK, {"responses": dispatch_batch(requests)})
+            else:
+                # the Idempotency-Key header is shorthand for an idempotency_key body field
+                key = self.headers.get("Idempotency-Key")
+                if key and isinstance(body, dict):
+                    body.setdefault("idempotency_key", key)
+                status, payload = dispatch(method, self.path, body)
+                self._send_json(status, payload)
+        except RequestError as e:
+            self._send_json(e.status, {"error": e.message})
+        except Exception as e:
+            self.log_error("Unhandled error for %s %s: %r", method, self.path, e)
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"})
+        if started is not None:
+            HTTP_REQUESTS.inc(method=method, status=int(self._status))
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def _has_buffered_request(handler: BaseHTTPRequestHandler) -> bool:
+    """Whether the handler's read buffer already holds the start of another request."""
+    sock = handler.connection
+    sock.setblocking(False)
+    try:
+        return bool(handler.rfile.peek(1))
+    except OSError:
+        return False
+    finally:
+        sock.settimeout(handler.timeout)
+
+
+class _IdleConnections:
+    """Connections waiting for their next request.
+
+    New connections and keep-alive connections between requests sit on one
+    selector thread. When a client sends a request the connection goes to the
+    worker pool; after `idle_timeout` seconds of silence it is closed. Only the
+    selector thread touches the selector, other threads hand connections over
+    through `park`.
+    """
+
+    def __init__(self, resume: Callable, close: Callable, idle_timeout: float):
+        self._resume = resume
+        self._close = close
+        self.idle_timeout = idle_timeout
+        self._selector = selectors.DefaultSelector()
+        self._incoming: List[Any] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._wakeup, self._waker = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name="api-idle", daemon=True)
+        self._thread.start()
+
+    def park(self, sock: socket.socket, item: Any) -> None:
+        with self._lock:
+            if not self._closed:
+                self._incoming.append((sock, item, time.monotonic()))
+                self._wake()
+                return
+        self._close(item)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._wake()
+        self._thread.join()
+
+    def _wake(self) -> None:
+        try:
+            self._waker.send(b"\0")
+        except OSError:
+            # the wakeup buffer is full, so the selector is already due to wake
+            pass
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._lock:
+                    incoming, self._incoming = self._incoming, []
+                    closed = self._closed
+                for sock, item, since in incoming:
+                    self._selector.register(sock, selectors.EVENT_READ, (item, since))
+                if closed:
+                    break
+                for key, _ in self._selector.select(timeout=1.0):
+                    if key.fileobj is self._wakeup:
+                        try:
+                            self._wakeup.recv(4096)
+                        except OSError:
+                            pass
+                        continue
+                    self._selector.unregister(key.fileobj)
+                    self._resume(key.data[0])
+                expired = time.monotonic() - self.idle_timeout
+                for key in list(self._selector.get_map().values()):
+                    if key.data is not None and key.data[1] < expired:
+                        self._selector.unregister(key.fileobj)
+                        self._close(key.data[0])
+        finally:
+            for key in list(self._selector.get_map().values()):
+                if key.data is not None:
+                    self._close(key.data[0])
+            self._selector.close()
+            self._wakeup.close()
+            self._waker.close()
+
+
+class APIServer(HTTPServer):
+    """HTTP server that hands each request to a bounded pool of worker threads.
+
+    Every worker keeps its own SQLite connection for its whole life. A worker
+    is only held while a request is being handled: new connections, and
+    keep-alive connections between requests, wait on an idle selector and are
+    closed after `idle_timeout` seconds of silence. When `workers + queue_size` requests are already queued or running,
+    or `max_connections` connections are open, the accept loop waits, so excess
+    clients stay in the listen backlog instead of piling up in memory.
+    """
+
+    def __init__(self, address: Tuple[str, int], workers: int = 8, queue_size: int = 32,
+                 verbose: bool = False, max_connections: int = 256, idle_timeout: float = 30):
+        super().__init__(address, APIRequestHandler)
+        self.verbose = verbose
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self._state = threading.Condition()
+        self._open = 0
+        self._pending = 0
+        self._closing = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker",
+                                            initializer=bind_thread_connection)
+        self._idle = _IdleConnections(self._resume, self._close_connection, idle_timeout)
+
+    def process_request(self, request, client_address):
+        with self._state:
+            while self._open >= self.max_connections or self._pending >= self.workers + self.queue_size:
+                # wake up regularly so shutdown() is not stuck behind a full pool
+                if self._closing:
+                    self.shutdown_request(request)
+                    return
+                self._state.wait(0.5)
+            self._open += 1
+        # a worker is only taken once the client has sent something
+        self._idle.park(request, (request, client_address))
+
+    def _process_request_worker(self, request, client_address):
+        handler = None
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+        self._after_request(request, handler)
+
+    def _resume(self, item) -> None:
+        with self._state:
+            self._pending += 1
+        try:
+            if isinstance(item, tuple):
+                self._executor.submit(self._process_request_worker, *item)
+            else:
+                self._executor.submit(self._resume_worker, item)
+        except RuntimeError:
+            # executor already shut down
+            with self._state:
+                self._pending -= 1
+            self._close_connection(item)
+
+    def _resume_worker(self, handler) -> None:
+        try:
+            handler.handle()
+        except Exception:
+            handler.close_connection = True
+            self.handle_error(handler.request, handler.client_address)
+        finally:
+            try:
+                handler.finish()
+            except Exception:
+                handler.close_connection = True
+        self._after_request(handler.request, handler)
+
+    def _after_request(self, request, handler) -> None:
+        with self._state:
+            self._pending -= 1
+            self._state.notify_all()
+        if handler is None or handler.close_connection or self._closing:
+            if handler is not None:
+                self._close_connection(handler)
+            else:
+                self._done(request)
+        else:
+            self._idle.park(handler.connection, handler)
+
+    def _close_connection(self, item) -> None:
+        if isinstance(item, tuple):
+            self._done(item[0])
+            return
+        if not item.rfile.closed:
+            try:
+                BaseHTTPRequestHandler.finish(item)
+            except OSError:
+                pass
+        self._done(item.request)
+
+    def _done(self, request) -> None:
+        self.shutdown_request(request)
+        with self._state:
+            self._open -= 1
+            self._state.notify_all()
+
+    def shutdown(self):
+        with self._state:
+            self._closing = True
+            self._state.notify_all()
+        super().shutdown()
+
+    def server_close(self):
+        with self._state:
+            self._closing = True
+            self._state.notify_all()
+        super().server_close()
+        self._idle.close()
+        release_pool_connections(self._executor, self.workers)
+        self._executor.shutdown(wait=True)
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8080, workers: int = 8,
+                  queue_size: int = 32, verbose: bool = False) -> APIServer:
+    return APIServer((host, port), workers=workers, queue_size=queue_size, verbose=verbose)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, workers: int = 8,
+          queue_size: int = 32, verbose: bool = False) -> None:
+    server = create_server(host, port, workers, queue_size, verbose)
+    print(f"Serving subscription API on http://{host}:{server.server_port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="subman-server", description="Subscription Management HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=32)
+    parser.add_argument("--verbose", action="store_true", help="log every request to stderr")
+    parser.add_argument("--query-stats", action="store_true", help="collect per-statement timings (GET /stats/queries)")
+    parser.add_argument("--slow-query-ms", type=float, help="log statements slower than this to stderr")
+    parser.add_argument("--metrics", action="store_true", help="collect Prometheus metrics (GET /metrics)")
+    parser.add_argument("--metrics-port", type=int, help="also serve /metrics on this local port")
+    parser.add_argument("--metrics-file", help="rewrite this file with the metrics every --metrics-interval seconds")
+    parser.add_argument("--metrics-interval", type=float, default=15.0)
+    args = parser.parse_args(argv)
+    query_stats.configure(enabled=args.query_stats or None, slow_ms=args.slow_query_ms)
+    if args.metrics:
+        metrics.enable()
+    if args.metrics_port is not None:
+        start_http_server(args.metrics_port)
+    writer = MetricsFileWriter(args.metrics_file, args.metrics_interval).start() if args.metrics_file else None
+    try:
+        serve(args.host, args.port, args.workers, args.queue_size, args.verbose)
+    finally:
+        if writer is not None:
+            writer.stop()
+
+
+if __name__ == "__main__":
+    main()
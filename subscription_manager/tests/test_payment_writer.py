@@ -0,0 +1,64 @@
+import sqlite3
+import tempfile
+import unittest
+from concurrent.futures import CancelledError, wait
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import RaisingSink, set_event_sink
+from subscription_manager.core.members import member_manager
+from subscription_manager.core.plans import plan_manager
+from subscription_manager.core.subscriptions import subscription_manager
+from subscription_manager.core.payment_writer import PaymentWriter
+
+
+class PaymentWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        # fixture setup fails loudly instead of returning None
+        set_event_sink(RaisingSink())
+        self._tmp = tempfile.TemporaryDirectory()
+        database.configure_database(Path(self._tmp.name) / "test.db")
+        member = member_manager.add_member("Ada", "Lovelace", "ada@example.com", "5550100000")
+        plan = plan_manager.add_plan("Test Monthly", "test plan", 30, 25.0)
+        self.subscription_id = subscription_manager.create_subscription(member.id, plan.id).id
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_cancelled_future_is_skipped_and_writer_keeps_running(self):
+        writer = PaymentWriter(flush_interval=0.05).start()
+        try:
+            # hold the write lock so the first batch blocks and the rest stays queued
+            holder = sqlite3.connect(str(database.DB_PATH), check_same_thread=False)
+            holder.execute("BEGIN IMMEDIATE")
+            first = writer.submit(self.subscription_id, 10.0)
+            while writer.pending:
+                pass
+            queued = [writer.submit(self.subscription_id, amount) for amount in (11.0, 12.0, 13.0)]
+            self.assertTrue(queued[1].cancel())
+            holder.commit()
+            holder.close()
+
+            done, not_done = wait([first, queued[0], queued[2]], timeout=10)
+            self.assertFalse(not_done)
+            self.assertIsInstance(first.result(), int)
+            self.assertIsInstance(queued[0].result(), int)
+            self.assertIsInstance(queued[2].result(), int)
+            with self.assertRaises(CancelledError):
+                queued[1].result()
+
+            # the writer thread survived and still accepts payments
+            self.assertIsInstance(writer.submit(self.subscription_id, 14.0).result(timeout=10), int)
+            self.assertEqual(writer.rows_committed, 4)
+        finally:
+            writer.stop()
+
+    def test_submit_fails_fast_when_writer_is_not_running(self):
+        writer = PaymentWriter()
+        with self.assertRaises(Exception):
+            writer.submit(self.subscription_id, 10.0).result(timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import csv
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from subscription_manager import database
+from subscription_manager.events import RaisingSink, set_event_sink
+from subscription_manager.core.members import member_manager
+from subscription_manager.core.plans import plan_manager
+from subscription_manager.core.subscriptions import subscription_manager
+from subscription_manager.core.payments import payment_manager
+from subscription_manager.core.settlements import SettlementImporter, DUPLICATE, MATCHED
+
+
+class SettlementImportTest(unittest.TestCase):
+
+    def setUp(self):
+        # fixture setup fails loudly instead of returning None
+        set_event_sink(RaisingSink())
+        self._tmp = tempfile.TemporaryDirectory()
+        database.configure_database(Path(self._tmp.name) / "test.db")
+        member = member_manager.add_member("Ada", "Lovelace", "ada@example.com", "5550100000")
+        plan = plan_manager.add_plan("Test Monthly", "test plan", 30, 25.0)
+        self.subscription_id = subscription_manager.create_subscription(member.id, plan.id).id
+        self.importer = SettlementImporter(batch_size=2)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, name, rows):
+        path = Path(self._tmp.name) / name
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+        return path
+
+    def test_reimporting_a_file_skips_its_lines(self):
+        sid = self.subscription_id
+        path = self._write("settlement.csv", [["subscription_id", "amount"], [sid, "10"], [sid, "10"], [sid, "12"]])
+        first = self.importer.import_file(path)
+        self.assertEqual((first['matched'], first['duplicate']), (3, 0))
+
+        report = io.StringIO()
+        second = self.importer.import_file(path, report=report)
+        self.assertEqual((second['matched'], second['duplicate']), (0, 3))
+        self.assertEqual(len(payment_manager.get_all_payments()), 3)
+        rows = list(csv.DictReader(io.StringIO(report.getvalue())))
+        self.assertEqual({row['status'] for row in rows}, {DUPLICATE})
+        self.assertTrue(all(row['payment_id'] for row in rows))
+
+    def test_reference_is_imported_once(self):
+        sid = self.subscription_id
+        path = self._write("first.csv", [["subscription_id", "amount", "reference"], [sid, "10", "TX-1"],
+                                         [sid, "10", "TX-1"], [sid, "7", "TX-2"]])
+        summary = self.importer.import_file(path)
+        self.assertEqual((summary['matched'], summary['duplicate']), (2, 1))
+
+        # a resent file with different formatting still matches on the reference
+        path = self._write("resent.csv", [["reference", "subscription_id", "amount"], ["TX-2", sid, "7.00"],
+                                          ["TX-3", sid, "8"]])
+        report = io.StringIO()
+        summary = self.importer.import_file(path, report=report)
+        self.assertEqual((summary['matched'], summary['duplicate']), (1, 1))
+        statuses = [row['status'] for row in csv.DictReader(io.StringIO(report.getvalue()))]
+        self.assertEqual(statuses, [DUPLICATE, MATCHED])
+        self.assertEqual(len(payment_manager.get_all_payments()), 3)
+
+    def test_dry_run_claims_nothing(self):
+        path = self._write("settlement.csv", [["subscription_id", "amount"], [self.subscription_id, "10"]])
+        self.assertEqual(self.importer.import_file(path, dry_run=True)['matched'], 1)
+        self.assertEqual(self.importer.import_file(path)['matched'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,6 +30,7 @@ from .display import (
 from .helpers import (
     clear_screen,
     press_enter_to_continue,
+    read_input,
     get_confirmation,
     is_valid_id,
     format_currency,
@@ -84,6 +85,7 @@ __all__ = [
     # Helper functions
     'clear_screen',
     'press_enter_to_continue',
+    'read_input',
     'get_confirmation',
     'is_valid_id',
     'format_currency',
@@ -1,10 +1,12 @@
 from typing import List, Any, Dict
 from datetime import date
+from ..profiling import traced, RENDER
 from .helpers import (format_currency, format_date, truncate_text,
  parse_date, days_between_dates)
 
 
 
+@traced(RENDER)
 def print_table(headers: List[str], rows: List[List[Any]], title: str = None) -> None:
     if not headers or not rows:
         print("No data to display")
@@ -42,6 +44,7 @@ def print_table(headers: List[str], rows: List[List[Any]], title: str = None) ->
 
 
 
+@traced(RENDER)
 def display_members_table(members: List[Any]) -> None:
 
     headers = ["ID", "Name", "Email", "Phone", "Join Date", "Status"]
@@ -60,6 +63,7 @@ def display_members_table(members: List[Any]) -> None:
     print_table(headers, rows, "Members")
 
 
+@traced(RENDER)
 def display_plans_table(plans: List[Any]) -> None :
 
     headers = ["ID", "Name", "Description", "Duration", "Price", "Active"]
@@ -79,14 +83,20 @@ def display_plans_table(plans: List[Any]) -> None :
     print_table(headers, rows, "Subscription Plans")
 
 
+@traced(RENDER)
 def display_subscriptions_table(subscriptions: List[Any]) -> None:
 
     headers = ["ID", "Member", "Plan", "Start Date", "End Date", "Status", "Days Left"]
     rows = []
     
     for sub in subscriptions:
-        member_name = f"{sub.member.first_name} {sub.member.last_name}" if sub.member else f"Member #{sub.member_id}"
-        plan_name = sub.plan.name if sub.plan else f"Plan #{sub.plan_id}"
+        # SubscriptionRow (lean=True) carries the names instead of member / plan
+        member_name = getattr(sub, 'member_name', None)
+        if member_name is None :
+            member_name = f"{sub.member.first_name} {sub.member.last_name}" if sub.member else f"Member #{sub.member_id}"
+        plan_name = getattr(sub, 'plan_name', None)
+        if plan_name is None :
+            plan_name = sub.plan.name if sub.plan else f"Plan #{sub.plan_id}"
         days_left = sub.remaining_days()
         
         rows.append([
@@ -102,6 +112,7 @@ def display_subscriptions_table(subscriptions: List[Any]) -> None:
     print_table(headers, rows, "Subscriptions")
 
 
+@traced(RENDER)
 def display_payments_table(payments: List[Any]) -> None:
     headers = ["ID", "Subscription ID", "Amount", "Payment Date", "Notes"]
     rows = []
@@ -120,6 +131,7 @@ def display_payments_table(payments: List[Any]) -> None:
 
 
 
+@traced(RENDER)
 def display_member_details(member: Any) -> None :
     print("\n" + "=" * 50)
     print("MEMBER DETAILS")
@@ -132,6 +144,7 @@ def display_member_details(member: Any) -> None :
     print(f"Status: {member.status}")
     print("=" * 50)
 
+@traced(RENDER)
 def display_plan_details(plan: Any) -> None:
     print("\n" + "=" * 50)
     print("PLAN DETAILS")
@@ -144,6 +157,7 @@ def display_plan_details(plan: Any) -> None:
     print(f"Active: {'Yes' if plan.is_active else 'No'}")
     print("=" * 50)
 
+@traced(RENDER)
 def display_subscription_details(subscription: Any) -> None:
     print("\n" + "=" * 50)
     print("SUBSCRIPTION DETAILS")
@@ -216,7 +230,8 @@ def display_reports_menu() -> None:
     print("4. Expired Subscriptions")
     print("5. Revenue Report")
     print("6. Plan Popularity Report")
-    print("7. Back to Main Menu")
+    print("7. Export Report (CSV/JSONL)")
+    print("8. Back to Main Menu")
 
 # Message display functions
 
@@ -236,12 +251,14 @@ def display_info_message(message: str) -> None:
 
 # Reports
 
+@traced(RENDER)
 def display_active_members_report(members: List[Any]) -> None:
     active_members = [m for m in members if m.status == "Active"]
     print(f"\nACTIVE MEMBERS REPORT: {len(active_members)} members")
     display_members_table(active_members)
 
 
+@traced(RENDER)
 def display_expiring_subscriptions_report(subscriptions: List[Any], days: int = 7) -> None:
     today = date.today()
     expiring_subs = []
@@ -260,6 +277,7 @@ def display_expiring_subscriptions_report(subscriptions: List[Any], days: int =
     display_subscriptions_table(expiring_subs)
 
 
+@traced(RENDER)
 def display_expired_subscriptions_report(subscriptions: List[Any]) -> None:
     today = date.today()
     expired_subs = []
@@ -276,12 +294,14 @@ def display_expired_subscriptions_report(subscriptions: List[Any]) -> None:
     display_subscriptions_table(expired_subs)
 
 
+@traced(RENDER)
 def display_revenue_report(payments: List[Any], period: str = "month") -> None:
     total_revenue = sum(p.amount for p in payments)
     print(f"\nREVENUE REPORT ({period.upper()}): {format_currency(total_revenue)}")
     display_payments_table(payments)
 
 
+@traced(RENDER)
 def display_plan_popularity_report(plans_with_stats: List[Any]) -> None:
     headers = ["Plan ID", "Plan Name", "Active Subscriptions", "Total Revenue"]
     rows = []
@@ -298,6 +318,7 @@ def display_plan_popularity_report(plans_with_stats: List[Any]) -> None:
 
 
 
+@traced(RENDER)
 def display_summary_stats(stats: Dict[str, int]) -> None:
     print("\n" + "=" * 30)
     print("SYSTEM SUMMARY")
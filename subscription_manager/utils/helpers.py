@@ -2,6 +2,7 @@ from datetime import date, datetime, timedelta
 import os
 from re import sub
 from typing import Optional, Union
+from ..profiling import traced, INPUT
 
 
 def get_current_date() -> str :
@@ -57,9 +58,16 @@ def clear_screen() :
 # def print_separator(unit: str, length: int) :
 #     print(str(unit) * length)
 
+@traced(INPUT)
+def read_input(message: str = "") -> str :
+    """input() inside an input span, so profiles leave out the time spent typing"""
+    return input(message)
+
+@traced(INPUT)
 def press_enter_to_continue(message: str = "Press Enter to continue") :
     input(f"\n{message}")
 
+@traced(INPUT)
 def get_confirmation(prompt: str) -> bool:
     while True:
         response = input(f"{prompt} (y/n): ").strip().lower()